@@ -0,0 +1,46 @@
+"""Run all benchmarks and store the results as JSON
+
+python -m benchmarks [--output path.json] [module ...]
+python -m benchmarks.compare old.json new.json
+
+Results are stored in `benchmarks/results/<git revision>.json` by default.
+"""
+
+import argparse
+import importlib
+from pathlib import Path
+
+from .harness import Results, git_revision, run
+
+RESULTS_DIR = Path(__file__).parent / "results"
+MODULES = (
+    "bench_keys",
+    "bench_dependency",
+    "bench_serialization",
+    "bench_backends",
+    "bench_endpoints",
+    "bench_admission",
+    "bench_threads",
+    "bench_hashers",
+    "bench_imports",
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", type=Path)
+    parser.add_argument("only", nargs="*", help=f"Modules to run: {MODULES}")
+    args = parser.parse_args()
+    unknown = set(args.only) - set(MODULES)
+    if unknown:
+        parser.error(f"Unknown benchmark modules: {unknown}")
+
+    results = Results()
+    for name in args.only or MODULES:
+        module = importlib.import_module(f"{__package__}.{name}")
+        run(module.main, results)
+    results.save(args.output or RESULTS_DIR / f"{git_revision()}.json")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Hit ratio of InMemoryBackend admission policies when replaying a key trace
+
+The default trace mixes Zipf distributed popular keys with one-off keys, such as
+requests with unique query strings. A recorded trace, with one key per line, can be
+replayed instead:
+
+python -m benchmarks.bench_admission --trace keys.txt
+"""
+
+import argparse
+import random
+from typing import List
+
+from fastapi_caching import InMemoryBackend
+
+from .harness import Results, run
+
+CACHE_SIZES = (500, 2_000, 5_000)
+ADMISSION_POLICIES = ("lru", "tinylfu")
+
+
+def make_trace(
+    length: int = 100_000,
+    popular_keys: int = 20_000,
+    one_off_ratio: float = 0.5,
+    skew: float = 0.9,
+    seed: int = 42,
+) -> List[str]:
+    """Return a reproducible trace of cache keys"""
+    rng = random.Random(seed)
+    weights = [1 / (rank**skew) for rank in range(1, popular_keys + 1)]
+    popular = rng.choices(range(popular_keys), weights=weights, k=length)
+    return [
+        (
+            f"/products|GET|q={rng.random()}"
+            if rng.random() < one_off_ratio
+            else f"/products/{key}|GET"
+        )
+        for key in popular
+    ]
+
+
+async def replay(backend: InMemoryBackend, trace: List[str]) -> float:
+    hits = 0
+    for key in trace:
+        if await backend.get(key) is None:
+            await backend.set(key, b"")
+        else:
+            hits += 1
+    return hits / len(trace)
+
+
+async def main(results: Results, trace: List[str] = None):
+    trace = trace or make_trace()
+    for cache_size in CACHE_SIZES:
+        for admission in ADMISSION_POLICIES:
+            backend = InMemoryBackend(maxsize=cache_size, admission=admission)
+            results.add(
+                {
+                    "name": "inmemory.hit_ratio",
+                    "params": {
+                        "admission": admission,
+                        "cache_size": cache_size,
+                        "trace_length": len(trace),
+                    },
+                    "hit_ratio": await replay(backend, trace),
+                }
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--trace", help="File with one cache key per line")
+    args = parser.parse_args()
+    trace = None
+    if args.trace:
+        with open(args.trace) as f:
+            trace = [line.strip() for line in f if line.strip()]
+    run(lambda results: main(results, trace))
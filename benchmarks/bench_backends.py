@@ -0,0 +1,73 @@
+"""Throughput of backend get/set/invalidate_tags at different sizes
+
+Uses fakeredis for `RedisBackend` unless `BENCH_REDIS_URL` is set.
+"""
+
+import itertools
+import os
+
+from fastapi_caching import CacheEntry, InMemoryBackend, RedisBackend
+
+from .harness import Results, abench, run
+
+PAYLOAD_SIZES = (100, 10_000, 1_000_000)
+KEY_COUNTS = (100, 10_000)
+MAX_PREFILL_BYTES = 200_000_000
+
+
+def make_backends():
+    yield "inmemory", InMemoryBackend(maxsize=max(KEY_COUNTS))
+    redis_url = os.environ.get("BENCH_REDIS_URL")
+    if redis_url:
+        from redis.asyncio import Redis
+
+        yield "redis", RedisBackend(prefix="bench", redis=Redis.from_url(redis_url))
+    else:
+        from fakeredis import FakeAsyncRedis
+
+        yield "fakeredis", RedisBackend(prefix="bench", redis=FakeAsyncRedis())
+
+
+async def main(results: Results):
+    for backend_name, backend in make_backends():
+        for payload_size, key_count in itertools.product(PAYLOAD_SIZES, KEY_COUNTS):
+            if payload_size * key_count > MAX_PREFILL_BYTES:
+                continue
+            payload = b"x" * payload_size
+            keys = [f"key-{i}" for i in range(key_count)]
+            await backend.reset()
+            await backend.set_many([CacheEntry(k, payload) for k in keys])
+            params = dict(
+                backend=backend_name, payload_size=payload_size, keys=key_count
+            )
+
+            get_keys = itertools.cycle(keys)
+            await results.add_async(
+                abench("backend.get", lambda: backend.get(next(get_keys)), **params)
+            )
+
+            set_keys = itertools.cycle(keys)
+            await results.add_async(
+                abench(
+                    "backend.set",
+                    lambda: backend.set(next(set_keys), payload, tags=["bench"]),
+                    **params,
+                )
+            )
+
+            tags = [f"tag-{i % 10}" for i in range(10)]
+            entries = [CacheEntry(k, payload, tags=tags[:1]) for k in keys[:10]]
+
+            async def invalidate():
+                # NOTE: Includes re-tagging the ten entries that are invalidated
+                await backend.set_many(entries)
+                await backend.invalidate_tags(tags)
+
+            await results.add_async(
+                abench("backend.set_many+invalidate_tags", invalidate, **params)
+            )
+        await backend.reset()
+
+
+if __name__ == "__main__":
+    run(main)
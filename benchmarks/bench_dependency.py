@@ -0,0 +1,46 @@
+"""Per-request overhead of `ResponseCacheDependency`, without an ASGI app"""
+
+from starlette.requests import Request
+
+from fastapi_caching import InMemoryBackend
+from fastapi_caching.dependencies import ResponseCacheDependency
+
+from .harness import Results, abench, run
+
+
+def make_scope(headers=(), query_string: bytes = b"page=1&size=20") -> dict:
+    return {
+        "type": "http",
+        "method": "GET",
+        "path": "/products",
+        "query_string": query_string,
+        "headers": [(b"accept", b"application/json"), *headers],
+    }
+
+
+async def main(results: Results):
+    backend = InMemoryBackend()
+    await backend.set("/products|GET|page=1|size=20", [{"id": 1}])
+    dependency = ResponseCacheDependency(backend, ttl=60)
+    cases = [
+        ("authorization", make_scope([(b"authorization", b"Bearer x")])),
+        ("no-cache", make_scope(query_string=b"page=1&size=20&no-cache")),
+        ("miss", make_scope(query_string=b"page=2&size=20")),
+        ("hit", make_scope()),
+    ]
+    # NOTE: A new request per call, as requests cache their parsed headers
+    for name, scope in cases:
+        await results.add_async(
+            abench("dependency", lambda: dependency(Request(scope)), case=name)
+        )
+
+    backend.disable()
+    scope = make_scope()
+    await results.add_async(
+        abench("dependency", lambda: dependency(Request(scope)), case="disabled")
+    )
+    backend.enable()
+
+
+if __name__ == "__main__":
+    run(main)
@@ -0,0 +1,72 @@
+"""End-to-end latency of cached endpoints, requested in-process with httpx
+
+The app mirrors the product endpoints of the example apps, with products kept in
+memory instead of a database so that the cache overhead isn't drowned out.
+"""
+
+import uuid
+from typing import List
+
+import httpx
+from fastapi import FastAPI, HTTPException
+
+from fastapi_caching import CacheManager, ResponseCache
+
+from .bench_backends import make_backends
+from .bench_serialization import make_products
+from .harness import Results, abench, run
+
+
+def make_app(cache_manager: CacheManager, products: List[dict]) -> FastAPI:
+    app = FastAPI()
+    by_id = {str(p["id"]): p for p in products}
+
+    @app.get("/products")
+    async def list_products(rcache: ResponseCache = cache_manager.from_request()):
+        if rcache.exists():
+            return rcache.data
+        await rcache.set(products, tag="all-products")
+        return products
+
+    @app.get("/products/{product_id}")
+    async def get_product(
+        product_id: uuid.UUID, rcache: ResponseCache = cache_manager.from_request()
+    ):
+        if rcache.exists():
+            return rcache.data
+        product = by_id.get(str(product_id))
+        if product is None:
+            raise HTTPException(404, detail="Product not found")
+        await rcache.set(product, tag=f"product-{product_id}")
+        return product
+
+    @app.get("/uncached/products")
+    async def list_uncached_products():
+        return products
+
+    return app
+
+
+async def main(results: Results):
+    products = make_products(100)
+    product_url = f"/products/{products[0]['id']}"
+    for backend_name, backend in make_backends():
+        app = make_app(CacheManager(backend), products)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://b") as c:
+            for name, url in [
+                ("list.hit", "/products"),
+                ("list.miss", "/products?no-cache"),
+                ("list.uncached", "/uncached/products"),
+                ("detail.hit", product_url),
+                ("detail.miss", f"{product_url}?no-cache"),
+            ]:
+                await c.get(url)
+                await results.add_async(
+                    abench(f"endpoint.{name}", lambda: c.get(url), backend=backend_name)
+                )
+        await backend.reset()
+
+
+if __name__ == "__main__":
+    run(main)
@@ -0,0 +1,53 @@
+"""Startup cost of the `app_version` hashers"""
+
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from fastapi_caching import hashers
+
+from .harness import Results, bench, run
+
+FILE_COUNTS = (100, 1000)
+
+
+def make_tree(root: Path, count: int):
+    # Backdated, as digests of files modified within the last seconds aren't cached
+    mtime = time.time() - 60
+    for i in range(count):
+        directory = root / f"package{i % 10}"
+        directory.mkdir(exist_ok=True)
+        path = directory / f"module{i}.py"
+        path.write_text("x = 1\n" * 2000)
+        os.utime(path, (mtime, mtime))
+
+
+async def main(results: Results):
+    results.add(
+        bench("hashers.installed_packages_hash", hashers.installed_packages_hash)
+    )
+    for count in FILE_COUNTS:
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp) / "src"
+            root.mkdir()
+            make_tree(root, count)
+            cache_path = Path(tmp) / "digests.json"
+            hashers.files_hash(root, cache_path=cache_path)
+            results.add(
+                bench(
+                    "hashers.files_hash", lambda: hashers.files_hash(root), files=count
+                )
+            )
+            results.add(
+                bench(
+                    "hashers.files_hash",
+                    lambda: hashers.files_hash(root, cache_path=cache_path),
+                    files=count,
+                    cache="warm",
+                )
+            )
+
+
+if __name__ == "__main__":
+    run(main)
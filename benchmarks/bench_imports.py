@@ -0,0 +1,35 @@
+"""Time to import the package, or parts of it, in a fresh interpreter"""
+
+import subprocess
+import sys
+
+from .harness import Results, bench, run
+
+STATEMENTS = {
+    "baseline": "pass",
+    "package": "import fastapi_caching",
+    "hashers": "from fastapi_caching import hashers",
+    "in-memory backend": "from fastapi_caching import InMemoryBackend",
+    "manager": "from fastapi_caching import CacheManager",
+    "everything": "from fastapi_caching import *",
+}
+
+
+def import_in_subprocess(statement: str):
+    subprocess.run([sys.executable, "-c", statement], check=True)
+
+
+async def main(results: Results):
+    for name, statement in STATEMENTS.items():
+        results.add(
+            bench(
+                "import",
+                lambda: import_in_subprocess(statement),
+                repeat=3,
+                statement=name,
+            )
+        )
+
+
+if __name__ == "__main__":
+    run(main)
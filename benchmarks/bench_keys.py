@@ -0,0 +1,40 @@
+"""Cost of building `ResponseCache` keys from requests"""
+
+from starlette.requests import Request
+
+from fastapi_caching import NoOpBackend, ResponseCache
+
+from .harness import Results, bench, run
+
+QUERY_PARAM_COUNTS = (0, 5, 20)
+
+
+def make_request(query_params: int) -> Request:
+    query_string = "&".join(f"param{i}=value{i}" for i in range(query_params))
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "path": "/products/123",
+            "query_string": query_string.encode(),
+            "headers": [],
+        }
+    )
+
+
+async def main(results: Results):
+    backend = NoOpBackend()
+    for count in QUERY_PARAM_COUNTS:
+        request = make_request(count)
+        cache = ResponseCache(backend, request)
+        results.add(
+            bench(
+                "ResponseCache._make_key",
+                lambda: cache._make_key(request),
+                query_params=count,
+            )
+        )
+
+
+if __name__ == "__main__":
+    run(main)
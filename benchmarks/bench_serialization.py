@@ -0,0 +1,65 @@
+"""Speed and size of serialization formats for typical response data"""
+
+import json
+import uuid
+from datetime import datetime
+
+from fastapi_caching import raw
+from fastapi_caching.raw import RawCacheObject
+
+from .harness import Results, bench, run
+
+ITEM_COUNTS = (1, 100, 1000)
+
+
+def make_products(count: int):
+    return [
+        {
+            "id": uuid.uuid4(),
+            "name": f"Product {i}",
+            "description": "x" * 200,
+            "created_at": datetime.utcnow(),
+        }
+        for i in range(count)
+    ]
+
+
+def make_formats():
+    formats = {
+        "envelope": (lambda o: raw.dumps(RawCacheObject(o)), raw.loads),
+        "envelope+zlib": (
+            lambda o: raw.dumps(RawCacheObject(o), compress_min_size=1024),
+            raw.loads,
+        ),
+        "json": (lambda o: json.dumps(o, default=str).encode(), json.loads),
+    }
+    try:
+        import orjson
+    except ImportError:
+        pass
+    else:
+        formats["orjson"] = (orjson.dumps, orjson.loads)
+    try:
+        import msgpack
+    except ImportError:
+        pass
+    else:
+        formats["msgpack"] = (
+            lambda o: msgpack.packb(o, default=str),
+            msgpack.unpackb,
+        )
+    return formats
+
+
+async def main(results: Results):
+    for count in ITEM_COUNTS:
+        products = make_products(count)
+        for name, (dumps, loads) in make_formats().items():
+            dumped = dumps(products)
+            params = dict(format=name, items=count, size=len(dumped))
+            results.add(bench("serialization.dumps", lambda: dumps(products), **params))
+            results.add(bench("serialization.loads", lambda: loads(dumped), **params))
+
+
+if __name__ == "__main__":
+    run(main)
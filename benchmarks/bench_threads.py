@@ -0,0 +1,46 @@
+"""Throughput of the sync InMemoryBackend API when shared between threads"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi_caching import InMemoryBackend
+
+from .harness import Results, run
+
+THREAD_COUNTS = (1, 4, 16)
+STRIPE_COUNTS = (1, 16)
+OPS_PER_THREAD = 20_000
+
+
+def worker(backend: InMemoryBackend, n: int):
+    for i in range(OPS_PER_THREAD):
+        key = f"{n}-{i % 1000}"
+        if backend.get_sync(key) is None:
+            backend.set_sync(key, b"x" * 100)
+
+
+async def main(results: Results):
+    for stripes in STRIPE_COUNTS:
+        for threads in THREAD_COUNTS:
+            backend = InMemoryBackend(stripes=stripes)
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=threads) as executor:
+                list(executor.map(lambda n: worker(backend, n), range(threads)))
+            elapsed = time.perf_counter() - start
+            per_op = elapsed / (threads * OPS_PER_THREAD)
+            results.add(
+                {
+                    "name": "inmemory.threaded_get_or_set",
+                    "params": {"stripes": stripes, "threads": threads},
+                    "number": threads * OPS_PER_THREAD,
+                    "repeat": 1,
+                    "min_s": per_op,
+                    "median_s": per_op,
+                    "stdev_s": 0.0,
+                    "ops_per_s": 1 / per_op,
+                }
+            )
+
+
+if __name__ == "__main__":
+    run(main)
@@ -0,0 +1,49 @@
+"""Compare two benchmark result files and report regressions
+
+python -m benchmarks.compare old.json new.json --threshold 0.1
+"""
+
+import argparse
+import json
+import sys
+
+
+def _index(path):
+    with open(path) as f:
+        data = json.load(f)
+    return {
+        (b["name"], json.dumps(b["params"], sort_keys=True)): b
+        for b in data["benchmarks"]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Relative slowdown to report as a regression (default: 0.1)",
+    )
+    args = parser.parse_args()
+
+    old, new = _index(args.old), _index(args.new)
+    regressions = 0
+    for key in sorted(old.keys() & new.keys()):
+        if "min_s" in new[key]:
+            change = new[key]["min_s"] / old[key]["min_s"] - 1
+        else:
+            # Hit ratios, where lower is worse
+            change = old[key]["hit_ratio"] / max(new[key]["hit_ratio"], 1e-9) - 1
+        marker = ""
+        if change > args.threshold:
+            regressions += 1
+            marker = "  <-- regression"
+        print(f"{key[0]:<40} {key[1]:<60} {change:>+8.1%}{marker}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import asyncio
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List
+
+__all__ = ("Results", "bench", "abench", "run")
+
+
+def _summarize(name: str, params: Dict[str, Any], number: int, timings: List[float]):
+    per_op = [t / number for t in timings]
+    return {
+        "name": name,
+        "params": params,
+        "number": number,
+        "repeat": len(timings),
+        "min_s": min(per_op),
+        "median_s": statistics.median(per_op),
+        "stdev_s": statistics.stdev(per_op) if len(per_op) > 1 else 0.0,
+        "ops_per_s": 1 / min(per_op) if min(per_op) > 0 else float("inf"),
+    }
+
+
+def _autorange(timer: Callable[[int], float], min_time: float) -> int:
+    number = 1
+    while True:
+        if timer(number) >= min_time:
+            return number
+        number *= 10
+
+
+def bench(
+    name: str,
+    func: Callable[[], Any],
+    *,
+    repeat: int = 5,
+    min_time: float = 0.1,
+    **params,
+) -> Dict[str, Any]:
+    """Time `func`, calibrating the number of calls per round like `timeit`"""
+
+    def timer(number: int) -> float:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        return time.perf_counter() - start
+
+    number = _autorange(timer, min_time)
+    return _summarize(name, params, number, [timer(number) for _ in range(repeat)])
+
+
+async def abench(
+    name: str,
+    func: Callable[[], Awaitable[Any]],
+    *,
+    repeat: int = 5,
+    min_time: float = 0.1,
+    **params,
+) -> Dict[str, Any]:
+    """Asynchronous version of `bench`, for coroutine functions"""
+
+    async def timer(number: int) -> float:
+        start = time.perf_counter()
+        for _ in range(number):
+            await func()
+        return time.perf_counter() - start
+
+    number = 1
+    while await timer(number) < min_time:
+        number *= 10
+    timings = [await timer(number) for _ in range(repeat)]
+    return _summarize(name, params, number, timings)
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+class Results:
+    """Collects benchmark results and stores them as JSON"""
+
+    def __init__(self):
+        self.benchmarks: List[Dict[str, Any]] = []
+
+    def add(self, result: Dict[str, Any]):
+        self.benchmarks.append(result)
+        params = ", ".join(f"{k}={v}" for k, v in result["params"].items())
+        if "min_s" in result:
+            value = f"{result['min_s'] * 1e6:>12.2f} us/op"
+        else:
+            value = f"{result['hit_ratio']:>12.2%} hits"
+        print(f"{result['name']:<40} {params:<40} {value}", file=sys.stderr)
+
+    async def add_async(self, result: Awaitable[Dict[str, Any]]):
+        self.add(await result)
+
+    def save(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "python": sys.version,
+            "platform": platform.platform(),
+            "benchmarks": self.benchmarks,
+        }
+        path.write_text(json.dumps(data, indent=2) + "\n")
+
+
+def run(main: Callable[[Results], Awaitable[None]], results: Results = None):
+    """Run a benchmark module's `main` coroutine and return its results"""
+    results = results or Results()
+    asyncio.run(main(results))
+    return results
@@ -34,7 +34,7 @@ async def disconnect_db():
 @app.post("/products", response_model=Product)
 async def create_product(product: Product):
     await db.create_product(product)
-    await cache_manager.invalidate_tag("all-products")
+    await cache_manager.invalidate_tags([f"product-{product.id}", "all-products"])
     return product
 
 
@@ -46,7 +46,8 @@ async def update_product(product_id: uuid.UUID, product: Product):
         raise HTTPException(404, detail="Product does not exist")
 
     await db.update_product(product)
-    await cache_manager.invalidate_tags([f"product-{product.id}", "all-products"])
+    # Cached list and detail responses share the product's entry
+    await cache_manager.update_fragment("product", product.id, product)
     return product
 
 
@@ -59,7 +60,7 @@ async def list_products(rcache: ResponseCache = cache_manager.from_request()):
 
     await asyncio.sleep(1)  # Some heavy processing...
 
-    await rcache.set(products, tag="all-products")
+    await rcache.set_fragments(products, namespace="product", tag="all-products")
 
     return products
 
@@ -74,9 +75,12 @@ async def get_product(
     product = await db.fetch_product(product_id)
 
     if product is None:
-        raise HTTPException(404, detail="Product not found")
+        # Cache the 404 as well, with a short TTL
+        exc = HTTPException(404, detail="Product not found")
+        await rcache.set_error(exc, tag=f"product-{product_id}")
+        raise exc
 
-    await rcache.set(product, tag=f"product-{product_id}")
+    await rcache.set_fragment(product, namespace="product", item_id=product_id)
 
     return product
 
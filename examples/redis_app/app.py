@@ -1,5 +1,6 @@
 import asyncio
 import logging
+import tempfile
 import uuid
 from pathlib import Path
 from typing import List
@@ -20,9 +21,15 @@ logger = logging.getLogger(__name__)
 # NOTE: In a real world scenario a version identifier for the given code deployment
 # should be used, commonly this would be the commit hash from your VCS.
 # Here we're using a hash of installed packages combined with a hash of the files in
-# the redis_app directory.
+# the redis_app directory. File digests are cached between restarts.
 app_version = "-".join(
-    [hashers.installed_packages_hash(), hashers.files_hash(Path(__file__).parent)]
+    [
+        hashers.installed_packages_hash(),
+        hashers.files_hash(
+            Path(__file__).parent,
+            cache_path=Path(tempfile.gettempdir()) / "redis_app-files-hash.json",
+        ),
+    ]
 )
 
 cache_backend = RedisBackend(
@@ -50,7 +57,7 @@ async def disconnect_db():
 @app.post("/products", response_model=Product)
 async def create_product(product: Product):
     await db.create_product(product)
-    await cache_manager.invalidate_tag("all-products")
+    await cache_manager.invalidate_tags([f"product-{product.id}", "all-products"])
     return product
 
 
@@ -62,7 +69,8 @@ async def update_product(product_id: uuid.UUID, product: Product):
         raise HTTPException(404, detail="Product does not exist")
 
     await db.update_product(product)
-    await cache_manager.invalidate_tags([f"product-{product.id}", "all-products"])
+    # Cached list and detail responses share the product's entry
+    await cache_manager.update_fragment("product", product.id, product)
     return product
 
 
@@ -75,7 +83,7 @@ async def list_products(rcache: ResponseCache = cache_manager.from_request()):
 
     await asyncio.sleep(1)  # Some heavy processing...
 
-    await rcache.set(products, tag="all-products")
+    await rcache.set_fragments(products, namespace="product", tag="all-products")
 
     return products
 
@@ -90,9 +98,12 @@ async def get_product(
     product = await db.fetch_product(product_id)
 
     if product is None:
-        raise HTTPException(404, detail="Product not found")
+        # Cache the 404 as well, with a short TTL
+        exc = HTTPException(404, detail="Product not found")
+        await rcache.set_error(exc, tag=f"product-{product_id}")
+        raise exc
 
-    await rcache.set(product, tag=f"product-{product_id}")
+    await rcache.set_fragment(product, namespace="product", item_id=product_id)
 
     return product
 
@@ -1,4 +1,89 @@
-from .backends import *  # noqa
-from .exceptions import *  # noqa
-from .manager import *  # noqa
-from .objects import *  # noqa
+"""Cache library for FastAPI with tag based invalidation
+
+The public names below are imported from their modules on first access, so that
+e.g. `fastapi_caching.hashers` can be used without importing FastAPI or redis.
+"""
+
+import importlib
+from typing import TYPE_CHECKING
+
+# Public name -> module it's defined in
+_EXPORTS = {
+    "AccessSampler": "analytics",
+    "CountMinSketch": "analytics",
+    "HyperLogLog": "analytics",
+    "TopK": "analytics",
+    "analytics_router": "analytics",
+    "CacheEntry": "backends",
+    "InMemoryBackend": "backends",
+    "NoOpBackend": "backends",
+    "RedisBackend": "backends",
+    "CachingNotEnabled": "exceptions",
+    "CacheManager": "manager",
+    "RequestMemoMiddleware": "memo",
+    "request_memo": "memo",
+    "CacheMetrics": "metrics",
+    "EventLoopLagMonitor": "metrics",
+    "OpenTelemetryMetrics": "metrics",
+    "ResponseCache": "objects",
+    "QueryCache": "queries",
+    "CacheInvalidationMiddleware": "policies",
+    "CachePolicy": "policies",
+    "InvalidationRule": "policies",
+    "Pagination": "policies",
+    "InvalidationBuffer": "writebehind",
+    "WriteBehindQueue": "writebehind",
+}
+
+# Submodules, which `import fastapi_caching` used to import eagerly
+_SUBMODULES = frozenset(
+    {
+        "admission",
+        "analytics",
+        "backends",
+        "constants",
+        "dependencies",
+        "exceptions",
+        "hashers",
+        "manager",
+        "memo",
+        "metrics",
+        "objects",
+        "policies",
+        "queries",
+        "raw",
+        "snapshot",
+        "warming",
+        "writebehind",
+    }
+)
+
+__all__ = tuple(_EXPORTS)
+
+
+def __getattr__(name: str):
+    if name in _SUBMODULES:
+        return importlib.import_module(f".{name}", __name__)
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted({*globals(), *__all__})
+
+
+if TYPE_CHECKING:
+    from .analytics import *  # noqa
+    from .backends import *  # noqa
+    from .exceptions import *  # noqa
+    from .manager import *  # noqa
+    from .memo import *  # noqa
+    from .metrics import *  # noqa
+    from .objects import *  # noqa
+    from .policies import *  # noqa
+    from .queries import *  # noqa
+    from .writebehind import *  # noqa
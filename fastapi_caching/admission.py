@@ -0,0 +1,163 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Iterator, Tuple
+
+from .analytics import CountMinSketch, hash64
+
+__all__ = ("TinyLFUCache",)
+
+_MISSING = object()
+
+
+class TinyLFUCache:
+    """Size bounded TTL cache with a W-TinyLFU admission policy
+
+    New entries go to a small LRU window. When the window overflows, its oldest
+    entry only replaces the least recently used entry of the main (segmented LRU)
+    cache if it's been accessed more often, as estimated by a frequency sketch.
+    One-off keys are therefore kept from pushing out frequently used entries.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        *,
+        window_ratio: float = 0.01,
+        on_evict: Callable[[], None] = None,
+        timer: Callable[[], float] = time.monotonic,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._timer = timer
+        self._on_evict = on_evict
+        self._window_size = max(1, round(maxsize * window_ratio))
+        main_size = max(1, maxsize - self._window_size)
+        self._protected_size = max(1, int(main_size * 0.8))
+        self._main_size = main_size
+        # Entries are stored as (value, expires_at)
+        self._window = OrderedDict()
+        self._probation = OrderedDict()
+        self._protected = OrderedDict()
+        self._sketch = CountMinSketch(width=max(64, maxsize), depth=4)
+        self._sample_size = 10 * maxsize
+        self._additions = 0
+
+    def __len__(self) -> int:
+        return len(self._window) + len(self._probation) + len(self._protected)
+
+    def __contains__(self, key: Hashable) -> bool:
+        for segment in (self._window, self._probation, self._protected):
+            item = segment.get(key)
+            if item is not None:
+                return item[1] > self._timer()
+        return False
+
+    def __getitem__(self, key: Hashable) -> Any:
+        self._record(key)
+        now = self._timer()
+        if key in self._window:
+            segment = self._window
+        elif key in self._protected:
+            segment = self._protected
+        elif key in self._probation:
+            segment = self._probation
+        else:
+            raise KeyError(key)
+
+        value, expires_at = segment[key]
+        if expires_at <= now:
+            del segment[key]
+            raise KeyError(key)
+        elif segment is self._probation:
+            del self._probation[key]
+            self._protect(key, (value, expires_at))
+        else:
+            segment.move_to_end(key)
+        return value
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __setitem__(self, key: Hashable, value: Any):
+        self.set(key, value)
+
+    def set(self, key: Hashable, value: Any, ttl: float = None):
+        self._record(key)
+        item = (value, self._timer() + (self.ttl if ttl is None else ttl))
+        for segment in (self._window, self._probation, self._protected):
+            if key in segment:
+                segment[key] = item
+                segment.move_to_end(key)
+                return
+        self._window[key] = item
+        if len(self._window) > self._window_size:
+            self._admit(*self._window.popitem(last=False))
+
+    def pop(self, key: Hashable, default: Any = _MISSING) -> Any:
+        for segment in (self._window, self._probation, self._protected):
+            if key in segment:
+                return segment.pop(key)[0]
+        if default is _MISSING:
+            raise KeyError(key)
+        return default
+
+    def items(self) -> Iterator[Tuple[Hashable, Any]]:
+        """Unexpired `(key, value)` pairs, without counting them as accesses"""
+        now = self._timer()
+        for segment in (self._window, self._probation, self._protected):
+            for key, (value, expires_at) in list(segment.items()):
+                if expires_at > now:
+                    yield key, value
+
+    def expiring_items(self) -> Iterator[Tuple[Hashable, Any, float]]:
+        """Unexpired `(key, value, expires_at)` entries, expiring by the timer"""
+        now = self._timer()
+        for segment in (self._window, self._probation, self._protected):
+            for key, (value, expires_at) in list(segment.items()):
+                if expires_at > now:
+                    yield key, value, expires_at
+
+    def clear(self):
+        self._window.clear()
+        self._probation.clear()
+        self._protected.clear()
+
+    def _record(self, key: Hashable):
+        self._sketch.add(hash64(str(key)))
+        self._additions += 1
+        if self._additions >= self._sample_size:
+            self._sketch.halve()
+            self._additions //= 2
+
+    def _frequency(self, key: Hashable) -> int:
+        return self._sketch.estimate(hash64(str(key)))
+
+    def _admit(self, candidate: Hashable, item):
+        if len(self._probation) + len(self._protected) < self._main_size:
+            self._probation[candidate] = item
+            return
+
+        victims = self._probation if self._probation else self._protected
+        victim, victim_item = next(iter(victims.items()))
+        victim_expired = victim_item[1] <= self._timer()
+        if victim_expired or self._frequency(candidate) > self._frequency(victim):
+            del victims[victim]
+            self._probation[candidate] = item
+            if victim_expired:
+                return
+        # Either the victim or the candidate was dropped
+        self._evicted()
+
+    def _protect(self, key: Hashable, item):
+        self._protected[key] = item
+        if len(self._protected) > self._protected_size:
+            demoted, demoted_item = self._protected.popitem(last=False)
+            self._probation[demoted] = demoted_item
+
+    def _evicted(self):
+        if self._on_evict is not None:
+            self._on_evict()
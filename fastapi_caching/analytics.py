@@ -0,0 +1,187 @@
+import hashlib
+import math
+import random
+import threading
+from typing import Any, Dict, List, Tuple
+
+__all__ = ("AccessSampler", "CountMinSketch", "HyperLogLog", "TopK", "analytics_router")
+
+_MASK_64 = (1 << 64) - 1
+
+
+def hash64(item: str) -> int:
+    """Return a stable 64 bit hash of the given string"""
+    return int.from_bytes(
+        hashlib.blake2b(item.encode(), digest_size=8).digest(), "little"
+    )
+
+
+class CountMinSketch:
+    """Approximate frequency counts in fixed memory
+
+    Estimates never undercount, and overcount by at most `e / width` of the total
+    count with probability `1 - exp(-depth)`.
+    """
+
+    def __init__(self, width: int = 2048, depth: int = 4):
+        self.width = width
+        self.depth = depth
+        self._rows = [[0] * width for _ in range(depth)]
+
+    def _indexes(self, h: int):
+        # Derive the row hashes from two halves of one hash (Kirsch-Mitzenmacher)
+        h1, h2 = h & 0xFFFFFFFF, h >> 32
+        return [(h1 + i * h2) % self.width for i in range(self.depth)]
+
+    def add(self, h: int, count: int = 1) -> int:
+        """Count the item with hash `h` and return its new estimate"""
+        estimate = None
+        for row, idx in zip(self._rows, self._indexes(h)):
+            row[idx] += count
+            if estimate is None or row[idx] < estimate:
+                estimate = row[idx]
+        return estimate
+
+    def estimate(self, h: int) -> int:
+        return min(row[idx] for row, idx in zip(self._rows, self._indexes(h)))
+
+    def halve(self):
+        """Divide all counters by two, which ages out old frequencies"""
+        for row in self._rows:
+            for idx, value in enumerate(row):
+                row[idx] = value >> 1
+
+
+class TopK:
+    """The `k` most frequent items, as estimated by a count-min sketch"""
+
+    def __init__(self, k: int = 100, sketch: CountMinSketch = None):
+        self.k = k
+        self.sketch = sketch or CountMinSketch()
+        self._top: Dict[str, int] = {}
+        self._min = 0
+
+    def add(self, item: str, h: int = None) -> int:
+        estimate = self.sketch.add(hash64(item) if h is None else h)
+        if item in self._top:
+            self._top[item] = estimate
+        elif len(self._top) < self.k:
+            self._top[item] = estimate
+            self._min = min(self._top.values())
+        elif estimate > self._min:
+            del self._top[min(self._top, key=self._top.__getitem__)]
+            self._top[item] = estimate
+            self._min = min(self._top.values())
+        return estimate
+
+    def items(self) -> List[Tuple[str, int]]:
+        return sorted(self._top.items(), key=lambda i: i[1], reverse=True)
+
+
+class HyperLogLog:
+    """Approximate count of distinct items, standard error of `1.04 / sqrt(2^p)`"""
+
+    def __init__(self, p: int = 14):
+        self.p = p
+        self.m = 1 << p
+        self._registers = bytearray(self.m)
+
+    def add(self, h: int):
+        idx = h >> (64 - self.p)
+        rest = (h << self.p) & _MASK_64
+        rank = 64 - self.p + 1 if rest == 0 else 64 - rest.bit_length() + 1
+        if rank > self._registers[idx]:
+            self._registers[idx] = rank
+
+    def count(self) -> int:
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0**-r for r in self._registers)
+        zeros = self._registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)  # Linear counting for small sets
+        return round(estimate)
+
+
+class AccessSampler:
+    """Samples cache accesses to find hot keys, distinct keys and route hit ratios
+
+    Only a `sample_rate` fraction of accesses is recorded, frequencies reported by
+    `stats()` are scaled up accordingly. Enable it with
+    `CacheManager(sampler=AccessSampler())`.
+    """
+
+    def __init__(self, *, sample_rate: float = 0.1, top_k: int = 100):
+        self.sample_rate = sample_rate
+        self._top_k = top_k
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self._keys = TopK(self._top_k)
+        self._distinct = HyperLogLog()
+        self._routes: Dict[str, List[int]] = {}
+        self._sampled = 0
+        self._hits = 0
+
+    def _skip(self) -> bool:
+        return self.sample_rate < 1 and random.random() >= self.sample_rate
+
+    def record(self, key: str, hit: bool):
+        """Record an access of the given cache key"""
+        if self._skip():
+            return
+        h = hash64(key)
+        with self._lock:
+            self._sampled += 1
+            self._hits += hit
+            self._keys.add(key, h)
+            self._distinct.add(h)
+
+    def record_route(self, route: str, hit: bool):
+        """Record a response cache lookup for the given route"""
+        if self._skip():
+            return
+        with self._lock:
+            counts = self._routes.setdefault(route, [0, 0])
+            counts[0 if hit else 1] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        scale = 1 / self.sample_rate if self.sample_rate > 0 else 0
+        with self._lock:
+            routes = {}
+            for route, (hits, misses) in sorted(self._routes.items()):
+                routes[route] = {
+                    "hits": round(hits * scale),
+                    "misses": round(misses * scale),
+                    "hit_ratio": hits / (hits + misses),
+                }
+            return {
+                "sample_rate": self.sample_rate,
+                "sampled_accesses": self._sampled,
+                "hit_ratio": self._hits / self._sampled if self._sampled else None,
+                # NOTE: Keys which are never sampled aren't counted
+                "distinct_keys": self._distinct.count(),
+                "top_keys": [
+                    {"key": key, "accesses": round(count * scale)}
+                    for key, count in self._keys.items()
+                ],
+                "routes": routes,
+            }
+
+
+def analytics_router(sampler: AccessSampler, path: str = "/__cache/analytics"):
+    """Return a FastAPI router exposing the sampler's statistics at `path`
+
+    NOTE: Protect it like any other admin endpoint, cache keys include query
+          parameters.
+    """
+    from fastapi import APIRouter
+
+    router = APIRouter()
+
+    @router.get(path, include_in_schema=False)
+    async def cache_analytics():
+        return sampler.stats()
+
+    return router
@@ -1,25 +1,62 @@
+import asyncio
+import functools
 import logging
-import pickle
-from typing import Any, Optional, Sequence
+import math
+import os
+import pathlib
+import threading
+import time
+from concurrent.futures import Executor
+from contextvars import ContextVar
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 import cachetools
 
-from . import constants
+from . import constants, raw, snapshot
+from .admission import TinyLFUCache
 from .exceptions import CachingNotEnabled
+from .memo import current_memo
 from .raw import RawCacheObject
 
-try:
-    import aioredis
-except ImportError:
-    aioredis = None
+__all__ = ("RedisBackend", "InMemoryBackend", "NoOpBackend", "CacheEntry")
 
+logger = logging.getLogger(__name__)
 
-__all__ = ("RedisBackend", "InMemoryBackend", "NoOpBackend")
+# Seconds to skip a failed Redis replica for
+_REPLICA_RETRY_DELAY = 5.0
+# Expiry of tags with members that don't expire, which outlives the members that
+# do: EXPIREAT NX would otherwise let those expire a tag without expiry
+_TAG_NEVER_EXPIRES_AT = 253402300799  # 9999-12-31
 
-logger = logging.getLogger(__name__)
+
+class CacheEntry(NamedTuple):
+    """A single write, as accepted by `CacheBackendBase.set_many`"""
+
+    key: str
+    obj: Any
+    tags: Sequence[str] = ()
+    ttl: Optional[int] = None
 
 
 class CacheBackendBase:
+    _metrics = None
+    _sampler = None
+    _ttl = None
+    _compress_min_size = None
+    _offload_min_size = None
+    _offload_executor = None
+
     def setup(self):
         """Configure backend lazily, may be needed in advanced use cases"""
         # NOTE: Default method is a no-op
@@ -33,9 +70,86 @@ class CacheBackendBase:
     def is_enabled(self) -> bool:
         return getattr(self, "_is_enabled", True)
 
+    def set_metrics(self, metrics):
+        """Record metrics for backend operations, `None` disables instrumentation"""
+        self._metrics = metrics
+
+    def set_sampler(self, sampler):
+        """Sample accessed keys for analytics, `None` disables sampling"""
+        self._sampler = sampler
+
+    @property
+    def sampler(self):
+        return self._sampler
+
+    @property
+    def ttl(self) -> Optional[int]:
+        """TTL of entries set without one, `None` if they don't expire"""
+        return self._ttl
+
+    def set_offload(self, min_size: Optional[int], executor: Executor = None):
+        """(De)serialize entries of at least `min_size` bytes off the event loop
+
+        Uses the event loop's default thread pool unless an `executor` is given.
+        A `ProcessPoolExecutor` also moves the CPU time off the event loop
+        process. `None` keeps all (de)serialization inline. Writes are offloaded
+        if the size of their data, as estimated from its strings, bytes and
+        containers, is at least `min_size`.
+        """
+        self._offload_min_size = min_size
+        self._offload_executor = executor
+
     async def get(self, key: str) -> Optional[RawCacheObject]:
         self._ensure_enabled()
-        return await self._get_impl(key)
+        memo = current_memo()
+        if memo is not None:
+            try:
+                return memo[self, key]
+            except KeyError:
+                pass
+        if self._metrics is None:
+            obj = await self._get_impl(key)
+        else:
+            start = time.perf_counter()
+            try:
+                obj = await self._get_impl(key)
+            finally:
+                self._metrics.observe_duration("get", time.perf_counter() - start)
+        if self._sampler is not None:
+            self._sampler.record(key, obj is not None)
+        if memo is not None:
+            memo[self, key] = obj
+        return obj
+
+    async def get_many(self, keys: Sequence[str]) -> List[Optional[RawCacheObject]]:
+        """Fetch several entries at once, in a single round trip where supported"""
+        self._ensure_enabled()
+        memo = current_memo()
+        if memo is not None:
+            memoized = {key: memo[self, key] for key in keys if (self, key) in memo}
+            if len(memoized) == len(keys):
+                return [memoized[key] for key in keys]
+            missing = [key for key in keys if key not in memoized]
+            for key, obj in zip(missing, await self._get_many_uncached(missing)):
+                memo[self, key] = memoized[key] = obj
+            return [memoized[key] for key in keys]
+        return await self._get_many_uncached(keys)
+
+    async def _get_many_uncached(
+        self, keys: Sequence[str]
+    ) -> List[Optional[RawCacheObject]]:
+        if self._metrics is None:
+            objs = await self._get_many_impl(keys)
+        else:
+            start = time.perf_counter()
+            try:
+                objs = await self._get_many_impl(keys)
+            finally:
+                self._metrics.observe_duration("get_many", time.perf_counter() - start)
+        if self._sampler is not None:
+            for key, obj in zip(keys, objs):
+                self._sampler.record(key, obj is not None)
+        return objs
 
     async def set(
         self,
@@ -46,28 +160,140 @@ class CacheBackendBase:
         ttl: int = None,
     ) -> bool:
         self._ensure_enabled()
+        self._forget([key])
         if not isinstance(obj, RawCacheObject):
             obj = RawCacheObject(data=obj)
-        return await self._set_impl(key, obj, tags=tags, ttl=ttl)
+        if self._metrics is None:
+            return await self._set_impl(key, obj, tags=tags, ttl=ttl)
+        self._metrics.record_tags("set", tags)
+        start = time.perf_counter()
+        try:
+            return await self._set_impl(key, obj, tags=tags, ttl=ttl)
+        finally:
+            self._metrics.observe_duration("set", time.perf_counter() - start)
+
+    async def set_many(self, entries: Sequence[CacheEntry]) -> bool:
+        """Store several entries at once, in a single round trip where supported"""
+        self._ensure_enabled()
+        self._forget([e.key for e in entries])
+        entries = [
+            (
+                e._replace(obj=RawCacheObject(data=e.obj))
+                if not isinstance(e.obj, RawCacheObject)
+                else e
+            )
+            for e in entries
+        ]
+        if self._metrics is None:
+            return await self._set_many_impl(entries)
+        for entry in entries:
+            self._metrics.record_tags("set", entry.tags)
+        start = time.perf_counter()
+        try:
+            return await self._set_many_impl(entries)
+        finally:
+            self._metrics.observe_duration("set_many", time.perf_counter() - start)
 
     async def invalidate_tag(self, tag: str):
         """Delete cache entries associated with the given tag"""
         self._ensure_enabled()
-        return await self._invalidate_tag_impl(tag)
+        self._forget()
+        if self._metrics is None:
+            return await self._invalidate_tag_impl(tag)
+        self._metrics.record_tags("invalidate", [tag])
+        start = time.perf_counter()
+        try:
+            return await self._invalidate_tag_impl(tag)
+        finally:
+            self._metrics.observe_duration("invalidate", time.perf_counter() - start)
 
     async def invalidate_tags(self, tags: Sequence[str]):
         """Delete cache entries associated with the given tags"""
         self._ensure_enabled()
-        return await self._invalidate_tags_impl(tags)
+        self._forget()
+        if self._metrics is None:
+            return await self._invalidate_tags_impl(tags)
+        self._metrics.record_tags("invalidate", tags)
+        start = time.perf_counter()
+        try:
+            return await self._invalidate_tags_impl(tags)
+        finally:
+            self._metrics.observe_duration("invalidate", time.perf_counter() - start)
 
     async def reset(self):
         """Delete all stored cache related keys"""
         self._ensure_enabled()
+        self._forget()
         return await self._reset_impl()
 
+    def get_sync(self, key: str) -> Optional[RawCacheObject]:
+        """Synchronous version of `get`, for sync endpoints and worker threads"""
+        self._ensure_enabled()
+        if self._metrics is None:
+            obj = self._get_sync_impl(key)
+        else:
+            start = time.perf_counter()
+            try:
+                obj = self._get_sync_impl(key)
+            finally:
+                self._metrics.observe_duration("get", time.perf_counter() - start)
+        if self._sampler is not None:
+            self._sampler.record(key, obj is not None)
+        return obj
+
+    def set_sync(
+        self,
+        key: str,
+        obj: RawCacheObject,
+        *,
+        tags: Sequence[str] = (),
+        ttl: int = None,
+    ) -> bool:
+        """Synchronous version of `set`, for sync endpoints and worker threads"""
+        self._ensure_enabled()
+        self._forget([key])
+        if not isinstance(obj, RawCacheObject):
+            obj = RawCacheObject(data=obj)
+        if self._metrics is None:
+            return self._set_sync_impl(key, obj, tags=tags, ttl=ttl)
+        self._metrics.record_tags("set", tags)
+        start = time.perf_counter()
+        try:
+            return self._set_sync_impl(key, obj, tags=tags, ttl=ttl)
+        finally:
+            self._metrics.observe_duration("set", time.perf_counter() - start)
+
+    def invalidate_tag_sync(self, tag: str):
+        """Synchronous version of `invalidate_tag`"""
+        self.invalidate_tags_sync([tag])
+
+    def invalidate_tags_sync(self, tags: Sequence[str]):
+        """Synchronous version of `invalidate_tags`"""
+        self._ensure_enabled()
+        self._forget()
+        if self._metrics is None:
+            return self._invalidate_tags_sync_impl(tags)
+        self._metrics.record_tags("invalidate", tags)
+        start = time.perf_counter()
+        try:
+            return self._invalidate_tags_sync_impl(tags)
+        finally:
+            self._metrics.observe_duration("invalidate", time.perf_counter() - start)
+
+    def reset_sync(self):
+        """Synchronous version of `reset`"""
+        self._ensure_enabled()
+        self._forget()
+        return self._reset_sync_impl()
+
     async def _get_impl(self, key: str) -> Optional[RawCacheObject]:
         raise NotImplementedError
 
+    async def _get_many_impl(
+        self, keys: Sequence[str]
+    ) -> List[Optional[RawCacheObject]]:
+        return [await self._get_impl(key) for key in keys]
+
     async def _set_impl(
         self,
         key: str,
@@ -78,6 +304,12 @@ class CacheBackendBase:
     ) -> bool:
         raise NotImplementedError
 
+    async def _set_many_impl(self, entries: Sequence[CacheEntry]) -> bool:
+        results = [
+            await self._set_impl(e.key, e.obj, tags=e.tags, ttl=e.ttl) for e in entries
+        ]
+        return all(results)
+
     async def _invalidate_tag_impl(self, tag: str):
         raise NotImplementedError
 
@@ -87,17 +319,132 @@ class CacheBackendBase:
     async def _reset_impl(self):
         raise NotImplementedError
 
-    def _dumps(self, obj: Any) -> bytes:
-        return pickle.dumps(obj)
+    # NOTE: The sync implementations default to running the async ones. Backends
+    #       with natively synchronous storage should override them.
 
-    def _loads(self, raw: bytes) -> Any:
-        return pickle.loads(raw)
+    def _get_sync_impl(self, key: str) -> Optional[RawCacheObject]:
+        return self._run_sync(self._get_impl(key))
+
+    def _set_sync_impl(
+        self,
+        key: str,
+        cache_object: RawCacheObject,
+        *,
+        tags: Sequence[str] = (),
+        ttl: int = None,
+    ) -> bool:
+        return self._run_sync(self._set_impl(key, cache_object, tags=tags, ttl=ttl))
+
+    def _invalidate_tags_sync_impl(self, tags: Sequence[str]):
+        return self._run_sync(self._invalidate_tags_impl(tags))
+
+    def _reset_sync_impl(self):
+        return self._run_sync(self._reset_impl())
+
+    def _run_sync(self, coro):
+        """Run the coroutine on the event loop the backend is bound to, if any
+
+        Connections of e.g. `RedisBackend` belong to the event loop they were
+        created in, so the coroutine is submitted to that loop when it's running
+        in another thread. Otherwise it runs on a new event loop, see
+        `_run_detached`.
+        """
+        loop = getattr(self, "_loop", None)
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is not None:
+            coro.close()
+            raise RuntimeError(
+                "The sync cache API can't be used from within an event loop, "
+                "use the async methods instead"
+            )
+        elif loop is not None and loop.is_running():
+            return asyncio.run_coroutine_threadsafe(coro, loop).result()
+        else:
+            return asyncio.run(self._run_detached(coro))
+
+    async def _run_detached(self, coro):
+        """Run the coroutine on a short-lived event loop of its own
+
+        NOTE: Nothing bound to this loop, e.g. connections, may outlive the call
+        """
+        return await coro
+
+    def _dumps(self, obj: RawCacheObject) -> bytes:
+        dumped = raw.dumps(obj, compress_min_size=self._compress_min_size)
+        if self._metrics is not None:
+            self._metrics.observe_size(len(dumped))
+        return dumped
+
+    def _loads(self, dumped: bytes) -> RawCacheObject:
+        return raw.loads(dumped)
+
+    async def _dumps_async(self, obj: RawCacheObject) -> bytes:
+        min_size = self._offload_min_size
+        if min_size is None or _estimate_size(obj.data, min_size) < min_size:
+            return self._dumps(obj)
+        dumps = functools.partial(raw.dumps, compress_min_size=self._compress_min_size)
+        dumped = await asyncio.get_running_loop().run_in_executor(
+            self._offload_executor, dumps, obj
+        )
+        if self._metrics is not None:
+            self._metrics.observe_size(len(dumped))
+        return dumped
+
+    async def _loads_async(self, dumped: bytes) -> RawCacheObject:
+        min_size = self._offload_min_size
+        if min_size is None or len(dumped) < min_size:
+            return self._loads(dumped)
+        return await asyncio.get_running_loop().run_in_executor(
+            self._offload_executor, raw.loads, dumped
+        )
+
+    def _forget(self, keys: Sequence[str] = None):
+        """Drop memoized reads of the keys, or all of them, see `memo`"""
+        memo = current_memo()
+        if not memo:
+            return
+        if keys is None:
+            memo.clear()
+            return
+        for key in keys:
+            memo.pop((self, key), None)
 
     def _ensure_enabled(self):
         if not self.is_enabled():
             raise CachingNotEnabled()
 
 
+def _estimate_size(data: Any, limit: int) -> int:
+    """Estimate the serialized size of `data`, stopping once it reaches `limit`
+
+    Only strings and bytes are counted in full, other values count as 8 bytes.
+    Much cheaper than serializing, as the data is walked without copying it.
+    """
+    size = 0
+    stack = [data]
+    while stack and size < limit:
+        item = stack.pop()
+        if isinstance(item, (str, bytes, bytearray)):
+            size += len(item)
+        elif isinstance(item, dict):
+            size += 8 * len(item)
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            size += 8 * len(item)
+            stack.extend(item)
+        elif hasattr(item, "__dict__"):
+            # E.g. pydantic models and dataclasses
+            size += 8
+            stack.append(vars(item))
+        else:
+            size += 8
+    return size
+
+
 class NoOpBackend(CacheBackendBase):
     async def _get_impl(self, key: str) -> Optional[RawCacheObject]:
         return None
@@ -122,26 +469,139 @@ class NoOpBackend(CacheBackendBase):
         pass
 
 
+class _Clock:
+    """Monotonic clock which can be shifted, to set entries with a shorter TTL"""
+
+    __slots__ = ("offset",)
+
+    def __init__(self):
+        self.offset = 0.0
+
+    def __call__(self) -> float:
+        return time.monotonic() + self.offset
+
+
+class _TTLCache(cachetools.TTLCache):
+    """TTL cache which reports entries evicted due to its size limit"""
+
+    def __init__(self, maxsize: int, ttl: int, on_evict):
+        self._clock = _Clock()
+        super().__init__(maxsize, ttl, timer=self._clock)
+        self._on_evict = on_evict
+
+    def set(self, key, value, ttl: float = None):
+        """Set an entry which expires in `ttl` seconds, at most the cache's TTL
+
+        NOTE: The cache expects entries to be set in order of expiry. Entries
+              expiring before ones set earlier are treated as missing once
+              expired, but only removed when accessed or evicted.
+        """
+        if ttl is None:
+            self[key] = value
+            return
+        self._clock.offset = min(0.0, ttl - self.ttl)
+        try:
+            self[key] = value
+        finally:
+            self._clock.offset = 0.0
+
+    def expiring_items(self) -> Iterator[Tuple[Any, Any, float]]:
+        """Unexpired `(key, value, expires_at)` entries, expiring by the timer"""
+        now = self.timer()
+        # NOTE: The links of `cachetools.TTLCache` hold the expiry of each entry
+        for key, link in list(self._TTLCache__links.items()):
+            if link.expires > now:
+                yield key, cachetools.Cache.__getitem__(self, key), link.expires
+
+    def popitem(self):
+        item = super().popitem()
+        self._on_evict()
+        return item
+
+
+class _Stripe:
+    __slots__ = ("lock", "cache")
+
+    def __init__(self, cache):
+        self.lock = threading.Lock()
+        self.cache = cache
+
+
 class InMemoryBackend(CacheBackendBase):
+    """Process local cache backend
+
+    `admission` selects how entries are kept when the cache is full: "lru" evicts
+    the least recently used entry, while "tinylfu" only admits new entries that
+    are likely to be used more often than the entry they would replace.
+
+    The backend is thread-safe, and can be used from sync endpoints and worker
+    threads through the `*_sync` methods. Entries are spread over `stripes`
+    independently locked caches (each holding `maxsize / stripes` entries), so
+    that threads don't contend for a single lock.
+
+    Entries expire after the TTL they're set with, e.g. the short TTL of cached
+    errors, but never later than the backend's `ttl`.
+
+    `snapshot` writes the entries and tag index to a file, e.g. on shutdown, and
+    `restore` loads them again on startup, so that restarts don't start with a
+    cold cache. Snapshots are only restored by a backend with the same
+    `app_version`.
+    """
+
     def __init__(
-        self, maxsize: int = 50_000, ttl: int = constants.DEFAULT_TTL,
+        self,
+        maxsize: int = 50_000,
+        ttl: int = constants.DEFAULT_TTL,
+        admission: str = "lru",
+        stripes: int = 16,
+        app_version: str = None,
     ):
-        self._cached = cachetools.TTLCache(maxsize, ttl)
+        self._tag_lock = threading.Lock()
         self._tag_to_keys = {}
+        self._app_version = app_version
+        self._setup_stripes(maxsize, ttl, admission, stripes)
 
     def setup(
-        self, *, maxsize: int = 50_000, ttl: int = constants.DEFAULT_TTL,
+        self,
+        *,
+        maxsize: int = 50_000,
+        ttl: int = constants.DEFAULT_TTL,
+        admission: str = "lru",
+        stripes: int = 16,
+        app_version: str = None,
     ):
         """Configure backend lazily, may be needed in advanced use cases"""
-        self._cached = cachetools.TTLCache(maxsize, ttl)
+        if app_version is not None:
+            self._app_version = app_version
+        self._setup_stripes(maxsize, ttl, admission, stripes)
 
-    async def _get_impl(self, key: str) -> Optional[RawCacheObject]:
-        try:
-            obj = self._cached[key]
-        except KeyError:
-            return None
+    def _setup_stripes(self, maxsize: int, ttl: int, admission: str, stripes: int):
+        self._ttl = ttl
+        stripes = max(1, min(stripes, maxsize))
+        stripe_maxsize = -(-maxsize // stripes)  # Rounded up
+        self._stripes = [
+            _Stripe(self._make_cache(stripe_maxsize, ttl, admission))
+            for _ in range(stripes)
+        ]
+
+    def _make_cache(self, maxsize: int, ttl: int, admission: str):
+        if admission == "lru":
+            return _TTLCache(maxsize, ttl, self._record_eviction)
+        elif admission == "tinylfu":
+            return TinyLFUCache(maxsize, ttl, on_evict=self._record_eviction)
         else:
-            return self._loads(obj)
+            raise ValueError(f"Unsupported admission policy: {admission}")
+
+    def _record_eviction(self):
+        if self._metrics is not None:
+            self._metrics.record_eviction()
+
+    def _stripe(self, key: str) -> _Stripe:
+        return self._stripes[hash(key) % len(self._stripes)]
+
+    async def _get_impl(self, key: str) -> Optional[RawCacheObject]:
+        obj = self._get_dumped(key)
+        return None if obj is None else await self._loads_async(obj)
 
     async def _set_impl(
         self,
@@ -151,33 +611,176 @@ class InMemoryBackend(CacheBackendBase):
         tags: Sequence[str] = (),
         ttl: int = None,
     ) -> bool:
-        self._cached[key] = self._dumps(cache_object)
-        for tag in tags:
-            tag_keys = self._tag_to_keys.setdefault(tag, [])
-            tag_keys.append(key)
-        return True
+        dumped = await self._dumps_async(cache_object)
+        return self._store(key, dumped, tags, ttl)
 
     async def _invalidate_tag_impl(self, tag: str):
-        try:
-            keys = self._tag_to_keys[tag]
-        except KeyError:
-            return
-        else:
-            for key in keys:
-                self._cached.pop(key, None)
-            del self._tag_to_keys[tag]
+        self._invalidate_tags_sync_impl([tag])
 
     async def _invalidate_tags_impl(self, tags: Sequence[str]):
-        for tag in tags:
-            await self.invalidate_tag(tag)
+        self._invalidate_tags_sync_impl(tags)
 
     async def _reset_impl(self):
+        self._reset_sync_impl()
+
+    def _get_sync_impl(self, key: str) -> Optional[RawCacheObject]:
+        obj = self._get_dumped(key)
+        return None if obj is None else self._loads(obj)
+
+    def _get_dumped(self, key: str) -> Optional[bytes]:
+        stripe = self._stripe(key)
+        with stripe.lock:
+            return stripe.cache.get(key)
+
+    def _set_sync_impl(
+        self,
+        key: str,
+        cache_object: RawCacheObject,
+        *,
+        tags: Sequence[str] = (),
+        ttl: int = None,
+    ) -> bool:
+        return self._store(key, self._dumps(cache_object), tags, ttl)
+
+    def _store(
+        self, key: str, dumped: bytes, tags: Sequence[str], ttl: Optional[int]
+    ) -> bool:
+        stripe = self._stripe(key)
+        with stripe.lock:
+            stripe.cache.set(key, dumped, ttl=min(ttl, self._ttl) if ttl else None)
+        if tags:
+            with self._tag_lock:
+                for tag in tags:
+                    self._tag_to_keys.setdefault(tag, set()).add(key)
+        return True
+
+    def _invalidate_tags_sync_impl(self, tags: Sequence[str]):
+        keys = set()
+        with self._tag_lock:
+            for tag in tags:
+                keys.update(self._tag_to_keys.pop(tag, ()))
+        for key in keys:
+            stripe = self._stripe(key)
+            with stripe.lock:
+                stripe.cache.pop(key, None)
+
+    def _reset_sync_impl(self):
         """Reset cache completely"""
-        self._cached = {}
-        self._tag_to_keys = {}
+        for stripe in self._stripes:
+            with stripe.lock:
+                stripe.cache.clear()
+        with self._tag_lock:
+            self._tag_to_keys = {}
+
+    async def snapshot(self, path: Union[pathlib.Path, str]) -> int:
+        """Write all unexpired entries and the tag index to the file at `path`
+
+        Returns the number of written entries.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.snapshot_sync, path)
+
+    async def restore(self, path: Union[pathlib.Path, str]) -> int:
+        """Load the unexpired entries of a snapshot written by `snapshot`
+
+        Entries keep their remaining TTL, existing entries are kept. A missing
+        or incompatible snapshot is ignored. Returns the number of restored
+        entries.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.restore_sync, path)
+
+    def snapshot_sync(self, path: Union[pathlib.Path, str]) -> int:
+        """Synchronous version of `snapshot`"""
+        now = time.time()
+        entries = []
+        for stripe in self._stripes:
+            with stripe.lock:
+                items = list(stripe.cache.expiring_items())
+                # The caches expire entries by the monotonic clock
+                offset = now - time.monotonic()
+            for key, dumped, expires_at in items:
+                entries.append((expires_at + offset, key, dumped))
+        # NOTE: Ordered by expiry, as the caches expect them to be restored
+        entries.sort(key=lambda e: e[0])
+        keys = {key for _, key, _ in entries}
+        with self._tag_lock:
+            tags = {
+                tag: [key for key in tag_keys if key in keys]
+                for tag, tag_keys in self._tag_to_keys.items()
+            }
+        snapshot.write(
+            os.fspath(path),
+            app_version=self._app_version,
+            created_at=now,
+            entries=entries,
+            tags={tag: tag_keys for tag, tag_keys in tags.items() if tag_keys},
+        )
+        return len(entries)
+
+    def restore_sync(self, path: Union[pathlib.Path, str]) -> int:
+        """Synchronous version of `restore`"""
+        now = time.time()
+        restored = set()
+
+        def restore_entry(expires_at: float, key: str, dumped: bytes):
+            stripe = self._stripe(key)
+            with stripe.lock:
+                if key not in stripe.cache:
+                    stripe.cache.set(key, dumped, ttl=expires_at - now)
+                    restored.add(key)
+
+        try:
+            tags = snapshot.read(
+                os.fspath(path),
+                app_version=self._app_version,
+                now=now,
+                on_entry=restore_entry,
+            )
+        except FileNotFoundError:
+            return 0
+        except snapshot.SnapshotError as exc:
+            logger.warning("Not restoring cache snapshot %s: %s", path, exc)
+            # Entries without their tags couldn't be invalidated
+            for key in restored:
+                stripe = self._stripe(key)
+                with stripe.lock:
+                    stripe.cache.pop(key, None)
+            return 0
+
+        with self._tag_lock:
+            for tag, keys in tags.items():
+                keys = [key for key in keys if key in restored]
+                if keys:
+                    self._tag_to_keys.setdefault(tag, set()).update(keys)
+        return len(restored)
 
 
 class RedisBackend(CacheBackendBase):
+    """Cache backend built on the `redis.asyncio` client
+
+    Keys associated with a tag are kept in a sorted set scored by their expiry
+    time. Expired members are trimmed whenever the tag is written to, and the
+    set itself expires together with its longest lived member. With `ttl=None`,
+    entries set without a TTL never expire, and neither do their tags. Use
+    `start_tag_sweeper` to also prune tags which are no longer written to.
+
+    Setting `client_tracking` enables server-assisted client side caching: values
+    read from Redis are kept in a local cache, and Redis pushes invalidation
+    messages (`CLIENT TRACKING ... BCAST`) whenever a key under the backend's
+    prefix is modified or expires.
+
+    Entries of at least `compress_min_size` bytes are compressed with zlib, which
+    trades CPU time for less memory and network traffic.
+
+    Reads go to the first available of the given `replicas` ("host:port",
+    `(host, port)` or a client), so list the nearest ones first. Writes and
+    invalidations go to the primary at `host`/`port`, and keys written or
+    invalidated by this process are read from the primary for the next
+    `read_your_writes` seconds. A replica that fails is skipped for a few
+    seconds, and the read is retried on the primary.
+    """
+
     def __init__(
         self,
         *,
@@ -188,6 +791,12 @@ class RedisBackend(CacheBackendBase):
         app_version: str = None,
         ttl: int = constants.DEFAULT_TTL,
         redis: Any = None,
+        protocol: int = 2,
+        client_tracking: bool = False,
+        local_cache_maxsize: int = 10_000,
+        compress_min_size: int = None,
+        replicas: Sequence[Any] = (),
+        read_your_writes: float = 1.0,
     ):
         self._app_version = app_version
         self._host = host
@@ -196,6 +805,30 @@ class RedisBackend(CacheBackendBase):
         self._prefix = prefix
         self._ttl = ttl
         self._redis = redis
+        self._protocol = protocol
+        self._client_tracking = client_tracking
+        self._local_cache_maxsize = local_cache_maxsize
+        self._compress_min_size = compress_min_size
+        self._local_cache = None
+        # In-flight reads per prefixed key, and the keys invalidated meanwhile,
+        # whose replies mustn't be kept in the local cache
+        self._local_fills: Dict[str, int] = {}
+        self._stale_fills = set()
+        self._tracking_task = None
+        self._tracking_connections = ()
+        self._sweeper_task = None
+        self._loop = None
+        self._replica_specs = list(replicas)
+        self._replicas = None
+        self._replica_down_until = {}
+        self._read_your_writes = read_your_writes
+        # Prefixed keys recently written or invalidated by this process
+        self._recent_writes = None
+        self._primary_until = 0.0
+        # Client used by the sync API while no event loop is bound, see `_run_sync`
+        self._detached_redis: ContextVar[Any] = ContextVar(
+            f"detached_redis_{id(self)}", default=None
+        )
         self._setup_prefix(prefix)
 
     def setup(
@@ -207,6 +840,11 @@ class RedisBackend(CacheBackendBase):
         prefix: str = None,
         app_version: str = None,
         ttl: int = None,
+        protocol: int = None,
+        client_tracking: bool = None,
+        compress_min_size: int = None,
+        replicas: Sequence[Any] = None,
+        read_your_writes: float = None,
     ):
         """Configure backend lazily, may be needed in advanced use cases"""
         if host is not None:
@@ -221,6 +859,18 @@ class RedisBackend(CacheBackendBase):
             self._app_version = app_version
         if ttl is not None:
             self._ttl = ttl
+        if protocol is not None:
+            self._protocol = protocol
+        if client_tracking is not None:
+            self._client_tracking = client_tracking
+        if compress_min_size is not None:
+            self._compress_min_size = compress_min_size
+        if replicas is not None:
+            self._replica_specs = list(replicas)
+            self._replicas = None
+        if read_your_writes is not None:
+            self._read_your_writes = read_your_writes
+            self._recent_writes = None
 
     def _setup_prefix(self, prefix: str):
         if not prefix:
@@ -237,11 +887,36 @@ class RedisBackend(CacheBackendBase):
 
     async def _get_impl(self, key: str) -> Optional[RawCacheObject]:
         redis = await self._get_redis()
-        obj = await redis.get(self._prefixed(key))
+        prefixed_key = self._prefixed(key)
+        local_cache = self._local_cache
+        if local_cache is not None and prefixed_key in local_cache:
+            obj = local_cache[prefixed_key]
+        else:
+            (obj,) = await self._read_and_fill(redis, [prefixed_key])
         if obj is None:
             return None
         else:
-            return self._loads(obj)
+            return await self._loads_async(obj)
+
+    async def _get_many_impl(
+        self, keys: Sequence[str]
+    ) -> List[Optional[RawCacheObject]]:
+        redis = await self._get_redis()
+        prefixed_keys = [self._prefixed(key) for key in keys]
+        local_cache = self._local_cache
+        dumped = {}
+        if local_cache is not None:
+            for prefixed_key in prefixed_keys:
+                if prefixed_key in local_cache:
+                    dumped[prefixed_key] = local_cache[prefixed_key]
+        missing = [k for k in prefixed_keys if k not in dumped]
+        if missing:
+            objs = await self._read_and_fill(redis, missing)
+            dumped.update(zip(missing, objs))
+        return [
+            None if dumped[k] is None else await self._loads_async(dumped[k])
+            for k in prefixed_keys
+        ]
 
     async def _set_impl(
         self,
@@ -251,40 +926,67 @@ class RedisBackend(CacheBackendBase):
         tags: Sequence[str] = (),
         ttl: int = None,
     ) -> bool:
+        return await self._set_many_impl([CacheEntry(key, cache_object, tags, ttl)])
+
+    async def _set_many_impl(self, entries: Sequence[CacheEntry]) -> bool:
         redis = await self._get_redis()
-        dumped = self._dumps(cache_object)
-        tr = redis.multi_exec()
+        now = time.time()
 
-        tr.set(self._prefixed(key), dumped, expire=ttl or self._ttl)
+        set_positions = []
+        dumped = [await self._dumps_async(e.obj) for e in entries]
 
-        for tag in tags:
-            logger.debug(f"Adding key {key} to tag {tag}")
-            tr.sadd(self._prefixed(f"tags_to_keys:{tag}"), key)
+        async with redis.pipeline(transaction=True) as pipe:
+            for (key, _, tags, ttl), value in zip(entries, dumped):
+                ttl = ttl or self._ttl
+                if ttl:
+                    score = now + ttl
+                    tag_expires_at = math.ceil(score)
+                else:
+                    # The entry doesn't expire
+                    score = float("inf")
+                    tag_expires_at = _TAG_NEVER_EXPIRES_AT
+                set_positions.append(len(pipe))
+                pipe.set(self._prefixed(key), value, ex=ttl or None)
+                for tag in tags:
+                    logger.debug("Adding key %s to tag %s", key, tag)
+                    tag_key = self._tag_key(tag)
+                    pipe.zremrangebyscore(tag_key, "-inf", now)
+                    pipe.zadd(tag_key, {key: score})
+                    # Push the expiry of the tag forward to its longest lived member
+                    pipe.expireat(tag_key, tag_expires_at, nx=True)
+                    pipe.expireat(tag_key, tag_expires_at, gt=True)
+            results = await pipe.execute()
 
-        success, *rest = await tr.execute()
-        return success
+        prefixed_keys = [self._prefixed(e.key) for e in entries]
+        # NOTE: Don't wait for Redis to push the invalidation of our own writes
+        self._evict_local(prefixed_keys)
+        self._note_writes(prefixed_keys)
+        return all(results[pos] for pos in set_positions)
 
     async def _invalidate_tag_impl(self, tag: str):
-        await self.invalidate_tags([tag])
+        await self._invalidate_tags_impl([tag])
 
     async def _invalidate_tags_impl(self, tags: Sequence[str]):
         redis = await self._get_redis()
+        tags = list(dict.fromkeys(tags))
+        tag_keys = [self._tag_key(tag) for tag in tags]
+
+        # Fetch the members of all tags in a single round trip
+        async with redis.pipeline(transaction=False) as pipe:
+            for tag_key in tag_keys:
+                pipe.zrange(tag_key, 0, -1)
+            members = await pipe.execute()
 
         all_keys = []
-        for tag in tags:
-            tag_key = self._prefixed(f"tags_to_keys:{tag}")
-            keys = [
-                *(
-                    self._prefixed(k)
-                    for k in await redis.smembers(tag_key, encoding="utf-8",)
-                ),
-                tag_key,
-            ]
-            logger.debug(f"Invalidating tag {tag}, containing the given keys: {keys}")
+        for tag, tag_key, tag_members in zip(tags, tag_keys, members):
+            keys = [*(self._prefixed(k.decode()) for k in tag_members), tag_key]
+            logger.debug("Invalidating tag %s, containing the keys: %s", tag, keys)
             all_keys.extend(keys)
 
         if len(all_keys) > 0:
             await redis.unlink(*all_keys)
+            self._evict_local(all_keys)
+            self._note_writes(all_keys)
 
     async def _reset_impl(self):
         await self._unlink_by_prefix(self._prefix)
@@ -294,18 +996,306 @@ class RedisBackend(CacheBackendBase):
         full_prefix = self._get_full_prefix()
         await self._unlink_by_prefix(full_prefix)
 
+    async def copy_from_version(
+        self, app_version: str, keys: Sequence[str] = None
+    ) -> int:
+        """Copy entries stored by another app version into the current one
+
+        Useful for warming the cache after a deploy, as long as the cached data
+        is compatible between the two versions. Copies all entries unless `keys`
+        is given. Tags are always copied. Existing entries are kept.
+
+        Returns the number of copied keys.
+        """
+        redis = await self._get_redis()
+        source_prefix = f"{self._prefix}:{app_version}:"
+        if keys is None:
+            pattern = f"{source_prefix}*"
+            sources = []
+        else:
+            pattern = f"{source_prefix}tag_index:*"
+            sources = [f"{source_prefix}{k}" for k in keys]
+        async for source in redis.scan_iter(match=pattern, count=1000):
+            sources.append(source.decode())
+
+        async with redis.pipeline(transaction=False) as pipe:
+            for source in sources:
+                pipe.copy(source, self._prefixed(source[len(source_prefix) :]))
+            copied = sum(await pipe.execute())
+        self._note_writes(None)
+        logger.debug("Copied %d keys from app version %s", copied, app_version)
+        return copied
+
+    async def sweep_tags(self, *, now: float = None) -> int:
+        """Remove expired keys from all tags of the current app version
+
+        Returns the number of removed tag members.
+        """
+        redis = await self._get_redis()
+        if now is None:
+            now = time.time()
+        removed = 0
+        async with redis.pipeline(transaction=False) as pipe:
+            async for tag_key in redis.scan_iter(match=self._tag_key("*"), count=1000):
+                pipe.zremrangebyscore(tag_key, "-inf", now)
+                if len(pipe) >= 1000:
+                    removed += sum(await pipe.execute())
+            removed += sum(await pipe.execute())
+        logger.debug("Removed %d expired tag members", removed)
+        return removed
+
+    def start_tag_sweeper(self, interval: float = 300):
+        """Periodically remove expired keys from all tags in the background
+
+        Must be called from within a running event loop, e.g. a startup hook.
+        """
+        if self._sweeper_task is None:
+            self._sweeper_task = asyncio.ensure_future(self._sweep_forever(interval))
+
+    async def _sweep_forever(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.sweep_tags()
+            except Exception:
+                logger.exception("Failed to sweep expired tag members")
+
+    async def close(self):
+        """Stop background tasks and close the Redis connections"""
+        if self._sweeper_task is not None:
+            self._sweeper_task.cancel()
+            self._sweeper_task = None
+        if self._tracking_task is not None:
+            self._tracking_task.cancel()
+            self._tracking_task = None
+        for connection in self._tracking_connections:
+            await connection.disconnect()
+        self._tracking_connections = ()
+        self._local_cache = None
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+        for replica in self._replicas or ():
+            await replica.aclose()
+        self._replicas = None
+        self._loop = None
+
+    async def _run_detached(self, coro):
+        # NOTE: The client's connections would belong to the short-lived loop,
+        #       so a client of its own is used, or the given client's
+        #       connections are closed afterwards
+        own_client = self._redis is None
+        redis = self._make_redis() if own_client else self._redis
+        token = self._detached_redis.set(redis)
+        try:
+            return await coro
+        finally:
+            self._detached_redis.reset(token)
+            if own_client:
+                await redis.aclose()
+            else:
+                await redis.connection_pool.disconnect()
+
     async def _get_redis(self):
+        detached_redis = self._detached_redis.get()
+        if detached_redis is not None:
+            return detached_redis
+        if self._loop is None:
+            # The connections belong to this loop, which the sync API then uses
+            self._loop = asyncio.get_running_loop()
         if self._redis is None:
-            if aioredis is None:
-                raise RuntimeError(
-                    "Cannot instantiate Redis backend without aioredis installed",
-                )
-            else:
-                self._redis = await aioredis.create_redis_pool(
-                    f"redis://{self._host}:{self._port}", password=self._password
-                )
+            self._redis = self._make_redis()
+        if self._client_tracking and self._tracking_task is None:
+            await self._start_tracking(self._redis)
         return self._redis
 
+    def _make_redis(self):
+        # NOTE: Imported lazily, as redis is optional and slow to import
+        try:
+            from redis import asyncio as aioredis
+        except ImportError:
+            raise RuntimeError(
+                "Cannot instantiate Redis backend without redis installed",
+            ) from None
+        return aioredis.Redis(
+            host=self._host,
+            port=self._port,
+            password=self._password,
+            protocol=self._protocol,
+        )
+
+    def _get_replicas(self) -> List[Any]:
+        if self._replicas is None:
+            from redis import asyncio as aioredis
+
+            self._replicas = []
+            for spec in self._replica_specs:
+                if isinstance(spec, str):
+                    host, _, port = spec.partition(":")
+                    spec = (host, int(port or self._port))
+                if isinstance(spec, tuple):
+                    spec = aioredis.Redis(
+                        host=spec[0],
+                        port=spec[1],
+                        password=self._password,
+                        protocol=self._protocol,
+                    )
+                self._replicas.append(spec)
+        return self._replicas
+
+    def _pick_replica(self, prefixed_keys: Sequence[str]) -> Optional[Tuple[int, Any]]:
+        if not self._replica_specs or self._detached_redis.get() is not None:
+            return None
+        now = time.monotonic()
+        if now < self._primary_until:
+            return None
+        recent_writes = self._recent_writes
+        if recent_writes and any(k in recent_writes for k in prefixed_keys):
+            return None
+        for i, replica in enumerate(self._get_replicas()):
+            if self._replica_down_until.get(i, 0.0) <= now:
+                return i, replica
+        return None
+
+    async def _read(
+        self, redis, prefixed_keys: Sequence[str], command: str, *args
+    ) -> Tuple[Any, bool]:
+        """Run a read command on a replica if possible, else on the primary
+
+        Also returns whether the result came from the primary.
+        """
+        replica = self._pick_replica(prefixed_keys)
+        if replica is not None:
+            from redis.exceptions import ConnectionError, TimeoutError
+
+            i, client = replica
+            try:
+                return await getattr(client, command)(*args), False
+            except (ConnectionError, TimeoutError, OSError):
+                logger.warning("Redis replica %d failed, reading from the primary", i)
+                self._replica_down_until[i] = time.monotonic() + _REPLICA_RETRY_DELAY
+        return await getattr(redis, command)(*args), True
+
+    async def _read_and_fill(self, redis, prefixed_keys: List[str]) -> List[Any]:
+        """Read the keys, keeping the values read from the primary locally
+
+        Values of keys invalidated while they were read aren't kept, as they may
+        be older than the invalidation.
+        """
+        local_cache = self._local_cache
+        if len(prefixed_keys) == 1:
+            command, args = "get", prefixed_keys
+        else:
+            command, args = "mget", [prefixed_keys]
+        if local_cache is None:
+            result, _ = await self._read(redis, prefixed_keys, command, *args)
+            return [result] if command == "get" else result
+
+        for prefixed_key in prefixed_keys:
+            self._local_fills[prefixed_key] = self._local_fills.get(prefixed_key, 0) + 1
+        stale = set()
+        try:
+            result, from_primary = await self._read(
+                redis, prefixed_keys, command, *args
+            )
+        finally:
+            for prefixed_key in prefixed_keys:
+                if prefixed_key in self._stale_fills:
+                    stale.add(prefixed_key)
+                count = self._local_fills.pop(prefixed_key) - 1
+                if count:
+                    self._local_fills[prefixed_key] = count
+                else:
+                    self._stale_fills.discard(prefixed_key)
+        objs = [result] if command == "get" else result
+        if from_primary and local_cache is self._local_cache:
+            for prefixed_key, obj in zip(prefixed_keys, objs):
+                if obj is not None and prefixed_key not in stale:
+                    local_cache[prefixed_key] = obj
+        return objs
+
+    def _note_writes(self, prefixed_keys: Optional[Iterable[str]]):
+        """Read the keys, or all keys if None, from the primary for a while"""
+        if not self._replica_specs or self._read_your_writes <= 0:
+            return
+        if prefixed_keys is None:
+            self._primary_until = time.monotonic() + self._read_your_writes
+            return
+        if self._recent_writes is None:
+            self._recent_writes = cachetools.TTLCache(
+                100_000, self._read_your_writes, timer=time.monotonic
+            )
+        for prefixed_key in prefixed_keys:
+            self._recent_writes[prefixed_key] = True
+
+    async def _start_tracking(self, redis):
+        pool = redis.connection_pool
+        # The listener is always a RESP2 connection: the invalidation messages are
+        # then delivered as regular pub/sub messages on `__redis__:invalidate`,
+        # regardless of the protocol used by the pooled connections.
+        connection_kwargs = {**pool.connection_kwargs, "protocol": 2}
+        listener = pool.connection_class(**connection_kwargs)
+        tracker = pool.connection_class(**connection_kwargs)
+
+        await listener.connect()
+        await listener.send_command("CLIENT", "ID")
+        client_id = await listener.read_response()
+        await listener.send_command("SUBSCRIBE", "__redis__:invalidate")
+        await listener.read_response()
+
+        await tracker.connect()
+        await tracker.send_command(
+            "CLIENT",
+            "TRACKING",
+            "ON",
+            "REDIRECT",
+            client_id,
+            "BCAST",
+            "PREFIX",
+            f"{self._prefix}:",
+        )
+        await tracker.read_response()
+
+        self._tracking_connections = (listener, tracker)
+        if self._ttl:
+            self._local_cache = cachetools.TTLCache(
+                self._local_cache_maxsize, self._ttl
+            )
+        else:
+            self._local_cache = cachetools.LRUCache(self._local_cache_maxsize)
+        self._tracking_task = asyncio.ensure_future(self._listen_for_invalidations())
+
+    async def _listen_for_invalidations(self):
+        listener, _ = self._tracking_connections
+        try:
+            while True:
+                kind, _, keys = await listener.read_response()
+                if kind != b"message":
+                    continue
+                elif keys is None:
+                    # Sent when the server's database is flushed
+                    self._clear_local()
+                else:
+                    self._evict_local(k.decode() for k in keys)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Client side cache tracking failed, disabling it")
+            # Without invalidation messages the local cache can't be trusted
+            self._local_cache = None
+
+    def _evict_local(self, prefixed_keys):
+        if self._local_cache is not None:
+            for key in prefixed_keys:
+                self._local_cache.pop(key, None)
+                if key in self._local_fills:
+                    self._stale_fills.add(key)
+
+    def _clear_local(self):
+        if self._local_cache is not None:
+            self._local_cache.clear()
+            self._stale_fills.update(self._local_fills)
+
     async def _unlink_by_prefix(self, prefix: str):
         if prefix.endswith(":"):
             prefix = prefix[0:-1]
@@ -317,10 +1307,17 @@ class RedisBackend(CacheBackendBase):
             redis.call('unlink', unpack(keys, i, math.min(i+4999, #keys)))
                 end
             return keys""",
-            args=[f"{prefix}:*"],
+            0,
+            f"{prefix}:*",
         )
-        unlinked_keys = ", ".join(k.decode() for k in resp)
-        logger.debug(f"Unlinked keys: {unlinked_keys}")
+        self._clear_local()
+        self._note_writes(None)
+        if logger.isEnabledFor(logging.DEBUG):
+            unlinked_keys = ", ".join(k.decode() for k in resp)
+            logger.debug("Unlinked keys: %s", unlinked_keys)
+
+    def _tag_key(self, tag: str) -> str:
+        return self._prefixed(f"tag_index:{tag}")
 
     def _prefixed(self, unprefixed_key: str) -> str:
         full_prefix = self._get_full_prefix()
@@ -1 +1,2 @@
 DEFAULT_TTL: int = 60 * 60 * 24  # 1 day
+DEFAULT_NEGATIVE_TTL: int = 60  # 1 minute
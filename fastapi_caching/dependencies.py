@@ -1,9 +1,15 @@
 import logging
+from typing import AsyncIterator, Dict, Mapping, Optional
 
 from starlette.requests import Request
+from starlette.responses import Response
 
+from . import constants
 from .backends import CacheBackendBase
-from .objects import NoOpResponseCache, ResponseCache
+from .metrics import CacheMetrics
+from .objects import NOOP_RESPONSE_CACHE, ResponseCache
+from .policies import CachePolicy
+from .writebehind import WriteBehindQueue
 
 logger = logging.getLogger(__name__)
 
@@ -11,51 +17,210 @@ __all__ = ("ResponseCacheDependency",)
 
 
 class ResponseCacheDependency:
+    """Fetches the cached response for a request, see `CacheManager.from_request`
+
+    With `honor_cache_control`, the `Cache-Control` (or `Pragma`) request header
+    can skip the cache: `no-store` bypasses it completely, `no-cache` updates it
+    without reading from it, and `max-age=N` ignores entries older than N
+    seconds. It's off by default, as it lets any client force cache misses.
+    `cache_headers` adds `ResponseCache.cache_headers()` to responses.
+    """
+
     def __init__(
         self,
         backend: CacheBackendBase,
         *,
         no_cache_query_param: str = "no-cache",
         ttl: int = None,
+        write_behind: WriteBehindQueue = None,
+        early_expiration_beta: float = 0.0,
+        ttl_jitter: float = 0.0,
+        metrics: CacheMetrics = None,
+        negative_ttl: int = constants.DEFAULT_NEGATIVE_TTL,
+        raise_cached_errors: bool = True,
+        policies: Mapping[str, CachePolicy] = None,
+        honor_cache_control: bool = False,
+        cache_headers: bool = False,
     ):
         self._backend = backend
         self._no_cache_query_param = no_cache_query_param
         self._ttl = ttl
+        self._write_behind = write_behind
+        self._early_expiration_beta = early_expiration_beta
+        self._ttl_jitter = ttl_jitter
+        self._metrics = metrics
+        self._negative_ttl = negative_ttl
+        self._raise_cached_errors = raise_cached_errors
+        self._policies = policies
+        self._honor_cache_control = honor_cache_control
+        self._cache_headers = cache_headers
+
+    async def __call__(
+        self, request: Request, response: Response = None
+    ) -> AsyncIterator[ResponseCache]:
+        cache = await self._response_cache(request, response)
+        try:
+            yield cache
+        finally:
+            # NOTE: Endpoints may never call `set`, e.g. on errors
+            cache._release_in_flight()
+
+    async def _response_cache(
+        self, request: Request, response: Optional[Response]
+    ) -> ResponseCache:
+        # NOTE: This runs for every request to a cached endpoint, so the bypass
+        #       checks come first and work on the raw ASGI scope where possible
+        debug = logger.isEnabledFor(logging.DEBUG)
+        scope = request.scope
+
+        if not self._backend.is_enabled():
+            if debug:
+                logger.debug(
+                    "%s: Caching backend not enabled - returning no-op cache",
+                    scope["path"],
+                )
+            self._record(request, "bypass")
+            return NOOP_RESPONSE_CACHE
+        elif _has_authorization(scope):
+            if debug:
+                logger.debug(
+                    "%s: Authorization header set - not fetching from cache",
+                    scope["path"],
+                )
+            self._record(request, "bypass")
+            return NOOP_RESPONSE_CACHE
+
+        directives = _cache_control(scope) if self._honor_cache_control else {}
+        if "no-store" in directives:
+            if debug:
+                logger.debug(
+                    "%s: Cache-Control no-store requested - not using the cache",
+                    scope["path"],
+                )
+            self._record(request, "bypass")
+            return NOOP_RESPONSE_CACHE
 
-    async def __call__(self, request: Request) -> ResponseCache:
         cache = ResponseCache(
             self._backend,
             request,
             no_cache_query_param=self._no_cache_query_param,
             ttl=self._ttl,
+            write_behind=self._write_behind,
+            early_expiration_beta=self._early_expiration_beta,
+            ttl_jitter=self._ttl_jitter,
+            negative_ttl=self._negative_ttl,
+            policy=self._policy(request),
         )
 
-        if not self._backend.is_enabled():
-            logger.debug(
-                f"{cache.key}: Caching backend not enabled - returning no-op cache"
-            )
-            return NoOpResponseCache()
-        elif "authorization" in request.headers:
-            logger.debug(
-                f"{cache.key}: Authorization header set - not fetching from cache"
-            )
-            return NoOpResponseCache()
-        elif (
-            self._no_cache_query_param is not None
-            and self._no_cache_query_param in request.query_params
-        ):
-            logger.debug(
-                f"{cache.key}: The no-cache query parameter was specified - not "
-                f"fetching from cache, but will update it afterwards."
-            )
+        if "no-cache" in directives or self._has_no_cache_query_param(request):
+            if debug:
+                logger.debug(
+                    "%s: No-cache was requested - not fetching from cache, but "
+                    "will update it afterwards.",
+                    cache.key,
+                )
+            self._record(request, "bypass")
+            self._add_cache_headers(cache, response)
             return cache
+
+        await cache.fetch(max_age=_max_age(directives))
+        if cache.expired_early:
+            if debug:
+                logger.debug("%s: Cached response data expired early", cache.key)
+            self._record(request, "stale")
+        elif not cache.exists():
+            if debug:
+                logger.debug("%s: No cached response data found", cache.key)
+            self._record(request, "miss")
         else:
-            await cache.fetch()
-            if cache.data is None:
-                logger.debug(f"{cache.key}: No cached response data found")
-            else:
+            if debug:
                 logger.debug(
-                    f"{cache.key}: Found cached response data with "
-                    f"timestamp {cache.obj.timestamp}"
+                    "%s: Found cached response data with timestamp %s",
+                    cache.key,
+                    cache.obj.timestamp,
                 )
-            return cache
+            self._record(request, "hit")
+            if self._raise_cached_errors and "error" in cache.obj.meta:
+                if debug:
+                    logger.debug("%s: Raising cached error response", cache.key)
+                raise cache.error
+        if self._metrics is not None and not cache.exists():
+            cache._track_in_flight(self._metrics)
+        self._add_cache_headers(cache, response)
+        return cache
+
+    def _add_cache_headers(self, cache: ResponseCache, response: Optional[Response]):
+        if self._cache_headers and response is not None:
+            cache._add_cache_headers(response)
+
+    def _has_no_cache_query_param(self, request: Request) -> bool:
+        param = self._no_cache_query_param
+        if param is None:
+            return False
+        query_string = request.scope.get("query_string", b"")
+        # Skip parsing the query string when the parameter can't be in it
+        if (
+            param.encode() not in query_string
+            and b"%" not in query_string
+            and b"+" not in query_string
+        ):
+            return False
+        return param in request.query_params
+
+    def _policy(self, request: Request) -> Optional[CachePolicy]:
+        if not self._policies:
+            return None
+        route = request.scope.get("route")
+        if route is not None:
+            return self._policies.get(route.path)
+        for policy in self._policies.values():
+            if policy.match(request.url.path) is not None:
+                return policy
+        return None
+
+    def _record(self, request: Request, result: str):
+        sampler = self._backend.sampler
+        if self._metrics is None and sampler is None:
+            return
+        route = request.scope.get("route")
+        path = route.path if route is not None else request.url.path
+        if self._metrics is not None:
+            self._metrics.record_request(path, result)
+        if sampler is not None and result != "bypass":
+            sampler.record_route(path, result == "hit")
+
+
+def _has_authorization(scope) -> bool:
+    # NOTE: ASGI header names are lowercased
+    for name, _ in scope["headers"]:
+        if name == b"authorization":
+            return True
+    return False
+
+
+def _cache_control(scope) -> Dict[str, Optional[str]]:
+    """Parse the request's Cache-Control directives, falling back to Pragma"""
+    cache_control = []
+    pragma = None
+    for name, value in scope["headers"]:
+        if name == b"cache-control":
+            cache_control.append(value)
+        elif name == b"pragma":
+            pragma = value
+    if not cache_control:
+        if pragma is not None and b"no-cache" in pragma.lower():
+            return {"no-cache": None}
+        return {}
+
+    directives = {}
+    for directive in b",".join(cache_control).decode("latin-1").split(","):
+        name, _, value = directive.strip().partition("=")
+        directives[name.lower()] = value.strip('"') or None
+    return directives
+
+
+def _max_age(directives: Dict[str, Optional[str]]) -> Optional[int]:
+    try:
+        return int(directives["max-age"])
+    except (KeyError, TypeError, ValueError):
+        return None
@@ -1,2 +1,5 @@
+__all__ = ("CachingNotEnabled",)
+
+
 class CachingNotEnabled(Exception):
     """Raised when the caching backend is accessed while it's disabled"""
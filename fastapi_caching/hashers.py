@@ -1,16 +1,25 @@
+import fnmatch
 import hashlib
+import json
+import os
 import pathlib
-from typing import Sequence, Union
-
-import pkg_resources
+import time
+from importlib import metadata
+from typing import Dict, List, Sequence, Union
 
 __all__ = ("files_hash", "installed_packages_hash")
 
+_CHUNK_SIZE = 1 << 20
+_CACHE_VERSION = 1
+# Files modified this recently may still change within the same mtime tick
+_RACY_SECONDS = 2
+
 
 def files_hash(
     *paths: Union[pathlib.Path, str],
     include: Sequence[str] = ("*",),
     digest_size: int = 4,
+    cache_path: Union[pathlib.Path, str] = None,
 ) -> str:
     """Create a reproducible hash (hex digest) from the file contents of the given paths
 
@@ -27,30 +36,114 @@ def files_hash(
         digest_size:
             The amount of bytes to use for the hex digest to return.
             Defaults to 4 which equals 8 characters.
+        cache_path:
+            A JSON file to persist the digests of individual files in, keyed by
+            their modification time and size. Unchanged files aren't read again
+            on the next call.
 
     """
+    patterns = [f"*.{file_ext}" for file_ext in include]
+    cache = _FileDigestCache(cache_path)
     h = hashlib.blake2b(digest_size=digest_size)
 
     for path in paths:
-        path = pathlib.Path(path)
-        if path.is_dir():
-            for sub_path in sorted(
-                p
-                for file_ext in include
-                for p in path.rglob(f"*.{file_ext}")
-                if p.is_file()
-            ):
-                h.update(str(sub_path).encode())
-                h.update(sub_path.read_bytes())
-        elif path.is_file():
-            h.update(str(path).encode())
-            h.update(path.read_bytes())
+        path = str(path)
+        if os.path.isdir(path):
+            files = sorted(
+                _walk(path, patterns, exclude=cache.path), key=_path_sort_key
+            )
+        elif os.path.isfile(path):
+            files = [path]
         else:
             raise RuntimeError(f"Unsupported path: {path} (does it exist?)")
+        for file_path in files:
+            h.update(file_path.encode())
+            h.update(cache.digest(file_path))
 
+    cache.save()
     return h.hexdigest()
 
 
+def _walk(root: str, patterns: Sequence[str], exclude: str = None) -> List[str]:
+    """Return the files below `root` matching any of the patterns, in one walk"""
+    matched = []
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            if any(fnmatch.fnmatch(filename, pattern) for pattern in patterns):
+                file_path = os.path.join(dirpath, filename)
+                if file_path != exclude:
+                    matched.append(file_path)
+    return matched
+
+
+def _path_sort_key(path: str):
+    # NOTE: Same order as sorting `pathlib.Path` objects
+    return pathlib.PurePath(path).parts
+
+
+def _file_digest(path: str) -> bytes:
+    h = hashlib.blake2b()
+    buffer = bytearray(_CHUNK_SIZE)
+    view = memoryview(buffer)
+    with open(path, "rb") as f:
+        while True:
+            size = f.readinto(buffer)
+            if not size:
+                break
+            h.update(view[:size])
+    return h.digest()
+
+
+class _FileDigestCache:
+    """Digests of individual files, persisted to `path` if one is given"""
+
+    def __init__(self, path: Union[pathlib.Path, str, None]):
+        self.path = None if path is None else os.path.abspath(path)
+        self._entries: Dict[str, list] = {}
+        self._seen: Dict[str, list] = {}
+        self._changed = False
+        if self.path is not None:
+            self._entries = self._load()
+
+    def _load(self) -> Dict[str, list]:
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(data, dict) or data.get("version") != _CACHE_VERSION:
+            return {}
+        return data.get("files", {})
+
+    def digest(self, path: str) -> bytes:
+        stat = os.stat(path)
+        key = os.path.abspath(path)
+        entry = self._entries.get(key)
+        if entry is not None and entry[:2] == [stat.st_mtime_ns, stat.st_size]:
+            self._seen[key] = entry
+            return bytes.fromhex(entry[2])
+
+        digest = _file_digest(path)
+        if time.time() - stat.st_mtime > _RACY_SECONDS:
+            self._seen[key] = [stat.st_mtime_ns, stat.st_size, digest.hex()]
+        self._changed = True
+        return digest
+
+    def save(self):
+        if self.path is None:
+            return
+        if not self._changed and self._seen.keys() == self._entries.keys():
+            return
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump({"version": _CACHE_VERSION, "files": self._seen}, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            # NOTE: The cache is an optimization only
+            pass
+
+
 def installed_packages_hash(digest_size: int = 4) -> str:
     """Return a reproducible hash (hex digest) of the installed python packages
 
@@ -60,7 +153,19 @@ def installed_packages_hash(digest_size: int = 4) -> str:
             Defaults to 4 which equals 8 characters.
 
     """
-    packages = sorted(
-        f"{d.project_name}=={d.version}".encode() for d in pkg_resources.working_set
-    )
-    return hashlib.blake2b(b" ".join(packages), digest_size=digest_size).hexdigest()
+    packages = {_name_version(dist).encode() for dist in metadata.distributions()}
+    return hashlib.blake2b(
+        b" ".join(sorted(packages)), digest_size=digest_size
+    ).hexdigest()
+
+
+def _name_version(dist: metadata.Distribution) -> str:
+    # NOTE: Only the headers are parsed, `dist.metadata` parses the whole file
+    #       including the long description
+    text = dist.read_text("METADATA") or dist.read_text("PKG-INFO") or ""
+    fields = {}
+    for line in text.split("\n\n", 1)[0].splitlines():
+        name, _, value = line.partition(": ")
+        if name in ("Name", "Version") and name not in fields:
+            fields[name] = value.strip()
+    return f"{fields.get('Name')}=={fields.get('Version')}"
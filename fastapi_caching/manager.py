@@ -1,36 +1,113 @@
 import logging
-from typing import Sequence
+from concurrent.futures import Executor
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Sequence
 
 from fastapi import Depends
 
 from . import constants
+from .analytics import AccessSampler
 from .backends import CacheBackendBase
 from .dependencies import ResponseCacheDependency
+from .metrics import CacheMetrics
+from .objects import fragment_key, fragment_tag
+from .policies import MUTATING_METHODS, CachePolicy, InvalidationRule, Pagination
+from .writebehind import InvalidationBuffer, WriteBehindQueue
 
 __all__ = ("CacheManager",)
 
 logger = logging.getLogger(__name__)
 
 
+class _InvalidationBatch:
+    """Tags collected by `CacheManager.batch_invalidations`
+
+    Tasks spawned within the block keep the batch in their context, so it's
+    closed on exit and invalidations then apply immediately.
+    """
+
+    __slots__ = ("tags", "closed")
+
+    def __init__(self):
+        self.tags: Dict[str, None] = {}
+        self.closed = False
+
+
 class CacheManager:
     def __init__(
         self,
         backend: CacheBackendBase,
         *,
-        ttl: int = constants.DEFAULT_TTL,
+        ttl: int = None,
         no_cache_query_param: str = "no-cache",
+        write_behind: bool = False,
+        early_expiration_beta: float = 0.0,
+        ttl_jitter: float = 0.0,
+        metrics: CacheMetrics = None,
+        sampler: AccessSampler = None,
+        negative_ttl: int = constants.DEFAULT_NEGATIVE_TTL,
+        invalidation_delay: float = 0.0,
+        max_invalidation_delay: float = 1.0,
+        honor_cache_control: bool = False,
+        cache_headers: bool = False,
+        offload_min_size: int = None,
+        offload_executor: Executor = None,
     ):
         self._backend = backend
         self._ttl = ttl
         self._no_cache_query_param = no_cache_query_param
+        self._early_expiration_beta = early_expiration_beta
+        self._ttl_jitter = ttl_jitter
+        self._metrics = metrics
+        self._negative_ttl = negative_ttl
+        self._honor_cache_control = honor_cache_control
+        self._cache_headers = cache_headers
+        if metrics is not None:
+            backend.set_metrics(metrics)
+        if sampler is not None:
+            backend.set_sampler(sampler)
+        if offload_min_size is not None:
+            backend.set_offload(offload_min_size, offload_executor)
+        self._write_behind = WriteBehindQueue(backend) if write_behind else None
+        self._invalidations = (
+            InvalidationBuffer(
+                backend, delay=invalidation_delay, max_delay=max_invalidation_delay
+            )
+            if invalidation_delay > 0
+            else None
+        )
+        self._batch: ContextVar[Optional[_InvalidationBatch]] = ContextVar(
+            f"invalidation_batch_{id(self)}", default=None
+        )
+        self._policies: Dict[str, CachePolicy] = {}
+        self._invalidation_rules: List[InvalidationRule] = []
 
     def setup(
-        self, *, ttl: int = None, no_cache_query_param: str = None,
+        self,
+        *,
+        ttl: int = None,
+        no_cache_query_param: str = None,
+        early_expiration_beta: float = None,
+        ttl_jitter: float = None,
+        negative_ttl: int = None,
+        honor_cache_control: bool = None,
+        cache_headers: bool = None,
     ):
         if ttl is not None:
             self._ttl = ttl
         if no_cache_query_param is not None:
             self._no_cache_query_param = no_cache_query_param
+        if early_expiration_beta is not None:
+            self._early_expiration_beta = early_expiration_beta
+        if ttl_jitter is not None:
+            self._ttl_jitter = ttl_jitter
+        if negative_ttl is not None:
+            self._negative_ttl = negative_ttl
+        if honor_cache_control is not None:
+            self._honor_cache_control = honor_cache_control
+        if cache_headers is not None:
+            self._cache_headers = cache_headers
 
     def enable(self):
         self._backend.enable()
@@ -39,22 +116,148 @@ class CacheManager:
         self._backend.disable()
 
     def is_enabled(self) -> bool:
-        self._backend.is_enabled()
+        return self._backend.is_enabled()
 
     @property
     def backend(self) -> CacheBackendBase:
         return self._backend
 
+    @property
+    def metrics(self) -> CacheMetrics:
+        return self._metrics
+
     def from_request(self, ttl: int = None) -> Depends:
         d = ResponseCacheDependency(
-            self.backend, no_cache_query_param=self._no_cache_query_param, ttl=ttl,
+            self.backend,
+            no_cache_query_param=self._no_cache_query_param,
+            ttl=ttl or self._ttl,
+            write_behind=self._write_behind,
+            early_expiration_beta=self._early_expiration_beta,
+            ttl_jitter=self._ttl_jitter,
+            metrics=self._metrics,
+            negative_ttl=self._negative_ttl,
+            policies=self._policies,
+            honor_cache_control=self._honor_cache_control,
+            cache_headers=self._cache_headers,
         )
         return Depends(d)
 
+    def add_policy(
+        self,
+        path: str,
+        *,
+        ttl: int = None,
+        tags: Sequence[str] = (),
+        query_params: Sequence[str] = None,
+        pagination: Pagination = None,
+    ) -> CachePolicy:
+        """Register caching rules for the route with the given path template
+
+        E.g. `add_policy("/products/{product_id}", tags=["product-{product_id}"])`
+        """
+        policy = CachePolicy(
+            path,
+            ttl=ttl,
+            tags=tags,
+            query_params=query_params,
+            pagination=pagination,
+        )
+        self._policies[path] = policy
+        return policy
+
+    def add_invalidation(
+        self,
+        path: str,
+        *,
+        tags: Sequence[str],
+        methods: Sequence[str] = MUTATING_METHODS,
+    ) -> InvalidationRule:
+        """Invalidate the given tags when a request to `path` succeeds
+
+        Rules are applied by `CacheInvalidationMiddleware`.
+        """
+        rule = InvalidationRule(path, tags=tags, methods=methods)
+        self._invalidation_rules.append(rule)
+        return rule
+
+    def invalidation_tags(self, method: str, path: str) -> List[str]:
+        """Return the tags which a request would invalidate, per the rules"""
+        tags = []
+        for rule in self._invalidation_rules:
+            matched = rule.tags_for(method, path)
+            if matched:
+                tags.extend(t for t in matched if t not in tags)
+        return tags
+
+    async def update_fragment(
+        self, namespace: str, item_id: Any, item: Any, *, ttl: int = None
+    ) -> bool:
+        """Replace a cached item stored by `ResponseCache.set_fragments`
+
+        Cached list and detail responses containing the item stay valid, and
+        return the new item from then on.
+        """
+        return await self.backend.set(
+            fragment_key(namespace, item_id),
+            item,
+            tags=[fragment_tag(namespace, item_id)],
+            ttl=ttl or self._ttl,
+        )
+
     async def invalidate_tag(self, tag: str):
         """Delete cache entries associated with the given tag"""
-        await self.backend.invalidate_tag(tag)
+        await self.invalidate_tags([tag])
 
     async def invalidate_tags(self, tags: Sequence[str]):
-        """Delete cache entries associated with the given tags"""
-        await self.backend.invalidate_tags(tags)
+        """Delete cache entries associated with the given tags
+
+        Within `batch_invalidations`, or with an `invalidation_delay`, the tags are
+        queued and invalidated later on, together with other queued tags. Queued
+        writes of write-behind mode with any of the tags are dropped.
+        """
+        if self._write_behind is not None:
+            await self._write_behind.discard_tags(tags)
+        batch = self._batch.get()
+        if batch is not None and not batch.closed:
+            batch.tags.update(dict.fromkeys(tags))
+        elif self._invalidations is not None:
+            self._invalidations.add(tags)
+        else:
+            await self.backend.invalidate_tags(tags)
+
+    @asynccontextmanager
+    async def batch_invalidations(self):
+        """Collect the tags invalidated within the block and invalidate them once
+
+        async with cache_manager.batch_invalidations():
+            for row in rows:
+                await import_row(row)
+                await cache_manager.invalidate_tag(f"product-{row.id}")
+        """
+        batch = self._batch.get()
+        if batch is not None and not batch.closed:
+            yield
+            return
+        batch = _InvalidationBatch()
+        token = self._batch.set(batch)
+        try:
+            yield
+        finally:
+            self._batch.reset(token)
+            batch.closed = True
+            if batch.tags:
+                await self.backend.invalidate_tags(list(batch.tags))
+
+    async def flush(self):
+        """Apply all cache writes and invalidations which are still queued"""
+        if self._write_behind is not None:
+            await self._write_behind.flush()
+        if self._invalidations is not None:
+            await self._invalidations.flush()
+
+    async def close(self):
+        """Flush queued cache writes, should be called on application shutdown"""
+        if self._write_behind is not None:
+            await self._write_behind.close()
+        if self._invalidations is not None:
+            await self._invalidations.close()
@@ -0,0 +1,64 @@
+"""Request-scoped memo of cache reads
+
+Within `request_memo()`, e.g. during every request with `RequestMemoMiddleware`,
+repeated reads of the same key return the object read first, without another
+round trip or unpickle. Writes through the backend drop the keys they affect,
+and the memo is discarded when the block ends.
+
+NOTE: Memoized objects are shared by all reads in the request, so don't mutate
+      their data.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+__all__ = ("RequestMemoMiddleware", "request_memo")
+
+
+class _Memo(dict):
+    """(backend, key) -> cached object or None"""
+
+    closed = False
+
+
+_memo: ContextVar[Optional[_Memo]] = ContextVar("fastapi_caching_memo", default=None)
+
+
+def current_memo() -> Optional[dict]:
+    memo = _memo.get()
+    # NOTE: Tasks started during the request keep a copy of the context, and
+    #       mustn't use the memo once the request has ended
+    return None if memo is None or memo.closed else memo
+
+
+@contextmanager
+def request_memo() -> Iterator[dict]:
+    """Memoize cache reads until the block ends"""
+    memo = _Memo()
+    token = _memo.set(memo)
+    try:
+        yield memo
+    finally:
+        _memo.reset(token)
+        memo.closed = True
+        memo.clear()
+
+
+class RequestMemoMiddleware:
+    """Memoizes cache reads for the duration of each HTTP request
+
+    app.add_middleware(RequestMemoMiddleware)
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with request_memo():
+            await self.app(scope, receive, send)
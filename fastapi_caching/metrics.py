@@ -0,0 +1,295 @@
+import asyncio
+import bisect
+import threading
+import time
+from typing import Collection, Dict, Iterable, List, Sequence, Tuple
+
+__all__ = ("CacheMetrics", "EventLoopLagMonitor", "OpenTelemetryMetrics")
+
+DEFAULT_LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+)
+DEFAULT_SIZE_BUCKETS = tuple(4**i for i in range(4, 14))  # 256B - 64MiB
+DEFAULT_LAG_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+# Tag label of operations on tags without a label of their own
+OTHER_TAGS = "_other"
+
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class CacheMetrics:
+    """In-memory cache metrics, which can be rendered in the Prometheus format
+
+    Pass an instance to `CacheManager(metrics=...)` to enable instrumentation.
+    Nothing is recorded (or timed) when no metrics object is configured.
+
+    Tag operations are counted per tag only for the tags in `tag_labels`, and
+    under the tag `OTHER_TAGS` for all other tags, as tags such as
+    `product-{id}` would otherwise add a counter per item.
+    """
+
+    def __init__(
+        self,
+        *,
+        namespace: str = "fastapi_caching",
+        latency_buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+        size_buckets: Sequence[float] = DEFAULT_SIZE_BUCKETS,
+        tag_labels: Collection[str] = (),
+    ):
+        self._namespace = namespace
+        self._tag_labels = frozenset(tag_labels)
+        self._latency_buckets = tuple(latency_buckets)
+        self._size_buckets = tuple(size_buckets)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.requests: Dict[Tuple[str, str], int] = {}
+        self.tags: Dict[Tuple[str, str], int] = {}
+        self.durations: Dict[str, _Histogram] = {}
+        self.sizes = _Histogram(self._size_buckets)
+        self.loop_lag = _Histogram(DEFAULT_LAG_BUCKETS)
+        self.evictions = 0
+        self.in_flight = 0
+
+    def record_request(self, route: str, result: str):
+        """Count a response cache lookup, `result` is hit/miss/stale/bypass"""
+        key = (route, result)
+        with self._lock:
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+    def record_tags(self, operation: str, tags: Iterable[str]):
+        with self._lock:
+            for tag in tags:
+                key = (tag if tag in self._tag_labels else OTHER_TAGS, operation)
+                self.tags[key] = self.tags.get(key, 0) + 1
+
+    def observe_duration(self, operation: str, seconds: float):
+        with self._lock:
+            histogram = self.durations.get(operation)
+            if histogram is None:
+                histogram = self.durations[operation] = _Histogram(
+                    self._latency_buckets
+                )
+            histogram.observe(seconds)
+
+    def observe_size(self, nbytes: int):
+        with self._lock:
+            self.sizes.observe(nbytes)
+
+    def observe_loop_lag(self, seconds: float):
+        with self._lock:
+            self.loop_lag.observe(seconds)
+
+    def record_eviction(self):
+        with self._lock:
+            self.evictions += 1
+
+    def add_in_flight(self, amount: int):
+        with self._lock:
+            self.in_flight += amount
+
+    def render_prometheus(self) -> str:
+        """Return the metrics in the Prometheus text exposition format"""
+        ns = self._namespace
+        lines: List[str] = []
+        with self._lock:
+            lines += _counter(
+                f"{ns}_requests_total",
+                "Response cache lookups by route and result",
+                (
+                    ({"route": route, "result": result}, value)
+                    for (route, result), value in sorted(self.requests.items())
+                ),
+            )
+            lines += _counter(
+                f"{ns}_tag_operations_total",
+                "Tag writes and invalidations by tag",
+                (
+                    ({"tag": tag, "operation": operation}, value)
+                    for (tag, operation), value in sorted(self.tags.items())
+                ),
+            )
+            lines += _counter(
+                f"{ns}_evictions_total",
+                "Entries evicted from in-memory caches due to size limits",
+                [({}, self.evictions)],
+            )
+            lines += [
+                f"# HELP {ns}_in_flight Cache misses currently being recomputed",
+                f"# TYPE {ns}_in_flight gauge",
+                f"{ns}_in_flight {self.in_flight}",
+            ]
+            name = f"{ns}_operation_duration_seconds"
+            lines += [
+                f"# HELP {name} Duration of backend operations",
+                f"# TYPE {name} histogram",
+            ]
+            for operation, histogram in sorted(self.durations.items()):
+                lines += _histogram(name, {"operation": operation}, histogram)
+            name = f"{ns}_serialized_size_bytes"
+            lines += [
+                f"# HELP {name} Size of serialized cache entries",
+                f"# TYPE {name} histogram",
+                *_histogram(name, {}, self.sizes),
+            ]
+            name = f"{ns}_event_loop_lag_seconds"
+            lines += [
+                f"# HELP {name} Delay of event loop callbacks past their schedule",
+                f"# TYPE {name} histogram",
+                *_histogram(name, {}, self.loop_lag),
+            ]
+        return "\n".join(lines) + "\n"
+
+
+class OpenTelemetryMetrics:
+    """Cache metrics reported through OpenTelemetry instruments
+
+    Uses the global meter provider unless a `meter` is given. Tags are only used
+    as attribute values if they're in `tag_labels`, see `CacheMetrics`.
+    """
+
+    def __init__(
+        self,
+        meter=None,
+        *,
+        namespace: str = "fastapi_caching",
+        tag_labels: Collection[str] = (),
+    ):
+        self._tag_labels = frozenset(tag_labels)
+        if meter is None:
+            from opentelemetry import metrics
+
+            meter = metrics.get_meter(__name__)
+        ns = namespace
+        self._requests = meter.create_counter(
+            f"{ns}.requests", description="Response cache lookups"
+        )
+        self._tags = meter.create_counter(
+            f"{ns}.tag_operations", description="Tag writes and invalidations"
+        )
+        self._durations = meter.create_histogram(
+            f"{ns}.operation_duration", unit="s", description="Backend operations"
+        )
+        self._sizes = meter.create_histogram(
+            f"{ns}.serialized_size", unit="By", description="Serialized entries"
+        )
+        self._evictions = meter.create_counter(
+            f"{ns}.evictions", description="Entries evicted from in-memory caches"
+        )
+        self._in_flight = meter.create_up_down_counter(
+            f"{ns}.in_flight", description="Cache misses being recomputed"
+        )
+        self._loop_lag = meter.create_histogram(
+            f"{ns}.event_loop_lag", unit="s", description="Event loop delays"
+        )
+
+    def record_request(self, route: str, result: str):
+        self._requests.add(1, {"route": route, "result": result})
+
+    def record_tags(self, operation: str, tags: Iterable[str]):
+        for tag in tags:
+            tag = tag if tag in self._tag_labels else OTHER_TAGS
+            self._tags.add(1, {"tag": tag, "operation": operation})
+
+    def observe_duration(self, operation: str, seconds: float):
+        self._durations.record(seconds, {"operation": operation})
+
+    def observe_size(self, nbytes: int):
+        self._sizes.record(nbytes)
+
+    def observe_loop_lag(self, seconds: float):
+        self._loop_lag.record(seconds)
+
+    def record_eviction(self):
+        self._evictions.add(1)
+
+    def add_in_flight(self, amount: int):
+        self._in_flight.add(amount)
+
+
+class EventLoopLagMonitor:
+    """Measures how late the event loop runs a callback scheduled every `interval`
+
+    Lag shows when e.g. large (de)serialization blocks the event loop, see
+    `CacheBackendBase.set_offload`.
+
+        monitor = EventLoopLagMonitor(metrics)
+        monitor.start()  # On startup, within the running event loop
+        await monitor.stop()  # On shutdown
+    """
+
+    def __init__(self, metrics, *, interval: float = 0.25):
+        self._metrics = metrics
+        self._interval = interval
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self._interval)
+            lag = time.perf_counter() - start - self._interval
+            self._metrics.observe_loop_lag(max(0.0, lag))
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in labels.items()
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def _counter(name: str, help_text: str, samples) -> List[str]:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+    lines += [f"{name}{_labels(labels)} {value}" for labels, value in samples]
+    return lines
+
+
+def _histogram(name: str, labels: Dict[str, str], histogram: _Histogram) -> List[str]:
+    lines = []
+    cumulative = 0
+    for bound, count in zip((*histogram.buckets, "+Inf"), histogram.counts):
+        cumulative += count
+        lines.append(f"{name}_bucket{_labels({**labels, 'le': bound})} {cumulative}")
+    lines.append(f"{name}_sum{_labels(labels)} {histogram.sum}")
+    lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+    return lines
@@ -1,9 +1,29 @@
-from typing import Any, Sequence
+import inspect
+import math
+import random
+import time
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
+from starlette.exceptions import HTTPException
 from starlette.requests import Request
+from starlette.responses import Response
 
-from .backends import CacheBackendBase
+from . import constants
+from .backends import CacheBackendBase, CacheEntry
+from .policies import CachePolicy
 from .raw import RawCacheObject
+from .writebehind import WriteBehindQueue
 
 __all__ = ("ResponseCache",)
 
@@ -13,6 +33,31 @@ class ResponseCache:
 
     Dependency ensures that an existing cached item for the given endpoint is
     automatically fetched.
+
+    With `early_expiration_beta` > 0, an entry nearing its expiry is sometimes
+    treated as missing (XFetch), so that one request recomputes it before it
+    expires for everyone. The probability is weighted by how long the previous
+    recompute took. Larger values refresh earlier, 1.0 is a sensible default.
+    `ttl_jitter` shortens the TTL of every write by a random fraction of up to
+    the given value, so entries written at the same time don't expire together.
+
+    Errors such as 404s can be cached with `set_error`, using `negative_ttl` by
+    default. `ResponseCacheDependency` then re-raises them without running the
+    endpoint.
+
+    A route's `CachePolicy`, if any, sets its TTL, the query parameters in its
+    key and tags added to every entry.
+
+    `cache_headers()` describes the cache state as HTTP response headers, which
+    the dependency adds to responses when the manager has `cache_headers=True`.
+    Responses which aren't cached yet only allow caching once they're set.
+
+    With `set_fragments`, a list response is stored as the IDs of its items, and
+    each item in an entry of its own which `set_fragment` shares with the item's
+    detail endpoint. Changing one item then only affects that item's entry.
+
+    For routes with a `Pagination` policy, `fetch` assembles the requested page
+    from cached blocks of rows, and `set_page` computes the missing blocks.
     """
 
     def __init__(
@@ -21,13 +66,46 @@ class ResponseCache:
         request: Request,
         no_cache_query_param: str = "no-cache",
         ttl: int = None,
+        write_behind: WriteBehindQueue = None,
+        early_expiration_beta: float = 0.0,
+        ttl_jitter: float = 0.0,
+        negative_ttl: int = constants.DEFAULT_NEGATIVE_TTL,
+        policy: CachePolicy = None,
     ):
         self._backend = backend
         self._request = request
         self._no_cache_query_param = no_cache_query_param
-        self._ttl = ttl
-        self.key = self._make_key(request)
+        self._ttl = ttl if policy is None or policy.ttl is None else policy.ttl
+        self._write_behind = write_behind
+        self._early_expiration_beta = early_expiration_beta
+        self._ttl_jitter = ttl_jitter
+        self._negative_ttl = negative_ttl
+        self._policy = policy
+        self._pagination = None if policy is None else policy.pagination
+        self._page = None
+        if self._pagination is not None:
+            self._page = self._pagination.window(request.query_params)
+        # Cached blocks of a paginated response, by block number
+        self._blocks: Dict[int, RawCacheObject] = {}
+        self._key = None
         self._obj = None
+        self._fetched_at = None
+        self._metrics = None
+        self._response = None
+        # TTL of the response set by this request, which shared caches may use
+        self._set_ttl = None
+        self.expired_early = False
+
+    @property
+    def key(self) -> str:
+        if self._key is None:
+            self._key = self._make_key(self._request)
+        return self._key
+
+    @property
+    def page(self) -> Optional[Tuple[int, int]]:
+        """The requested `(offset, limit)` for routes with a `Pagination` policy"""
+        return self._page
 
     @property
     def obj(self) -> RawCacheObject:
@@ -37,48 +115,441 @@ class ResponseCache:
     def data(self) -> Any:
         return None if self._obj is None else self._obj.data
 
+    @property
+    def error(self) -> Optional[HTTPException]:
+        """The cached error response, if an error was cached with `set_error`"""
+        if self._obj is None or "error" not in self._obj.meta:
+            return None
+        return HTTPException(**self._obj.meta["error"])
+
+    @property
+    def age(self) -> Optional[float]:
+        """Seconds since the cached response was stored"""
+        if self._obj is None:
+            return None
+        return max(0.0, time.time() - self._obj.timestamp)
+
     def exists(self) -> bool:
         """Return whether or not there's an existing cache for this response"""
         return self._obj is not None
 
-    async def fetch(self):
-        """Fetch and associate existing cache data"""
-        self._obj = await self._backend.get(self.key)
+    async def fetch(self, *, max_age: float = None):
+        """Fetch and associate existing cache data
+
+        Entries older than `max_age` seconds, if given, are treated as missing.
+        """
+        self._fetched_at = time.perf_counter()
+        if self._page is not None:
+            self._obj = await self._fetch_page()
+        else:
+            self._obj = await self._backend.get(self.key)
+        if self._obj is not None and "fragments" in self._obj.meta:
+            self._obj = await self._assemble_fragments(self._obj)
+        if self._obj is None:
+            return
+        elif max_age is not None and self.age > max_age:
+            self._obj = None
+            self._blocks.clear()
+        elif self._should_expire_early(self._obj):
+            self._obj = None
+            self._blocks.clear()
+            self.expired_early = True
+
+    async def _fetch_page(self) -> Optional[RawCacheObject]:
+        offset, limit = self._page
+        numbers = _block_numbers(offset, limit, self._pagination.block_size)
+        keys = [self._block_key(n) for n in numbers]
+        for n, obj in zip(numbers, await self._backend.get_many(keys)):
+            if obj is not None:
+                self._blocks[n] = obj
+        return self._assemble_page(offset, limit)
+
+    def _assemble_page(self, offset: int, limit: int) -> Optional[RawCacheObject]:
+        """Cut the page out of the cached blocks, or return None if any is missing"""
+        block_size = self._pagination.block_size
+        numbers = _block_numbers(offset, limit, block_size)
+        rows = []
+        used = []
+        for n in numbers:
+            obj = self._blocks.get(n)
+            if obj is None:
+                return None
+            rows += obj.data
+            used.append(obj)
+            if len(obj.data) < block_size:
+                # NOTE: A short block is the last one of the results
+                break
+        start = offset - numbers.start * block_size
+        page = rows[start : start + limit]
+        if not used:
+            return RawCacheObject(page)
+        oldest = min(used, key=lambda obj: obj.timestamp)
+        return RawCacheObject(
+            page, oldest.timestamp, ttl=oldest.ttl, delta=oldest.delta
+        )
+
+    def _block_key(self, number: int) -> str:
+        return f"{self.key}|block={number}"
+
+    async def _assemble_fragments(
+        self, index: RawCacheObject
+    ) -> Optional[RawCacheObject]:
+        fragments = index.meta["fragments"]
+        keys = [fragment_key(fragments["namespace"], i) for i in fragments["ids"]]
+        objs = await self._backend.get_many(keys) if keys else []
+        if any(obj is None for obj in objs):
+            # NOTE: Items which were invalidated since make the whole response a miss
+            return None
+        data = [obj.data for obj in objs]
+        if fragments.get("single"):
+            data = data[0]
+        return RawCacheObject(data, index.timestamp, ttl=index.ttl, delta=index.delta)
+
+    def cache_headers(self) -> Dict[str, str]:
+        """Return `X-Cache`, `Age` and `Cache-Control` headers for the response
+
+        `X-Cache` is HIT, MISS or STALE (expired early). `Cache-Control` allows
+        shared caches to keep the response for the rest of the entry's TTL, and
+        is left out for misses until the response was set, which tag
+        invalidations then also apply to.
+        """
+        if self._obj is not None:
+            age = int(self.age)
+            ttl = self._obj.ttl
+            headers = {"X-Cache": "HIT", "Age": str(age)}
+        else:
+            age = 0
+            ttl = self._set_ttl
+            headers = {"X-Cache": "STALE" if self.expired_early else "MISS", "Age": "0"}
+        if ttl:
+            headers["Cache-Control"] = f"public, max-age={max(0, ttl - age)}"
+        return headers
+
+    def _add_cache_headers(self, response: Response):
+        """Add `cache_headers()` to the response, and again once it's set"""
+        self._response = response
+        response.headers.update(self.cache_headers())
+
+    def _should_expire_early(self, obj: RawCacheObject) -> bool:
+        if self._early_expiration_beta <= 0 or obj.delta is None or obj.ttl is None:
+            return False
+        age = time.time() - obj.timestamp
+        # NOTE: 1.0 - random() is in (0, 1], so the log is always defined
+        gap = -obj.delta * self._early_expiration_beta * math.log(1.0 - random.random())
+        return age + gap >= obj.ttl
+
+    def _track_in_flight(self, metrics):
+        """Count this cache as being recomputed until `set` is called"""
+        self._metrics = metrics
+        metrics.add_in_flight(1)
+
+    def _release_in_flight(self):
+        if self._metrics is not None:
+            self._metrics.add_in_flight(-1)
+            self._metrics = None
 
     async def set(
-        self, data: Any, *, ttl: int = None, tag: str = None, tags: Sequence[Any] = (),
+        self,
+        data: Any,
+        *,
+        ttl: int = None,
+        tag: str = None,
+        tags: Sequence[Any] = (),
+        meta: dict = None,
     ) -> bool:
-        tags = list(tags)
-        if tag is not None:
-            tags.append(tag)
+        entry = self._make_entry(data, ttl=ttl, tag=tag, tags=tags, meta=meta)
+        if self._write_behind is not None:
+            await self._write_behind.put(entry)
+            return True
         return await self._backend.set(
-            key=self.key,
-            obj=self._make_raw_cache_object(data),
+            key=entry.key, obj=entry.obj, tags=entry.tags, ttl=entry.ttl
+        )
+
+    async def set_error(
+        self,
+        exc: HTTPException,
+        *,
+        ttl: int = None,
+        tag: str = None,
+        tags: Sequence[Any] = (),
+    ) -> bool:
+        """Cache an error response, e.g. `HTTPException(404)` for a missing entity
+
+        Uses the short negative TTL unless `ttl` is given.
+        """
+        return await self.set(
+            None,
+            ttl=ttl or self._negative_ttl,
+            tag=tag,
             tags=tags,
-            ttl=ttl or self._ttl,
+            meta={"error": _error_meta(exc)},
+        )
+
+    async def set_fragments(
+        self,
+        items: Iterable[Any],
+        *,
+        namespace: str,
+        id_key: str = "id",
+        ttl: int = None,
+        tag: str = None,
+        tags: Sequence[Any] = (),
+    ) -> bool:
+        """Cache a list response as the IDs of its items plus an entry per item
+
+        Item entries are tagged `"{namespace}-{id}"`, e.g. `"product-1"`. A hit is
+        reassembled with a single `get_many`.
+        """
+        items = list(items)
+        ids = [_item_id(item, id_key) for item in items]
+        index = self._make_entry(
+            None,
+            ttl=ttl,
+            tag=tag,
+            tags=tags,
+            meta={"fragments": {"namespace": namespace, "ids": ids}},
+        )
+        entries = [
+            _fragment_entry(namespace, item_id, item, index.ttl)
+            for item_id, item in zip(ids, items)
+        ]
+        return await self._set_entries([*entries, index])
+
+    async def set_fragment(
+        self,
+        item: Any,
+        *,
+        namespace: str,
+        item_id: Any,
+        ttl: int = None,
+        tag: str = None,
+        tags: Sequence[Any] = (),
+    ) -> bool:
+        """Cache a single item response in the entry shared with `set_fragments`"""
+        index = self._make_entry(
+            None,
+            ttl=ttl,
+            tag=tag,
+            tags=[*tags, fragment_tag(namespace, item_id)],
+            meta={
+                "fragments": {"namespace": namespace, "ids": [item_id], "single": True}
+            },
+        )
+        entry = _fragment_entry(namespace, item_id, item, index.ttl)
+        return await self._set_entries([entry, index])
+
+    async def set_page(
+        self,
+        fetch_rows: Callable[[int, int], Union[Awaitable[Sequence], Sequence]],
+        *,
+        offset: int,
+        limit: int,
+        ttl: int = None,
+        tag: str = None,
+        tags: Sequence[Any] = (),
+    ) -> List[Any]:
+        """Return a page of rows, fetching and caching the blocks not yet cached
+
+        `fetch_rows(offset, limit)` returns the rows in the given range, and is
+        called once per run of consecutive missing blocks. Requires a
+        `Pagination` policy for the route. Pages with a limit above the policy's
+        `max_limit` are fetched in one call and not cached.
+        """
+        if self._pagination is None:
+            raise RuntimeError(
+                f"No pagination policy for {self._request.url.path}, see "
+                "`CacheManager.add_policy`"
+            )
+        if limit > self._pagination.max_limit:
+            rows = fetch_rows(offset, limit)
+            if inspect.isawaitable(rows):
+                rows = await rows
+            return list(rows)
+        block_size = self._pagination.block_size
+        numbers = _block_numbers(offset, limit, block_size)
+        entries = []
+        n = numbers.start
+        while n < numbers.stop:
+            obj = self._blocks.get(n)
+            if obj is not None:
+                if len(obj.data) < block_size:
+                    break
+                n += 1
+                continue
+            end = n
+            while end < numbers.stop and end not in self._blocks:
+                end += 1
+            rows = fetch_rows(n * block_size, (end - n) * block_size)
+            if inspect.isawaitable(rows):
+                rows = await rows
+            rows = list(rows)
+            for number in range(n, end):
+                i = (number - n) * block_size
+                block = rows[i : i + block_size]
+                entry = self._make_entry(
+                    block, ttl=ttl, tag=tag, tags=tags, key=self._block_key(number)
+                )
+                self._blocks[number] = entry.obj
+                entries.append(entry)
+                if len(block) < block_size:
+                    break
+            if len(rows) < (end - n) * block_size:
+                break
+            n = end
+        if entries:
+            await self._set_entries(entries)
+        return self._assemble_page(offset, limit).data
+
+    async def _set_entries(self, entries: List[CacheEntry]) -> bool:
+        if self._write_behind is not None:
+            for entry in entries:
+                await self._write_behind.put(entry)
+            return True
+        return await self._backend.set_many(entries)
+
+    def set_sync(
+        self, data: Any, *, ttl: int = None, tag: str = None, tags: Sequence[Any] = ()
+    ) -> bool:
+        """Synchronous version of `set`, for use in sync endpoints
+
+        NOTE: Always writes directly to the backend, also in write-behind mode.
+        """
+        entry = self._make_entry(data, ttl=ttl, tag=tag, tags=tags)
+        return self._backend.set_sync(
+            key=entry.key, obj=entry.obj, tags=entry.tags, ttl=entry.ttl
         )
 
-    def _make_raw_cache_object(self, data: Any) -> RawCacheObject:
-        return RawCacheObject(data)
+    def _make_entry(
+        self,
+        data: Any,
+        *,
+        ttl: int,
+        tag: str,
+        tags: Sequence[Any],
+        meta: dict = None,
+        key: str = None,
+    ) -> CacheEntry:
+        self._release_in_flight()
+        tags = list(tags)
+        if tag is not None:
+            tags.append(tag)
+        if self._policy is not None:
+            tags += self._policy.tags_for(self._request.path_params)
+        ttl = ttl or self._ttl or self._backend.ttl
+        if ttl and self._ttl_jitter > 0:
+            ttl = max(1, round(ttl * (1 - random.uniform(0, self._ttl_jitter))))
+        obj = self._make_raw_cache_object(data, ttl)
+        if meta:
+            obj.meta.update(meta)
+        if self._response is not None and "error" not in obj.meta:
+            self._set_ttl = ttl
+            self._response.headers.update(self.cache_headers())
+        return CacheEntry(key=key or self.key, obj=obj, tags=tags, ttl=ttl)
+
+    def _make_raw_cache_object(self, data: Any, ttl: int = None) -> RawCacheObject:
+        delta = None
+        if self._fetched_at is not None:
+            # Time spent recomputing the response, used for early expiration
+            delta = time.perf_counter() - self._fetched_at
+        return RawCacheObject(data, ttl=ttl or None, delta=delta)
 
     def _make_key(self, request: Request) -> str:
-        parts = [request.method, request.url.path]
+        parts = [request.method, _escape(request.url.path)]
+        key_params = None if self._policy is None else self._policy.query_params
+        page_params = () if self._page is None else self._pagination.params
         for k in request.query_params.keys():
-            if k == self._no_cache_query_param:
+            if k == self._no_cache_query_param or k in page_params:
+                continue
+            if key_params is not None and k not in key_params:
                 continue
             for v in request.query_params.getlist(k):
-                parts.append(f"{k}={v}")
+                parts.append(f"{_escape(k).replace('=', '%3D')}={_escape(v)}")
         return "|".join(sorted(parts))
 
 
+def _escape(part: str) -> str:
+    # Keep the parts of keys apart, see `warming.key_to_url`
+    return part.replace("%", "%25").replace("|", "%7C")
+
+
+def _block_numbers(offset: int, limit: int, block_size: int) -> range:
+    if limit <= 0:
+        return range(offset // block_size, offset // block_size)
+    return range(offset // block_size, (offset + limit - 1) // block_size + 1)
+
+
+def fragment_key(namespace: str, item_id: Any) -> str:
+    return f"fragment|{namespace}|{item_id}"
+
+
+def fragment_tag(namespace: str, item_id: Any) -> str:
+    return f"{namespace}-{item_id}"
+
+
+def _fragment_entry(namespace: str, item_id: Any, item: Any, ttl: int) -> CacheEntry:
+    return CacheEntry(
+        key=fragment_key(namespace, item_id),
+        obj=RawCacheObject(item, ttl=ttl),
+        tags=[fragment_tag(namespace, item_id)],
+        ttl=ttl,
+    )
+
+
+def _item_id(item: Any, id_key: str) -> Any:
+    try:
+        return item[id_key]
+    except (TypeError, KeyError):
+        return getattr(item, id_key)
+
+
+def _error_meta(exc: HTTPException) -> dict:
+    return {
+        "status_code": exc.status_code,
+        "detail": exc.detail,
+        "headers": getattr(exc, "headers", None),
+    }
+
+
 class NoOpResponseCache(ResponseCache):
-    """No-op version of the ResponseCache object returned by CacheDependency"""
+    """No-op version of the ResponseCache object returned by CacheDependency
+
+    Stateless, so `NOOP_RESPONSE_CACHE` is shared by all bypassed requests.
+    """
+
+    key = None
+    page = None
+    expired_early = False
 
     def __init__(self):
         self._obj = None
+        self._metrics = None
 
     async def fetch(self, *args, **kw):
         return
 
+    def cache_headers(self) -> Dict[str, str]:
+        return {}
+
     async def set(self, *args, **kw):
         return
+
+    async def set_error(self, *args, **kw):
+        return
+
+    async def set_fragments(self, *args, **kw):
+        return
+
+    async def set_fragment(self, *args, **kw):
+        return
+
+    async def set_page(self, fetch_rows, *, offset: int, limit: int, **kw):
+        rows = fetch_rows(offset, limit)
+        if inspect.isawaitable(rows):
+            rows = await rows
+        return list(rows)
+
+    def set_sync(self, *args, **kw):
+        return
+
+
+NOOP_RESPONSE_CACHE = NoOpResponseCache()
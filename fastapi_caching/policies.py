@@ -0,0 +1,189 @@
+import re
+from string import Formatter
+from typing import Any, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from starlette.routing import compile_path
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+__all__ = (
+    "CacheInvalidationMiddleware",
+    "CachePolicy",
+    "InvalidationRule",
+    "Pagination",
+)
+
+MUTATING_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+
+# (template, whether it has any fields to format)
+_Template = Tuple[str, bool]
+
+
+def _compile_tags(templates: Iterable[str], path: str) -> Tuple[_Template, ...]:
+    """Validate tag templates against the path parameters of `path`"""
+    regex, _, _ = compile_path(path)
+    params = set(regex.groupindex)
+    compiled = []
+    for template in templates:
+        fields = set()
+        for _, name, _, _ in Formatter().parse(template):
+            if name is None:
+                continue
+            field = re.split(r"[.\[]", name, 1)[0]
+            if field not in params:
+                raise ValueError(
+                    f"Tag template {template!r} uses {{{name}}}, which isn't a path "
+                    f"parameter of {path!r}"
+                )
+            fields.add(field)
+        compiled.append((template, bool(fields)))
+    return tuple(compiled)
+
+
+def _format_tags(templates: Sequence[_Template], params: Mapping[str, Any]):
+    return [t.format_map(params) if dynamic else t for t, dynamic in templates]
+
+
+class Pagination:
+    """Pagination query parameters of a route, see `CachePolicy`
+
+    Pages are given by `offset_param`, or by `page_param` (1-based page numbers)
+    if set, and `limit_param`. `default_limit` should match the endpoint's
+    default. Rows are cached in blocks of `block_size` rows, which all pages
+    overlapping a block share. Pages with a limit above `max_limit` aren't
+    cached, the same as pages with invalid parameters, so that a client can't
+    have huge runs of blocks fetched and cached.
+    """
+
+    def __init__(
+        self,
+        *,
+        offset_param: str = "offset",
+        limit_param: str = "limit",
+        page_param: str = None,
+        default_limit: int = 20,
+        block_size: int = 100,
+        max_limit: int = 1000,
+    ):
+        if block_size < 1:
+            raise ValueError(f"block_size must be at least 1, got {block_size}")
+        self.offset_param = offset_param
+        self.limit_param = limit_param
+        self.page_param = page_param
+        self.default_limit = default_limit
+        self.block_size = block_size
+        self.max_limit = max_limit
+        self.params = frozenset(
+            (limit_param, offset_param if page_param is None else page_param)
+        )
+
+    def window(self, query_params: Mapping[str, str]) -> Optional[Tuple[int, int]]:
+        """Return the requested `(offset, limit)`, or None if they're invalid
+
+        Limits above `max_limit` count as invalid.
+        """
+        try:
+            limit = int(query_params.get(self.limit_param, self.default_limit))
+            if self.page_param is not None:
+                offset = (int(query_params.get(self.page_param, 1)) - 1) * limit
+            else:
+                offset = int(query_params.get(self.offset_param, 0))
+        except ValueError:
+            return None
+        if offset < 0 or not 0 <= limit <= self.max_limit:
+            return None
+        return offset, limit
+
+
+class CachePolicy:
+    """Caching rules for the route with the given `path`
+
+    Tag templates are formatted with the route's path parameters, e.g.
+    `"product-{product_id}"`, and added to every entry set for the route.
+    `query_params` restricts which query parameters are part of the cache key,
+    by default all of them are. A policy's `ttl` takes precedence over the TTL
+    passed to `CacheManager.from_request`.
+
+    With `pagination`, the pagination parameters are left out of the cache key
+    and responses are cached in blocks of rows with `ResponseCache.set_page`.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        ttl: int = None,
+        tags: Sequence[str] = (),
+        query_params: Sequence[str] = None,
+        pagination: Pagination = None,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.pagination = pagination
+        self.query_params = None if query_params is None else frozenset(query_params)
+        self._regex = compile_path(path)[0]
+        self._tags = _compile_tags(tags, path)
+
+    def match(self, path: str) -> Optional[Mapping[str, str]]:
+        """Return the path parameters if the given URL path matches the policy"""
+        match = self._regex.match(path)
+        return None if match is None else match.groupdict()
+
+    def tags_for(self, path_params: Mapping[str, Any]) -> List[str]:
+        return _format_tags(self._tags, path_params)
+
+
+class InvalidationRule:
+    """Tags to invalidate when a request to `path` with one of `methods` succeeds"""
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        tags: Sequence[str],
+        methods: Sequence[str] = MUTATING_METHODS,
+    ):
+        self.path = path
+        self.methods = frozenset(m.upper() for m in methods)
+        self._regex = compile_path(path)[0]
+        self._tags = _compile_tags(tags, path)
+
+    def tags_for(self, method: str, path: str) -> Optional[List[str]]:
+        """Return the tags to invalidate, or None if the request doesn't match"""
+        if method not in self.methods:
+            return None
+        match = self._regex.match(path)
+        if match is None:
+            return None
+        return _format_tags(self._tags, match.groupdict())
+
+
+class CacheInvalidationMiddleware:
+    """Applies the invalidation rules registered on a `CacheManager`
+
+    Tags are invalidated when the response starts with a 2xx or 3xx status, but
+    before it's sent, so a client reading right after its write doesn't see
+    stale data (unless the manager has an `invalidation_delay`).
+
+        app.add_middleware(CacheInvalidationMiddleware, cache_manager=cache_manager)
+    """
+
+    def __init__(self, app: ASGIApp, cache_manager):
+        self.app = app
+        self.cache_manager = cache_manager
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        tags = self.cache_manager.invalidation_tags(scope["method"], scope["path"])
+        if not tags:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                await self.cache_manager.invalidate_tags(tags)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
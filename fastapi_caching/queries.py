@@ -0,0 +1,255 @@
+"""Cache-aside for `databases` query results, tagged by the tables they read
+
+Results of SQLAlchemy Core queries are tagged by the tables they read. Writes
+through the same object invalidate the tags of the tables they modify. Lookups by
+primary key get a tag of their own, so writing one row only invalidates lookups
+of that row and queries which aren't lookups by primary key.
+
+NOTE: Writes are invalidated right after they're executed. Within a transaction,
+      another request may cache the old data again before the transaction is
+      committed, so invalidate the affected tables after committing as well.
+"""
+
+import hashlib
+import logging
+from typing import Any, Iterable, List, Mapping, Optional, Sequence, Set
+
+from .manager import CacheManager
+
+__all__ = ("QueryCache",)
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+def table_tag(table: str) -> str:
+    """Tag of queries reading the table, other than lookups by primary key"""
+    return f"table:{table}"
+
+
+def row_tag(table: str, pk: Any) -> str:
+    """Tag of lookups of the row with the given primary key"""
+    return f"table:{table}:{pk}"
+
+
+def rows_tag(table: str) -> str:
+    """Tag of all lookups by primary key in the table"""
+    return f"table:{table}:*"
+
+
+class QueryCache:
+    """Wraps a `databases.Database`, caching query results in the cache backend
+
+        db = QueryCache(database, cache_manager)
+        products = await db.fetch_all(product_tbl.select())
+        await db.execute(product_tbl.insert().values(...))  # Invalidates products
+
+    Rows are returned as dicts, whether they were cached or not. Queries given as
+    SQL strings are only cached if `tables` are given, and writes given as SQL
+    strings only invalidate the given `tables`.
+    """
+
+    def __init__(self, database, cache_manager: CacheManager, *, ttl: int = None):
+        self._database = database
+        self._cache_manager = cache_manager
+        self._ttl = ttl
+
+    @property
+    def database(self):
+        return self._database
+
+    async def fetch_all(
+        self,
+        query,
+        values: Mapping[str, Any] = None,
+        *,
+        ttl: int = None,
+        tables: Sequence[str] = None,
+    ) -> List[dict]:
+        async def fetch():
+            rows = await self._database.fetch_all(query, values)
+            return [_row_to_dict(row) for row in rows]
+
+        return await self._cached("all", query, values, fetch, ttl, tables)
+
+    async def fetch_one(
+        self,
+        query,
+        values: Mapping[str, Any] = None,
+        *,
+        ttl: int = None,
+        tables: Sequence[str] = None,
+    ) -> Optional[dict]:
+        async def fetch():
+            row = await self._database.fetch_one(query, values)
+            return None if row is None else _row_to_dict(row)
+
+        return await self._cached("one", query, values, fetch, ttl, tables)
+
+    async def fetch_val(
+        self,
+        query,
+        values: Mapping[str, Any] = None,
+        column: Any = 0,
+        *,
+        ttl: int = None,
+        tables: Sequence[str] = None,
+    ) -> Any:
+        async def fetch():
+            return await self._database.fetch_val(query, values, column)
+
+        return await self._cached(f"val:{column}", query, values, fetch, ttl, tables)
+
+    async def execute(
+        self, query, values: Mapping[str, Any] = None, *, tables: Sequence[str] = None
+    ) -> Any:
+        """Execute a write and invalidate cached reads of the modified table"""
+        result = await self._database.execute(query, values)
+        await self._invalidate(query, [values or {}], tables)
+        return result
+
+    async def execute_many(
+        self,
+        query,
+        values: Sequence[Mapping[str, Any]],
+        *,
+        tables: Sequence[str] = None,
+    ):
+        await self._database.execute_many(query, values)
+        await self._invalidate(query, values, tables)
+
+    async def invalidate_tables(self, tables: Iterable[str]):
+        """Invalidate all cached reads of the given tables"""
+        tags = []
+        for table in tables:
+            tags += [table_tag(table), rows_tag(table)]
+        await self._cache_manager.invalidate_tags(tags)
+
+    async def _cached(self, kind, query, values, fetch, ttl, tables):
+        backend = self._cache_manager.backend
+        tags = _read_tags(query, tables)
+        if tags is None or not backend.is_enabled():
+            return await fetch()
+
+        key = _make_key(kind, query, values)
+        cached = await backend.get(key)
+        if cached is not None:
+            return cached.data
+        result = await fetch()
+        await backend.set(key, result, tags=tags, ttl=ttl or self._ttl)
+        return result
+
+    async def _invalidate(self, query, values_list, tables):
+        if tables is not None:
+            await self.invalidate_tables(tables)
+            return
+        tags = _write_tags(query, values_list)
+        if tags is None:
+            logger.warning(
+                "Can't tell which tables the query modifies, pass `tables` to "
+                "invalidate cached reads: %s",
+                query,
+            )
+            return
+        await self._cache_manager.invalidate_tags(tags)
+
+
+def _row_to_dict(row) -> dict:
+    mapping = getattr(row, "_mapping", row)
+    return dict(mapping)
+
+
+def _make_key(kind: str, query, values: Optional[Mapping[str, Any]]) -> str:
+    if isinstance(query, str):
+        sql, params = query, {}
+    else:
+        compiled = query.compile()
+        sql, params = str(compiled), compiled.params
+    params = {**params, **(values or {})}
+    h = hashlib.blake2b(digest_size=16)
+    h.update(sql.encode())
+    h.update(repr(sorted(params.items(), key=lambda i: i[0])).encode())
+    return f"query:{kind}:{h.hexdigest()}"
+
+
+def _read_tags(query, tables: Optional[Sequence[str]]) -> Optional[List[str]]:
+    if tables is not None:
+        return [table_tag(table) for table in tables]
+    if isinstance(query, str):
+        return None
+
+    read_tables = _tables(query)
+    if not read_tables:
+        return None
+    if len(read_tables) == 1:
+        (table,) = read_tables
+        pk = _pk_lookup(table, getattr(query, "whereclause", None))
+        if pk is not _MISSING:
+            return [row_tag(table.name, pk), rows_tag(table.name)]
+    return [table_tag(table.name) for table in read_tables]
+
+
+def _write_tags(query, values_list: Sequence[Mapping[str, Any]]) -> Optional[List]:
+    if isinstance(query, str):
+        return None
+    table = getattr(query, "table", None)
+    if table is None or not hasattr(table, "primary_key"):
+        return None
+
+    from sqlalchemy.sql import Insert
+
+    pks: Set[Any] = set()
+    if isinstance(query, Insert):
+        pk_columns = list(table.primary_key.columns)
+        params = query.compile().params
+        for values in values_list:
+            if len(pk_columns) != 1:
+                pks.add(_MISSING)
+                break
+            pks.add({**params, **values}.get(pk_columns[0].key, _MISSING))
+    else:
+        pks.add(_pk_lookup(table, getattr(query, "whereclause", None)))
+
+    tags = [table_tag(table.name)]
+    if _MISSING in pks or None in pks:
+        tags.append(rows_tag(table.name))
+    else:
+        tags += [row_tag(table.name, pk) for pk in pks]
+    return tags
+
+
+def _tables(query) -> Set:
+    from sqlalchemy import Table
+    from sqlalchemy.sql import visitors
+
+    return {elem for elem in visitors.iterate(query) if isinstance(elem, Table)}
+
+
+def _pk_lookup(table, whereclause) -> Any:
+    """Return the primary key value the clause filters on, or `_MISSING`"""
+    from sqlalchemy import Column
+    from sqlalchemy.sql import operators
+    from sqlalchemy.sql.elements import BinaryExpression, BindParameter
+
+    if whereclause is None or len(table.primary_key.columns) != 1:
+        return _MISSING
+    clauses = [whereclause]
+    if getattr(whereclause, "operator", None) is operators.and_:
+        clauses = list(whereclause.clauses)
+    for clause in clauses:
+        if not isinstance(clause, BinaryExpression):
+            continue
+        elif clause.operator is not operators.eq:
+            continue
+        left, right = clause.left, clause.right
+        if isinstance(right, Column):
+            left, right = right, left
+        if (
+            isinstance(left, Column)
+            and left.table is table
+            and left.primary_key
+            and isinstance(right, BindParameter)
+        ):
+            return right.effective_value
+    return _MISSING
@@ -1,12 +1,171 @@
-from dataclasses import dataclass, field
-from datetime import datetime
-from typing import Any, Dict
+import math
+import pickle
+import struct
+import time
+import zlib
+from datetime import datetime, timezone
+from typing import Any, Dict, NamedTuple, Optional
 
 __all__ = ("RawCacheObject",)
 
+VERSION = 1
+FORMAT_PICKLE = 0
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+
+_MAGIC = b"FC"
+_FLAG_META = 1
+# magic, version, format, compression, flags, timestamp, ttl (0 = none),
+# delta (NaN = none)
+_HEADER = struct.Struct("<2sBBBBdIf")
+_MAX_TTL = 2**32 - 1
+
 
-@dataclass
 class RawCacheObject:
-    data: Any
-    timestamp: datetime = field(default_factory=datetime.utcnow)
-    meta: Dict[str, Any] = field(default_factory=dict)  # For future usage
+    """A cached value, and when and for how long it was cached
+
+    `timestamp` is seconds since the epoch, `ttl` and `delta` (the seconds it
+    took to compute the value) are optional. `meta` holds any other details,
+    such as cached errors.
+    """
+
+    __slots__ = ("data", "timestamp", "ttl", "delta", "meta")
+
+    def __init__(
+        self,
+        data: Any,
+        timestamp: float = None,
+        meta: Dict[str, Any] = None,
+        *,
+        ttl: int = None,
+        delta: float = None,
+    ):
+        if timestamp is None:
+            timestamp = time.time()
+        elif isinstance(timestamp, datetime):
+            timestamp = _epoch(timestamp)
+        self.data = data
+        self.timestamp = timestamp
+        self.ttl = ttl
+        self.delta = delta
+        self.meta = {} if meta is None else meta
+
+    def __repr__(self) -> str:
+        return (
+            f"RawCacheObject(data={self.data!r}, timestamp={self.timestamp!r}, "
+            f"ttl={self.ttl!r}, delta={self.delta!r}, meta={self.meta!r})"
+        )
+
+    def __eq__(self, other: Any) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return all(getattr(self, s) == getattr(other, s) for s in self.__slots__)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {s: getattr(self, s) for s in self.__slots__}
+
+    def __setstate__(self, state: Dict[str, Any]):
+        # NOTE: Entries pickled by older versions store the TTL and delta in
+        #       `meta`, and the timestamp as a naive UTC datetime
+        meta = dict(state.get("meta") or {})
+        timestamp = state["timestamp"]
+        self.data = state["data"]
+        self.timestamp = (
+            _epoch(timestamp) if isinstance(timestamp, datetime) else timestamp
+        )
+        self.ttl = state.get("ttl", meta.pop("ttl", None))
+        self.delta = state.get("delta", meta.pop("delta", None))
+        self.meta = meta
+
+
+class Header(NamedTuple):
+    version: int
+    format: int
+    compression: int
+    timestamp: float
+    ttl: Optional[int]
+
+
+def dumps(obj: RawCacheObject, *, compress_min_size: int = None) -> bytes:
+    """Serialize the object behind a fixed size header
+
+    The payload is compressed with zlib when it's at least `compress_min_size`
+    bytes long. Fractional TTLs are rounded up to whole seconds.
+    """
+    flags = 0
+    if obj.meta:
+        flags |= _FLAG_META
+        payload = pickle.dumps((obj.data, obj.meta))
+    else:
+        payload = pickle.dumps(obj.data)
+    compression = COMPRESSION_NONE
+    if compress_min_size is not None and len(payload) >= compress_min_size:
+        payload = zlib.compress(payload)
+        compression = COMPRESSION_ZLIB
+    header = _HEADER.pack(
+        _MAGIC,
+        VERSION,
+        FORMAT_PICKLE,
+        compression,
+        flags,
+        obj.timestamp,
+        _header_ttl(obj.ttl),
+        math.nan if obj.delta is None else obj.delta,
+    )
+    return header + payload
+
+
+def loads(raw: bytes) -> RawCacheObject:
+    """Deserialize an object written by `dumps`, or pickled by older versions"""
+    if raw[:2] != _MAGIC:
+        return pickle.loads(raw)
+    _, version, fmt, compression, flags, timestamp, ttl, delta = _unpack(raw)
+    payload = memoryview(raw)[_HEADER.size :]
+    if compression == COMPRESSION_ZLIB:
+        payload = zlib.decompress(payload)
+    elif compression != COMPRESSION_NONE:
+        raise ValueError(f"Unsupported cache entry compression: {compression}")
+    if fmt != FORMAT_PICKLE:
+        raise ValueError(f"Unsupported cache entry format: {fmt}")
+    data = pickle.loads(payload)
+    meta = None
+    if flags & _FLAG_META:
+        data, meta = data
+    return RawCacheObject(
+        data,
+        timestamp,
+        meta,
+        ttl=ttl or None,
+        delta=None if math.isnan(delta) else delta,
+    )
+
+
+def read_header(raw: bytes) -> Header:
+    """Read an entry's header without deserializing its payload"""
+    if raw[:2] != _MAGIC:
+        obj = pickle.loads(raw)
+        return Header(0, FORMAT_PICKLE, COMPRESSION_NONE, obj.timestamp, obj.ttl)
+    _, version, fmt, compression, _, timestamp, ttl, _ = _unpack(raw)
+    return Header(version, fmt, compression, timestamp, ttl or None)
+
+
+def _header_ttl(ttl: Optional[float]) -> int:
+    if not ttl:
+        return 0
+    seconds = math.ceil(ttl)
+    if not 0 < seconds <= _MAX_TTL:
+        raise ValueError(f"TTL must be between 0 and {_MAX_TTL} seconds, got {ttl!r}")
+    return seconds
+
+
+def _unpack(raw: bytes):
+    fields = _HEADER.unpack_from(raw)
+    if fields[1] > VERSION:
+        raise ValueError(f"Unsupported cache entry version: {fields[1]}")
+    return fields
+
+
+def _epoch(dt: datetime) -> float:
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
@@ -0,0 +1,154 @@
+"""File format of `InMemoryBackend` snapshots
+
+A header with the app version and the number of entries is followed by the
+entries, each one as its wall clock expiry time, key and serialized value, and
+then by the tag index. Entries are written in order of expiry, and handed to the
+caller one by one as they're read from a memory map. Expired entries are skipped
+without copying them.
+"""
+
+import contextlib
+import mmap
+import os
+import struct
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+__all__ = ("SnapshotError",)
+
+VERSION = 1
+
+_MAGIC = b"FCSNAP"
+# magic, version, app version length
+_HEADER = struct.Struct("<6sBH")
+# created at, number of entries
+_COUNT = struct.Struct("<dI")
+# expires at, key length, value length
+_ENTRY = struct.Struct("<dII")
+_LENGTH = struct.Struct("<I")
+# tag length, number of keys
+_TAG = struct.Struct("<II")
+
+# (expires at, key, serialized value)
+Entry = Tuple[float, str, bytes]
+
+
+class SnapshotError(ValueError):
+    """The file isn't a snapshot the backend can restore"""
+
+
+def write(
+    path: str,
+    *,
+    app_version: Optional[str],
+    created_at: float,
+    entries: Sequence[Entry],
+    tags: Dict[str, Iterable[str]],
+):
+    """Write the snapshot to a temporary file, then move it to `path`
+
+    `entries` must be ordered by expiry, the order `read` passes them on in.
+    """
+    version = (app_version or "").encode()
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        _write(tmp_path, version, created_at, entries, tags)
+        os.replace(tmp_path, path)
+    finally:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp_path)
+
+
+def _write(
+    path: str,
+    version: bytes,
+    created_at: float,
+    entries: Sequence[Entry],
+    tags: Dict[str, Iterable[str]],
+):
+    with open(path, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, VERSION, len(version)))
+        f.write(version)
+        f.write(_COUNT.pack(created_at, len(entries)))
+        for expires_at, key, value in entries:
+            key_bytes = key.encode()
+            f.write(_ENTRY.pack(expires_at, len(key_bytes), len(value)))
+            f.write(key_bytes)
+            f.write(value)
+        f.write(_LENGTH.pack(len(tags)))
+        for tag, keys in tags.items():
+            tag_bytes = tag.encode()
+            key_list = [key.encode() for key in keys]
+            f.write(_TAG.pack(len(tag_bytes), len(key_list)))
+            f.write(tag_bytes)
+            for key_bytes in key_list:
+                f.write(_LENGTH.pack(len(key_bytes)))
+                f.write(key_bytes)
+
+
+def read(
+    path: str,
+    *,
+    app_version: Optional[str],
+    now: float,
+    on_entry: Callable[[float, str, bytes], None],
+) -> Dict[str, List[str]]:
+    """Call `on_entry` for each unexpired entry, and return the tag index
+
+    Raises `SnapshotError` if the file isn't a snapshot of a compatible version,
+    or was written by a different app version. A truncated or corrupt snapshot
+    may raise after some of its entries were passed to `on_entry`.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise SnapshotError("Empty snapshot file")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            try:
+                return _read(mm, app_version, now, on_entry)
+            except (struct.error, UnicodeDecodeError) as exc:
+                raise SnapshotError(f"Truncated or corrupt snapshot: {exc}") from None
+
+
+def _read(mm: mmap.mmap, app_version: Optional[str], now: float, on_entry):
+    magic, version, version_size = _HEADER.unpack_from(mm, 0)
+    if magic != _MAGIC:
+        raise SnapshotError("Not a cache snapshot")
+    elif version > VERSION:
+        raise SnapshotError(f"Unsupported snapshot version: {version}")
+    offset = _HEADER.size
+    snapshot_version = mm[offset : offset + version_size].decode()
+    if snapshot_version != (app_version or ""):
+        raise SnapshotError(
+            f"Snapshot of app version {snapshot_version!r}, expected {app_version!r}"
+        )
+    offset += version_size
+    _, count = _COUNT.unpack_from(mm, offset)
+    offset += _COUNT.size
+
+    for _ in range(count):
+        expires_at, key_size, value_size = _ENTRY.unpack_from(mm, offset)
+        offset += _ENTRY.size
+        if offset + key_size + value_size > len(mm):
+            raise struct.error("entries extend past the end of the file")
+        if expires_at > now:
+            key = mm[offset : offset + key_size].decode()
+            on_entry(
+                expires_at, key, mm[offset + key_size : offset + key_size + value_size]
+            )
+        offset += key_size + value_size
+
+    tags = {}
+    (tag_count,) = _LENGTH.unpack_from(mm, offset)
+    offset += _LENGTH.size
+    for _ in range(tag_count):
+        tag_size, key_count = _TAG.unpack_from(mm, offset)
+        offset += _TAG.size
+        tag = mm[offset : offset + tag_size].decode()
+        offset += tag_size
+        keys = []
+        for _ in range(key_count):
+            (key_size,) = _LENGTH.unpack_from(mm, offset)
+            offset += _LENGTH.size
+            keys.append(mm[offset : offset + key_size].decode())
+            offset += key_size
+        tags[tag] = keys
+    return tags
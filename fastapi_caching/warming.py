@@ -0,0 +1,158 @@
+"""Warm the cache by requesting routes of an app in-process
+
+Can also be used from the command line, e.g.:
+
+    python -m fastapi_caching.warming myapp.main:app /products /products/1
+
+NOTE: Warming from a separate process only makes sense for shared backends such
+      as `RedisBackend`. Use `warm_on_startup` for process local backends.
+"""
+
+import argparse
+import asyncio
+import importlib
+import logging
+from typing import Dict, Iterable, List, Sequence
+from urllib.parse import quote, unquote, urlencode
+
+__all__ = ("warm_routes", "warm_keys", "warm_on_startup", "key_to_url")
+
+logger = logging.getLogger(__name__)
+
+
+async def warm_routes(
+    app,
+    urls: Iterable[str],
+    *,
+    concurrency: int = 10,
+    headers: Dict[str, str] = None,
+) -> Dict[str, int]:
+    """Request the given URLs from the ASGI app so their responses get cached
+
+    Returns the response status code for each URL. URLs that couldn't be
+    requested are logged and left out.
+    """
+    import httpx
+
+    semaphore = asyncio.Semaphore(concurrency)
+    results = {}
+
+    async def warm(client, url):
+        async with semaphore:
+            try:
+                resp = await client.get(url, headers=headers)
+            except Exception:
+                logger.exception("Failed to warm %s", url)
+            else:
+                results[url] = resp.status_code
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://warmer") as c:
+        await asyncio.gather(*(warm(c, url) for url in urls))
+
+    logger.info("Warmed %d URLs", len(results))
+    return results
+
+
+async def warm_keys(
+    app, keys: Iterable[str], *, concurrency: int = 10, headers: Dict[str, str] = None
+) -> Dict[str, int]:
+    """Request the URLs that correspond to the given `ResponseCache` keys"""
+    urls = []
+    for key in keys:
+        method, url = key_to_url(key)
+        if method == "GET":
+            urls.append(url)
+    return await warm_routes(app, urls, concurrency=concurrency, headers=headers)
+
+
+def warm_on_startup(
+    app, urls: Sequence[str], *, concurrency: int = 10, headers: Dict[str, str] = None
+):
+    """Warm the given URLs in the background once the app has started
+
+    Should be called after the app's other startup handlers have been added, so
+    that e.g. database connections are available when warming. Warming still in
+    progress when the app shuts down is cancelled.
+    """
+    tasks = []
+
+    async def on_startup():
+        tasks.append(
+            asyncio.ensure_future(
+                warm_routes(app, urls, concurrency=concurrency, headers=headers)
+            )
+        )
+
+    async def on_shutdown():
+        while tasks:
+            task = tasks.pop()
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    app.router.add_event_handler("startup", on_startup)
+    app.router.add_event_handler("shutdown", on_shutdown)
+
+
+def key_to_url(key: str):
+    """Return the method and URL that a `ResponseCache` key was created from"""
+    method = None
+    path = None
+    query = []
+    for part in key.split("|"):
+        if part.startswith("/"):
+            path = quote(unquote(part))
+        elif "=" in part:
+            name, value = part.split("=", 1)
+            query.append((unquote(name), unquote(value)))
+        else:
+            method = part
+    if query:
+        path = f"{path}?{urlencode(query)}"
+    return method, path
+
+
+def _import_app(app_path: str):
+    module_path, _, attr = app_path.partition(":")
+    module = importlib.import_module(module_path)
+    return getattr(module, attr or "app")
+
+
+async def _run(app, urls: List[str], concurrency: int) -> Dict[str, int]:
+    async with app.router.lifespan_context(app):
+        return await warm_routes(app, urls, concurrency=concurrency)
+
+
+def main(argv: Sequence[str] = None):
+    parser = argparse.ArgumentParser(
+        description="Warm the cache by requesting routes of an ASGI app in-process"
+    )
+    parser.add_argument("app", help="The app to warm, e.g. `myapp.main:app`")
+    parser.add_argument("urls", nargs="*", help="URLs to request")
+    parser.add_argument(
+        "--keys-file", help="File with one recorded cache key per line to request"
+    )
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    urls = list(args.urls)
+    if args.keys_file:
+        with open(args.keys_file) as f:
+            for line in f:
+                method, url = key_to_url(line.strip())
+                if method == "GET":
+                    urls.append(url)
+
+    logging.basicConfig(level=logging.INFO)
+    results = asyncio.run(_run(_import_app(args.app), urls, args.concurrency))
+    failed = [url for url, status in results.items() if status >= 400]
+    for url in failed:
+        logger.warning("Got status code %d for %s", results[url], url)
+    return 1 if failed or len(results) < len(urls) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
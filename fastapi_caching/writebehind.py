@@ -0,0 +1,183 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Dict, Iterable
+
+from .backends import CacheBackendBase, CacheEntry
+
+__all__ = ("InvalidationBuffer", "WriteBehindQueue")
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindQueue:
+    """Apply cache writes from a background task instead of the request
+
+    Writes to a key which is still queued replace the queued write, and queued
+    writes are sent to the backend in batches (a single pipeline for Redis).
+    When `maxsize` writes are pending, `put` waits for the worker to catch up.
+    `discard_tags` drops queued writes whose tags are being invalidated, so that
+    they aren't written after the invalidation.
+
+    NOTE: Data is serialized by the worker, so it must not be mutated after it's
+          been queued.
+    """
+
+    def __init__(
+        self, backend: CacheBackendBase, *, maxsize: int = 10_000, batch_size: int = 100
+    ):
+        self._backend = backend
+        self._maxsize = maxsize
+        self._batch_size = batch_size
+        self._pending: Dict[str, CacheEntry] = OrderedDict()
+        self._task = None
+        self._wakeup = None
+        self._drained = None
+        self._write_lock = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    async def put(self, entry: CacheEntry):
+        """Queue the given write"""
+        self._ensure_started()
+        if entry.key not in self._pending:
+            while len(self._pending) >= self._maxsize:
+                self._drained.clear()
+                await self._drained.wait()
+        self._pending[entry.key] = entry
+        self._wakeup.set()
+
+    async def discard_tags(self, tags: Iterable[str]):
+        """Drop queued writes tagged with any of the given tags
+
+        Waits for a batch that the worker may currently be writing, which the
+        tags' invalidation has to come after.
+        """
+        tags = set(tags)
+        for key, entry in list(self._pending.items()):
+            if not tags.isdisjoint(entry.tags):
+                del self._pending[key]
+        if self._task is not None:
+            async with self._write_lock:
+                pass
+
+    async def flush(self):
+        """Write all queued entries to the backend"""
+        if self._task is None:
+            return
+        while self._pending:
+            await self._write_batch()
+        # Wait for a batch that the worker may currently be writing
+        async with self._write_lock:
+            pass
+
+    async def close(self):
+        """Flush queued writes and stop the background worker"""
+        await self.flush()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def _ensure_started(self):
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._drained = asyncio.Event()
+            self._write_lock = asyncio.Lock()
+            self._task = asyncio.ensure_future(self._run())
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while self._pending:
+                await self._write_batch()
+
+    async def _write_batch(self):
+        async with self._write_lock:
+            batch = []
+            while self._pending and len(batch) < self._batch_size:
+                _, entry = self._pending.popitem(last=False)
+                batch.append(entry)
+            self._drained.set()
+            if not batch:
+                return
+            try:
+                await self._backend.set_many(batch)
+            except Exception:
+                logger.exception("Failed to write %d cache entries", len(batch))
+
+
+class InvalidationBuffer:
+    """Apply tag invalidations in batches from a background task
+
+    Tags are deduplicated while they're pending. A batch is invalidated once no
+    tags were added for `delay` seconds, but never later than `max_delay` seconds
+    after its first tag was added.
+    """
+
+    def __init__(
+        self, backend: CacheBackendBase, *, delay: float = 0.05, max_delay: float = 1.0
+    ):
+        self._backend = backend
+        self._delay = delay
+        self._max_delay = max_delay
+        self._pending: Dict[str, None] = {}
+        self._task = None
+        self._added = None
+        self._invalidate_lock = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(self, tags: Iterable[str]):
+        """Queue the invalidation of the given tags"""
+        self._ensure_started()
+        self._pending.update(dict.fromkeys(tags))
+        self._added.set()
+
+    async def flush(self):
+        """Invalidate all queued tags"""
+        if self._task is None:
+            return
+        await self._invalidate_batch()
+
+    async def close(self):
+        """Flush queued invalidations and stop the background worker"""
+        await self.flush()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def _ensure_started(self):
+        if self._task is None:
+            self._added = asyncio.Event()
+            self._invalidate_lock = asyncio.Lock()
+            self._task = asyncio.ensure_future(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            await self._added.wait()
+            deadline = loop.time() + self._max_delay
+            while True:
+                self._added.clear()
+                timeout = min(self._delay, deadline - loop.time())
+                if timeout <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(self._added.wait(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            await self._invalidate_batch()
+
+    async def _invalidate_batch(self):
+        async with self._invalidate_lock:
+            tags = list(self._pending)
+            self._pending.clear()
+            if not tags:
+                return
+            try:
+                await self._backend.invalidate_tags(tags)
+            except Exception:
+                logger.exception("Failed to invalidate %d cache tags", len(tags))
@@ -5,7 +5,9 @@ from setuptools import find_packages, setup
 install_requires = ["fastapi", "cachetools"]
 
 extras_require = {
-    "redis": ["aioredis"],
+    "redis": ["redis>=5.0.1"],
+    "warming": ["httpx"],
+    "opentelemetry": ["opentelemetry-api"],
     "examples": [
         "uvicorn==0.11.5",  # Logging issues with newer versions
         "databases[sqlite]",
@@ -16,8 +18,9 @@ extras_require = {
         "pytest-asyncio",
         "requests",
         "httpx",
-        "fakeredis",
+        "fakeredis>=2.0",
         "lupa",
+        "databases[sqlite]",
     ],
     "dev": ["black", "isort", "watchgod>=0.6,<0.7"],
 }
@@ -42,11 +45,14 @@ setup(
     long_description_content_type="text/markdown",
     license="MIT",
     packages=find_packages(".", include=["fastapi_caching"]),
-    python_requires=">=3.6",
+    python_requires=">=3.8",
     zip_safe=False,
     package_data={"fastapi_caching": ["py.typed"]},
     install_requires=install_requires,
     extras_require=extras_require,
+    entry_points={
+        "console_scripts": ["fastapi-caching-warm=fastapi_caching.warming:main"],
+    },
     classifiers=[
         "Intended Audience :: Information Technology",
         "Intended Audience :: System Administrators",
@@ -64,9 +70,10 @@ setup(
         "Intended Audience :: Developers",
         "License :: OSI Approved :: MIT License",
         "Programming Language :: Python :: 3 :: Only",
-        "Programming Language :: Python :: 3.6",
-        "Programming Language :: Python :: 3.7",
         "Programming Language :: Python :: 3.8",
+        "Programming Language :: Python :: 3.9",
+        "Programming Language :: Python :: 3.10",
+        "Programming Language :: Python :: 3.11",
         "Topic :: Internet :: WWW/HTTP",
     ],
 )
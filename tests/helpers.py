@@ -1,5 +1,8 @@
-import aioredis
-from fakeredis.aioredis import FakeConnectionsPool
+import os
+from urllib.parse import urlsplit
+
+import pytest
+from fakeredis import FakeAsyncRedis
 
 from fastapi_caching import InMemoryBackend, RedisBackend
 
@@ -8,10 +11,26 @@ def make_inmemory_backend():
     return InMemoryBackend()
 
 
+def make_tinylfu_backend():
+    return InMemoryBackend(admission="tinylfu")
+
+
 def make_redis_backend():
-    pool = FakeConnectionsPool(minsize=1, maxsize=10)
-    return RedisBackend(redis=aioredis.Redis(pool))
+    return RedisBackend(redis=FakeAsyncRedis())
 
 
 def make_caching_backends():
-    return (make_inmemory_backend(), make_redis_backend())
+    return (make_inmemory_backend(), make_tinylfu_backend(), make_redis_backend())
+
+
+# Tests needing features fakeredis lacks, e.g. CLIENT TRACKING, run against the
+# Redis server at REDIS_URL
+REDIS_URL = os.environ.get("REDIS_URL")
+requires_redis = pytest.mark.skipif(not REDIS_URL, reason="REDIS_URL is not set")
+
+
+def make_real_redis_backend(**kw):
+    url = urlsplit(REDIS_URL)
+    return RedisBackend(
+        host=url.hostname, port=url.port or 6379, password=url.password, **kw
+    )
@@ -0,0 +1,45 @@
+from fastapi_caching.admission import TinyLFUCache
+
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_that_frequently_used_entries_survive_a_scan():
+    cache = TinyLFUCache(100, ttl=60)
+    hot_keys = [f"hot-{i}" for i in range(50)]
+    for key in hot_keys:
+        cache[key] = key
+
+    for i in range(10_000):
+        cache[f"once-{i}"] = i
+        key = hot_keys[i % len(hot_keys)]
+        assert cache[key] == key
+
+    assert len(cache) <= 100
+
+
+def test_that_entries_expire():
+    timer = FakeTimer()
+    cache = TinyLFUCache(10, ttl=60, timer=timer)
+    cache["a"] = 1
+    cache.set("b", 2, ttl=120)
+
+    timer.now = 90
+
+    assert "a" not in cache
+    assert cache["b"] == 2
+
+
+def test_that_evictions_are_reported():
+    evictions = []
+    cache = TinyLFUCache(10, ttl=60, on_evict=lambda: evictions.append(1))
+    for i in range(20):
+        cache[i] = i
+
+    assert len(cache) == 10
+    assert len(evictions) == 10
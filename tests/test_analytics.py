@@ -0,0 +1,74 @@
+import random
+
+import pytest
+
+from fastapi_caching import (
+    AccessSampler,
+    CacheManager,
+    CountMinSketch,
+    HyperLogLog,
+    InMemoryBackend,
+    ResponseCache,
+    analytics_router,
+)
+from fastapi_caching.analytics import hash64
+
+
+def test_that_count_min_sketch_never_undercounts():
+    sketch = CountMinSketch(width=64, depth=4)
+    counts = {f"key-{i}": i for i in range(200)}
+    for key, count in counts.items():
+        sketch.add(hash64(key), count)
+
+    for key, count in counts.items():
+        assert sketch.estimate(hash64(key)) >= count
+
+
+def test_that_hyperloglog_estimates_distinct_items():
+    hll = HyperLogLog(p=12)
+    for i in range(50_000):
+        hll.add(hash64(f"key-{i % 20_000}"))
+
+    assert 19_000 < hll.count() < 21_000
+
+
+def test_that_sampler_finds_hot_keys():
+    rng = random.Random(42)
+    sampler = AccessSampler(sample_rate=1.0, top_k=3)
+    cold_keys = [f"cold-{rng.randrange(1000)}" for _ in range(2000)]
+    for key in cold_keys:
+        sampler.record(key, hit=False)
+    for key in ("hot-a", "hot-b", "hot-c"):
+        for _ in range(100):
+            sampler.record(key, hit=True)
+
+    stats = sampler.stats()
+
+    assert {k["key"] for k in stats["top_keys"]} == {"hot-a", "hot-b", "hot-c"}
+    assert abs(stats["distinct_keys"] - len(set(cold_keys)) - 3) < 20
+
+
+@pytest.mark.asyncio
+async def test_that_route_hit_ratios_are_exposed(app, async_client):
+    sampler = AccessSampler(sample_rate=1.0)
+    cache_manager = CacheManager(InMemoryBackend(), sampler=sampler)
+    app.include_router(analytics_router(sampler))
+
+    @app.get("/products/{product_id}")
+    async def get_product(
+        product_id: int, rcache: ResponseCache = cache_manager.from_request()
+    ):
+        await rcache.set(product_id)
+        return product_id
+
+    for _ in range(3):
+        await async_client.get("/products/1")
+    resp = await async_client.get("/__cache/analytics")
+
+    stats = resp.json()
+    assert stats["routes"]["/products/{product_id}"] == {
+        "hits": 2,
+        "misses": 1,
+        "hit_ratio": 2 / 3,
+    }
+    assert stats["top_keys"] == [{"key": "/products/1|GET", "accesses": 3}]
@@ -1,6 +1,12 @@
+import asyncio
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
 import pytest
+from fakeredis import FakeAsyncRedis, FakeServer
 
-from fastapi_caching import CachingNotEnabled, InMemoryBackend, RedisBackend
+from fastapi_caching import CachingNotEnabled, InMemoryBackend, RedisBackend, snapshot
 
 from . import helpers
 
@@ -38,6 +44,20 @@ async def test_that_cache_can_be_cleared(cache_backend):
     assert b_obj is None
 
 
+@pytest.mark.asyncio
+async def test_that_inmemory_entries_expire_after_their_own_ttl():
+    cache_backends = [helpers.make_inmemory_backend(), helpers.make_tinylfu_backend()]
+    for cache_backend in cache_backends:
+        await cache_backend.set("short", "a", ttl=1)
+        await cache_backend.set("long", "b")
+
+    await asyncio.sleep(1.1)
+
+    for cache_backend in cache_backends:
+        assert await cache_backend.get("short") is None
+        assert (await cache_backend.get("long")).data == "b"
+
+
 def test_that_redis_backend_can_be_configured_lazily():
     backend = RedisBackend()
     backend.setup(prefix="my-cool-app")
@@ -65,3 +85,439 @@ async def test_that_exception_is_raised_for_disabled_backend():
         await cache_backend.invalidate_tags(["foo", "bar"])
     with pytest.raises(CachingNotEnabled):
         await cache_backend.reset()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("cache_backend", helpers.make_caching_backends())
+async def test_that_tags_can_be_invalidated(cache_backend):
+    await cache_backend.set("a", "b", tags=["foo"])
+    await cache_backend.set("c", "d", tags=["foo", "bar"])
+    await cache_backend.set("e", "f", tags=["bar"])
+
+    await cache_backend.invalidate_tags(["foo"])
+
+    assert await cache_backend.get("a") is None
+    assert await cache_backend.get("c") is None
+    assert (await cache_backend.get("e")).data == "f"
+
+
+@pytest.mark.asyncio
+async def test_that_redis_local_cache_is_evicted_on_invalidation():
+    cache_backend = helpers.make_redis_backend()
+    cache_backend._local_cache = {}
+    await cache_backend.set("a", "b", tags=["foo"])
+    assert (await cache_backend.get("a")).data == "b"
+    assert cache_backend._prefixed("a") in cache_backend._local_cache
+
+    await cache_backend.invalidate_tag("foo")
+
+    assert cache_backend._local_cache == {}
+    assert await cache_backend.get("a") is None
+
+
+@pytest.mark.asyncio
+async def test_that_redis_local_cache_is_evicted_on_write():
+    cache_backend = helpers.make_redis_backend()
+    cache_backend._local_cache = {}
+    await cache_backend.set("a", "b")
+    assert (await cache_backend.get("a")).data == "b"
+
+    await cache_backend.set("a", "c")
+
+    assert (await cache_backend.get("a")).data == "c"
+
+
+@pytest.mark.asyncio
+async def test_that_redis_local_cache_skips_values_invalidated_while_read(
+    monkeypatch,
+):
+    cache_backend = helpers.make_redis_backend()
+    cache_backend._local_cache = {}
+    await cache_backend.set("a", "b")
+    await cache_backend.set("c", "d")
+    read = cache_backend._read
+
+    async def read_then_invalidate(*args):
+        result = await read(*args)
+        # The invalidation arrives before the reply
+        cache_backend._evict_local([cache_backend._prefixed("a")])
+        return result
+
+    monkeypatch.setattr(cache_backend, "_read", read_then_invalidate)
+
+    assert (await cache_backend.get("a")).data == "b"
+    assert cache_backend._local_cache == {}
+    assert [o.data for o in await cache_backend.get_many(["a", "c"])] == ["b", "d"]
+    assert list(cache_backend._local_cache) == [cache_backend._prefixed("c")]
+    assert cache_backend._local_fills == {}
+    assert cache_backend._stale_fills == set()
+
+
+class FakeTrackingConnection:
+    """Connection replying to the commands of `RedisBackend._start_tracking`"""
+
+    instances = []
+
+    def __init__(self, **kwargs):
+        self.commands = []
+        self.replies = []
+        self.messages = asyncio.Queue()
+        self.instances.append(self)
+
+    async def connect(self):
+        pass
+
+    async def disconnect(self):
+        pass
+
+    async def send_command(self, *args):
+        self.commands.append(args)
+        if args == ("CLIENT", "ID"):
+            self.replies.append(42)
+        elif args[0] == "SUBSCRIBE":
+            self.replies.append([b"subscribe", args[1].encode(), 1])
+        else:
+            self.replies.append(b"OK")
+
+    async def read_response(self):
+        if self.replies:
+            return self.replies.pop(0)
+        message = await self.messages.get()
+        if isinstance(message, Exception):
+            raise message
+        return message
+
+
+@pytest.mark.asyncio
+async def test_that_client_tracking_evicts_invalidated_keys(monkeypatch):
+    FakeTrackingConnection.instances.clear()
+    redis = FakeAsyncRedis()
+    pool = redis.connection_pool
+    connection_class = pool.connection_class
+
+    def make_connection(**kwargs):
+        # The listener and tracker are connected before any command is sent
+        if len(FakeTrackingConnection.instances) < 2:
+            return FakeTrackingConnection(**kwargs)
+        return connection_class(**kwargs)
+
+    monkeypatch.setattr(pool, "connection_class", make_connection)
+    cache_backend = RedisBackend(redis=redis, client_tracking=True)
+    await cache_backend.set("a", "b")
+    await cache_backend.set("c", "d")
+    assert (await cache_backend.get("a")).data == "b"
+    assert (await cache_backend.get("c")).data == "d"
+
+    listener, tracker = FakeTrackingConnection.instances
+    assert tracker.commands == [
+        (
+            "CLIENT",
+            "TRACKING",
+            "ON",
+            "REDIRECT",
+            42,
+            "BCAST",
+            "PREFIX",
+            "fastapi-caching:",
+        )
+    ]
+    local_cache = cache_backend._local_cache
+    assert set(local_cache) == {
+        cache_backend._prefixed("a"),
+        cache_backend._prefixed("c"),
+    }
+
+    await listener.messages.put(
+        [b"message", b"__redis__:invalidate", [cache_backend._prefixed("a").encode()]]
+    )
+    await asyncio.sleep(0)
+    assert set(local_cache) == {cache_backend._prefixed("c")}
+
+    # Flushing the database invalidates all keys
+    await listener.messages.put([b"message", b"__redis__:invalidate", None])
+    await asyncio.sleep(0)
+    assert len(local_cache) == 0
+
+    # Without invalidation messages, the local cache is disabled
+    await listener.messages.put(ConnectionError("Connection lost"))
+    await asyncio.sleep(0)
+    assert cache_backend._local_cache is None
+    assert (await cache_backend.get("c")).data == "d"
+    await cache_backend.close()
+
+
+@helpers.requires_redis
+@pytest.mark.asyncio
+async def test_that_client_tracking_evicts_keys_written_by_other_clients():
+    prefix = f"fastapi-caching-test-{uuid.uuid4().hex}"
+    writer = helpers.make_real_redis_backend(prefix=prefix)
+    reader = helpers.make_real_redis_backend(prefix=prefix, client_tracking=True)
+    try:
+        await writer.set("a", "b")
+        assert (await reader.get("a")).data == "b"
+        assert reader._prefixed("a") in reader._local_cache
+
+        await writer.set("a", "c")
+        for _ in range(100):
+            if reader._prefixed("a") not in reader._local_cache:
+                break
+            await asyncio.sleep(0.01)
+        assert (await reader.get("a")).data == "c"
+
+        # Our own writes are evicted right away
+        await reader.set("a", "d")
+        assert (await reader.get("a")).data == "d"
+    finally:
+        await writer.reset()
+        await writer.close()
+        await reader.close()
+
+
+@pytest.mark.asyncio
+async def test_that_redis_tag_index_expires_with_its_longest_lived_member():
+    cache_backend = helpers.make_redis_backend()
+    redis = await cache_backend._get_redis()
+    tag_key = cache_backend._tag_key("foo")
+
+    await cache_backend.set("a", "b", tags=["foo"], ttl=100)
+    await cache_backend.set("c", "d", tags=["foo"], ttl=1000)
+    await cache_backend.set("e", "f", tags=["foo"], ttl=10)
+
+    # The tag expires at the whole second after its longest lived member,
+    # so its TTL can be one second more than the member's
+    assert 990 <= await redis.ttl(tag_key) <= 1001
+
+
+@pytest.mark.asyncio
+async def test_that_redis_entries_without_ttl_dont_expire():
+    cache_backend = RedisBackend(redis=FakeAsyncRedis(), ttl=None)
+    redis = await cache_backend._get_redis()
+    tag_key = cache_backend._tag_key("foo")
+
+    await cache_backend.set("a", "b", tags=["foo"], ttl=10)
+    await cache_backend.set("c", "d", tags=["foo"])
+    await cache_backend.set("e", "f", tags=["foo"], ttl=100)
+
+    assert (await cache_backend.get("c")).data == "d"
+    assert await redis.ttl(cache_backend._prefixed("c")) == -1
+    assert await redis.zscore(tag_key, "c") == float("inf")
+    # The tag outlives all of its members
+    assert await redis.ttl(tag_key) > 100 * 365 * 24 * 3600
+
+    await cache_backend.invalidate_tag("foo")
+    assert await cache_backend.get("c") is None
+
+
+@pytest.mark.asyncio
+async def test_that_redis_tag_sweeper_removes_expired_members():
+    cache_backend = helpers.make_redis_backend()
+    redis = await cache_backend._get_redis()
+
+    await cache_backend.set("a", "b", tags=["foo", "bar"], ttl=10)
+    await cache_backend.set("c", "d", tags=["foo"], ttl=1000)
+
+    removed = await cache_backend.sweep_tags(now=time.time() + 100)
+
+    assert removed == 2
+    assert await redis.zrange(cache_backend._tag_key("foo"), 0, -1) == [b"c"]
+    assert await redis.zcard(cache_backend._tag_key("bar")) == 0
+
+
+@pytest.mark.parametrize(
+    "cache_backend",
+    (helpers.make_inmemory_backend(), helpers.make_tinylfu_backend()),
+)
+def test_that_inmemory_backend_can_be_shared_between_threads(cache_backend):
+    def worker(n):
+        for i in range(200):
+            key = f"{n}-{i % 20}"
+            cache_backend.set_sync(key, i, tags=[f"tag-{n}"])
+            assert cache_backend.get_sync(key).data == i
+        cache_backend.invalidate_tag_sync(f"tag-{n}")
+        return n
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        assert sorted(executor.map(worker, range(16))) == list(range(16))
+
+    assert cache_backend.get_sync("0-0") is None
+    cache_backend.set_sync("a", "b")
+    cache_backend.reset_sync()
+    assert cache_backend.get_sync("a") is None
+
+
+@pytest.mark.asyncio
+async def test_that_sync_api_can_be_used_from_threads_with_redis_backend():
+    cache_backend = helpers.make_redis_backend()
+    await cache_backend.set("a", "b", tags=["foo"])
+
+    obj = await asyncio.to_thread(cache_backend.get_sync, "a")
+    assert obj.data == "b"
+
+    await asyncio.to_thread(cache_backend.invalidate_tags_sync, ["foo"])
+    assert await cache_backend.get("a") is None
+
+    with pytest.raises(RuntimeError):
+        cache_backend.get_sync("a")
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("cache_backend", helpers.make_caching_backends())
+async def test_that_many_keys_can_be_fetched_at_once(cache_backend):
+    await cache_backend.set("a", 1)
+    await cache_backend.set("c", 3)
+
+    objs = await cache_backend.get_many(["a", "b", "c"])
+
+    assert [obj and obj.data for obj in objs] == [1, None, 3]
+
+
+class CountingExecutor(ThreadPoolExecutor):
+    def __init__(self):
+        super().__init__(max_workers=1)
+        self.submitted = 0
+
+    def submit(self, fn, *args, **kwargs):
+        self.submitted += 1
+        return super().submit(fn, *args, **kwargs)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("cache_backend", helpers.make_caching_backends())
+async def test_that_large_entries_are_serialized_in_the_executor(cache_backend):
+    with CountingExecutor() as executor:
+        cache_backend.set_offload(1000, executor)
+
+        await cache_backend.set("small", "x")
+        assert (await cache_backend.get("small")).data == "x"
+        assert executor.submitted == 0
+
+        # The size of the data is estimated before it's serialized
+        await cache_backend.set("large", "x" * 10_000)
+        assert executor.submitted == 1
+        assert (await cache_backend.get("large")).data == "x" * 10_000
+        assert executor.submitted == 2
+        await cache_backend.set(
+            "many", [{"id": i, "name": "x" * 10} for i in range(100)]
+        )
+        assert executor.submitted == 3
+        assert [o.data for o in await cache_backend.get_many(["large"])] == [
+            "x" * 10_000
+        ]
+        assert executor.submitted == 4
+
+
+class BrokenRedis:
+    async def get(self, key):
+        raise ConnectionError("Replica is down")
+
+    async def aclose(self):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_that_reads_go_to_replicas_except_for_recent_writes():
+    primary = FakeAsyncRedis(server=FakeServer())
+    replica = FakeAsyncRedis(server=FakeServer())
+    cache_backend = RedisBackend(
+        redis=primary, replicas=[replica], read_your_writes=0.05
+    )
+    prefixed_key = cache_backend._prefixed("a")
+
+    await cache_backend.set("a", "fresh")
+    assert (await cache_backend.get("a")).data == "fresh"
+
+    # Once the write is no longer recent, reads go to the (lagging) replica
+    await asyncio.sleep(0.06)
+    assert await cache_backend.get("a") is None
+    await replica.set(prefixed_key, await primary.get(prefixed_key))
+    assert (await cache_backend.get("a")).data == "fresh"
+    assert [o.data for o in await cache_backend.get_many(["a"])] == ["fresh"]
+
+    await cache_backend.reset()
+    assert await cache_backend.get("a") is None
+
+
+@pytest.mark.asyncio
+async def test_that_failed_replicas_fall_back_to_the_primary():
+    primary = FakeAsyncRedis(server=FakeServer())
+    cache_backend = RedisBackend(redis=primary, replicas=[BrokenRedis()])
+    await RedisBackend(redis=primary).set("a", "from primary")
+
+    assert (await cache_backend.get("a")).data == "from primary"
+    assert 0 in cache_backend._replica_down_until
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("admission", ["lru", "tinylfu"])
+async def test_that_inmemory_backend_can_be_restored_from_a_snapshot(
+    tmp_path, admission
+):
+    path = tmp_path / "cache.snapshot"
+    cache_backend = InMemoryBackend(ttl=60, admission=admission, app_version="1")
+    await cache_backend.set("a", "foo", tags=["tag"])
+    await cache_backend.set("b", "bar")
+    # Entries set with a TTL keep it, even if it isn't on the cached object
+    await cache_backend.set("c", "old", tags=["tag"], ttl=1)
+    await cache_backend.set("d", "baz", ttl=3)
+    await asyncio.sleep(1.1)
+
+    assert await cache_backend.snapshot(path) == 3
+
+    restored_backend = InMemoryBackend(ttl=60, admission=admission, app_version="1")
+    assert await restored_backend.restore(path) == 3
+    assert (await restored_backend.get("a")).data == "foo"
+    assert (await restored_backend.get("b")).data == "bar"
+    assert await restored_backend.get("c") is None
+    assert (await restored_backend.get("d")).data == "baz"
+    await restored_backend.invalidate_tag("tag")
+    assert await restored_backend.get("a") is None
+
+    # Entries keep their remaining TTL
+    entries = []
+    tags = snapshot.read(
+        str(path),
+        app_version="1",
+        now=time.time() + 2.5,
+        on_entry=lambda *entry: entries.append(entry[1]),
+    )
+    assert sorted(entries) == ["a", "b"]
+    assert tags == {"tag": ["a"]}
+
+    assert await InMemoryBackend(app_version="2").restore(path) == 0
+    assert await InMemoryBackend().restore(tmp_path / "missing") == 0
+
+
+def test_that_failed_snapshots_leave_no_temporary_file(tmp_path):
+    path = tmp_path / "cache.snapshot"
+    with pytest.raises(TypeError):
+        snapshot.write(
+            str(path),
+            app_version=None,
+            created_at=time.time(),
+            entries=[(time.time() + 60, "a", None)],
+            tags={},
+        )
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_that_sync_api_can_be_used_before_the_async_api(monkeypatch):
+    server = FakeServer()
+    cache_backend = RedisBackend()
+    monkeypatch.setattr(
+        cache_backend, "_make_redis", lambda: FakeAsyncRedis(server=server)
+    )
+
+    # E.g. a sync endpoint running in the threadpool before any async use
+    cache_backend.set_sync("a", "b")
+    assert cache_backend.get_sync("a").data == "b"
+    # Nothing may be bound to the short-lived event loops of the sync calls
+    assert cache_backend._loop is None
+    assert cache_backend._redis is None
+
+    async def use_async_then_sync():
+        assert (await cache_backend.get("a")).data == "b"
+        obj = await asyncio.to_thread(cache_backend.get_sync, "a")
+        await cache_backend.close()
+        return obj
+
+    assert asyncio.run(use_async_then_sync()).data == "b"
@@ -1,7 +1,14 @@
+import asyncio
+import time
+
 import pytest
+from fastapi import HTTPException
 
 from fastapi_caching import CacheManager, InMemoryBackend, ResponseCache
-from fastapi_caching.objects import NoOpResponseCache
+from fastapi_caching.objects import NOOP_RESPONSE_CACHE, NoOpResponseCache
+from fastapi_caching.raw import RawCacheObject
+
+from . import helpers
 
 
 @pytest.mark.asyncio
@@ -37,3 +44,273 @@ async def test_that_cache_isnt_fetched_from_disabled_backend(app, async_client):
         assert rcache.__class__ is NoOpResponseCache
 
     await async_client.get("/")
+
+
+@pytest.mark.asyncio
+async def test_that_entries_near_expiry_are_refreshed_early(app, async_client):
+    cache_backend = InMemoryBackend()
+    cache_manager = CacheManager(cache_backend, early_expiration_beta=1.0)
+    stored = RawCacheObject(
+        "old",
+        timestamp=time.time() - 99,
+        ttl=100,
+        delta=10**6,
+    )
+    await cache_backend.set("/|GET", stored)
+
+    @app.get("/")
+    async def home(rcache: ResponseCache = cache_manager.from_request()):
+        assert rcache.expired_early is True
+        assert rcache.exists() is False
+        await rcache.set("new")
+
+    await async_client.get("/")
+
+    cached_object = await cache_backend.get("/|GET")
+    assert cached_object.data == "new"
+    assert cached_object.ttl == cache_backend.ttl
+    assert cached_object.delta >= 0
+
+
+@pytest.mark.asyncio
+async def test_that_ttl_jitter_shortens_ttl(app, async_client):
+    cache_backend = helpers.make_redis_backend()
+    cache_manager = CacheManager(cache_backend, ttl=1000, ttl_jitter=0.1)
+
+    @app.get("/")
+    async def home(rcache: ResponseCache = cache_manager.from_request()):
+        await rcache.set("foo")
+
+    await async_client.get("/")
+
+    cached_object = await cache_backend.get("/|GET")
+    assert 900 <= cached_object.ttl <= 1000
+    # The entry expires after the shortened TTL
+    expires_in = await cache_backend._redis.ttl(cache_backend._prefixed("/|GET"))
+    assert 900 <= expires_in <= 1000
+
+
+@pytest.mark.asyncio
+async def test_that_backend_ttl_is_used_by_default(app, async_client):
+    cache_backend = helpers.make_redis_backend()
+    cache_backend.setup(ttl=1000)
+    cache_manager = CacheManager(cache_backend, ttl_jitter=0.1)
+
+    @app.get("/")
+    async def home(rcache: ResponseCache = cache_manager.from_request()):
+        await rcache.set("foo")
+
+    await async_client.get("/")
+
+    cached_object = await cache_backend.get("/|GET")
+    assert 900 <= cached_object.ttl <= 1000
+    # The entry expires after the shortened TTL
+    expires_in = await cache_backend._redis.ttl(cache_backend._prefixed("/|GET"))
+    assert 900 <= expires_in <= 1000
+
+
+@pytest.mark.asyncio
+async def test_that_response_cache_can_be_set_from_sync_endpoint(app, async_client):
+    cache_backend = InMemoryBackend()
+    cache_manager = CacheManager(cache_backend)
+
+    @app.get("/")
+    def home(rcache: ResponseCache = cache_manager.from_request()):
+        if rcache.exists():
+            return rcache.data
+        rcache.set_sync("foo")
+        return "bar"
+
+    assert (await async_client.get("/")).json() == "bar"
+    assert (await async_client.get("/")).json() == "foo"
+
+
+@pytest.mark.asyncio
+async def test_that_cached_errors_are_raised_without_running_endpoint(
+    app, async_client
+):
+    cache_backend = InMemoryBackend()
+    cache_manager = CacheManager(cache_backend, negative_ttl=1)
+    calls = []
+
+    @app.get("/products/{product_id}")
+    async def get_product(
+        product_id: int, rcache: ResponseCache = cache_manager.from_request()
+    ):
+        calls.append(product_id)
+        exc = HTTPException(404, detail="Product not found")
+        await rcache.set_error(exc, tag=f"product-{product_id}")
+        raise exc
+
+    for _ in range(2):
+        resp = await async_client.get("/products/1")
+        assert resp.status_code == 404
+        assert resp.json() == {"detail": "Product not found"}
+
+    assert calls == [1]
+
+    await cache_manager.invalidate_tag("product-1")
+    await async_client.get("/products/1")
+    assert calls == [1, 1]
+
+    # Cached errors expire after the negative TTL, not the backend's TTL
+    await asyncio.sleep(1.1)
+    await async_client.get("/products/1")
+    assert calls == [1, 1, 1]
+
+
+@pytest.mark.asyncio
+async def test_that_bypassed_requests_share_a_noop_cache(app, async_client):
+    cache_backend = InMemoryBackend()
+    cache_manager = CacheManager(cache_backend)
+    caches = []
+
+    @app.get("/")
+    async def home(rcache: ResponseCache = cache_manager.from_request()):
+        caches.append(rcache)
+
+    await async_client.get("/", headers={"Authorization": "Bearer x"})
+    cache_manager.disable()
+    assert cache_manager.is_enabled() is False
+    await async_client.get("/")
+
+    assert caches[0] is caches[1] is NOOP_RESPONSE_CACHE
+
+
+@pytest.mark.asyncio
+async def test_that_cache_control_request_headers_are_honored(app, async_client):
+    cache_backend = InMemoryBackend()
+    cache_manager = CacheManager(cache_backend, honor_cache_control=True)
+    calls = []
+
+    @app.get("/")
+    async def home(rcache: ResponseCache = cache_manager.from_request()):
+        if rcache.exists():
+            return rcache.data
+        calls.append(1)
+        await rcache.set(len(calls))
+        return len(calls)
+
+    assert (await async_client.get("/")).json() == 1
+    assert (await async_client.get("/")).json() == 1
+    resp = await async_client.get("/", headers={"Cache-Control": "no-cache"})
+    assert resp.json() == 2
+    resp = await async_client.get("/", headers={"Pragma": "no-cache"})
+    assert resp.json() == 3
+    resp = await async_client.get("/", headers={"Cache-Control": "max-age=60"})
+    assert resp.json() == 3
+
+    await cache_backend.set("/|GET", RawCacheObject(0, timestamp=time.time() - 120))
+    resp = await async_client.get("/", headers={"Cache-Control": "max-age=60"})
+    assert resp.json() == 4
+
+    resp = await async_client.get("/", headers={"Cache-Control": "no-store"})
+    assert resp.json() == 5
+    assert (await cache_backend.get("/|GET")).data == 4
+
+
+@pytest.mark.asyncio
+async def test_that_cache_control_request_headers_are_ignored_by_default(
+    app, async_client
+):
+    cache_backend = InMemoryBackend()
+    cache_manager = CacheManager(cache_backend)
+    calls = []
+
+    @app.get("/")
+    async def home(rcache: ResponseCache = cache_manager.from_request()):
+        if rcache.exists():
+            return rcache.data
+        calls.append(1)
+        await rcache.set(len(calls))
+        return len(calls)
+
+    assert (await async_client.get("/")).json() == 1
+    for value in ("no-cache", "no-store", "max-age=0"):
+        resp = await async_client.get("/", headers={"Cache-Control": value})
+        assert resp.json() == 1
+
+
+@pytest.mark.asyncio
+async def test_that_cache_headers_are_added_to_responses(app, async_client):
+    cache_backend = InMemoryBackend()
+    cache_manager = CacheManager(cache_backend, ttl=100, cache_headers=True)
+
+    @app.get("/")
+    async def home(rcache: ResponseCache = cache_manager.from_request()):
+        await rcache.set("foo")
+        return "foo"
+
+    resp = await async_client.get("/")
+    assert resp.headers["x-cache"] == "MISS"
+    assert resp.headers["age"] == "0"
+    assert resp.headers["cache-control"] == "public, max-age=100"
+
+    await cache_backend.set(
+        "/|GET", RawCacheObject("foo", timestamp=time.time() - 30, ttl=100)
+    )
+    resp = await async_client.get("/")
+    assert resp.headers["x-cache"] == "HIT"
+    assert resp.headers["age"] == "30"
+    assert resp.headers["cache-control"] == "public, max-age=70"
+
+
+@pytest.mark.asyncio
+async def test_that_unset_responses_dont_allow_caching(app, async_client):
+    cache_backend = InMemoryBackend()
+    cache_manager = CacheManager(cache_backend, ttl=100, cache_headers=True)
+
+    @app.get("/")
+    async def home(rcache: ResponseCache = cache_manager.from_request()):
+        return "foo"
+
+    resp = await async_client.get("/")
+    assert resp.headers["x-cache"] == "MISS"
+    assert "cache-control" not in resp.headers
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("cache_backend", helpers.make_caching_backends())
+async def test_that_list_responses_are_cached_as_fragments(
+    app, async_client, cache_backend
+):
+    cache_manager = CacheManager(cache_backend)
+    products = {1: {"id": 1, "name": "a"}, 2: {"id": 2, "name": "b"}}
+    calls = []
+
+    @app.get("/products")
+    async def list_products(rcache: ResponseCache = cache_manager.from_request()):
+        if rcache.exists():
+            return rcache.data
+        calls.append("list")
+        items = list(products.values())
+        await rcache.set_fragments(items, namespace="product", tag="all-products")
+        return items
+
+    @app.get("/products/{product_id}")
+    async def get_product(
+        product_id: int, rcache: ResponseCache = cache_manager.from_request()
+    ):
+        if rcache.exists():
+            return rcache.data
+        calls.append(product_id)
+        product = products[product_id]
+        await rcache.set_fragment(product, namespace="product", item_id=product_id)
+        return product
+
+    assert (await async_client.get("/products")).json() == list(products.values())
+    assert (await async_client.get("/products/1")).json() == products[1]
+    assert calls == ["list", 1]
+
+    # Updating one item is seen by both responses, without recomputing them
+    products[1] = {"id": 1, "name": "c"}
+    await cache_manager.update_fragment("product", 1, products[1])
+    assert (await async_client.get("/products")).json() == list(products.values())
+    assert (await async_client.get("/products/1")).json() == products[1]
+    assert calls == ["list", 1]
+
+    # Invalidating one item makes responses containing it a miss
+    await cache_manager.invalidate_tag("product-2")
+    await async_client.get("/products")
+    await async_client.get("/products/1")
+    assert calls == ["list", 1, "list"]
@@ -0,0 +1,49 @@
+import json
+import os
+
+from fastapi_caching import hashers
+
+
+def test_that_files_hash_changes_with_file_contents(tmp_path):
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "a.py").write_text("a = 1")
+    (tmp_path / "b.txt").write_text("b")
+
+    digest = hashers.files_hash(tmp_path, include=["py"])
+    assert hashers.files_hash(tmp_path, include=["py"]) == digest
+
+    (tmp_path / "b.txt").write_text("changed")
+    assert hashers.files_hash(tmp_path, include=["py"]) == digest
+
+    (tmp_path / "pkg" / "a.py").write_text("a = 2")
+    assert hashers.files_hash(tmp_path, include=["py"]) != digest
+
+
+def test_that_files_hash_reuses_persisted_digests(tmp_path):
+    src = tmp_path / "src"
+    src.mkdir()
+    file_path = src / "a.py"
+    file_path.write_text("a = 1")
+    # Files modified just now aren't cached, as they may change within the same
+    # mtime tick
+    os.utime(file_path, (0, 0))
+    cache_path = tmp_path / "digests.json"
+
+    digest = hashers.files_hash(src, cache_path=cache_path)
+    assert hashers.files_hash(src) == digest
+    cached = json.loads(cache_path.read_text())["files"]
+    assert list(cached) == [str(file_path)]
+
+    # A cached digest is used as long as the modification time and size match
+    cached[str(file_path)][2] = "00" * 64
+    cache_path.write_text(json.dumps({"version": 1, "files": cached}))
+    assert hashers.files_hash(src, cache_path=cache_path) != digest
+
+    file_path.write_text("a = 2")
+    assert hashers.files_hash(src, cache_path=cache_path) == hashers.files_hash(src)
+
+
+def test_that_installed_packages_hash_is_reproducible():
+    digest = hashers.installed_packages_hash()
+    assert len(digest) == 8
+    assert hashers.installed_packages_hash() == digest
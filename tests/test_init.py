@@ -0,0 +1,38 @@
+import importlib
+import subprocess
+import sys
+from pathlib import Path
+
+import fastapi_caching
+
+
+def test_that_lazy_exports_match_the_modules():
+    modules = set(fastapi_caching._EXPORTS.values())
+    exported = {
+        name: module
+        for module in modules
+        for name in importlib.import_module(f"fastapi_caching.{module}").__all__
+    }
+    assert exported == fastapi_caching._EXPORTS
+    for name in fastapi_caching.__all__:
+        assert getattr(fastapi_caching, name) is not None
+
+
+def test_that_submodules_are_accessible_as_attributes():
+    code = (
+        "import fastapi_caching\n"
+        "assert fastapi_caching.backends.RedisBackend is not None\n"
+        "assert fastapi_caching.warming.key_to_url is not None\n"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
+    modules = {p.stem for p in Path(fastapi_caching.__file__).parent.glob("*.py")}
+    assert fastapi_caching._SUBMODULES == modules - {"__init__"}
+
+
+def test_that_hashers_are_importable_without_fastapi_and_redis():
+    code = (
+        "import sys\n"
+        "from fastapi_caching import hashers\n"
+        "assert not {'fastapi', 'starlette', 'redis'} & set(sys.modules)\n"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+from fastapi_caching import (
+    CacheManager,
+    InMemoryBackend,
+    RequestMemoMiddleware,
+    ResponseCache,
+    request_memo,
+)
+
+
+class CountingBackend(InMemoryBackend):
+    def __init__(self):
+        super().__init__()
+        self.reads = 0
+
+    async def _get_impl(self, key):
+        self.reads += 1
+        return await super()._get_impl(key)
+
+    async def _get_many_impl(self, keys):
+        self.reads += 1
+        return await super()._get_many_impl(keys)
+
+
+@pytest.mark.asyncio
+async def test_that_reads_are_memoized_until_written():
+    cache_backend = CountingBackend()
+    await cache_backend.set("a", 1)
+
+    with request_memo():
+        assert (await cache_backend.get("a")).data == 1
+        assert (await cache_backend.get("a")).data == 1
+        assert await cache_backend.get("b") is None
+        assert await cache_backend.get("b") is None
+        assert [o and o.data for o in await cache_backend.get_many(["a", "b"])] == [
+            1,
+            None,
+        ]
+        assert cache_backend.reads == 2
+
+        await cache_backend.set("b", 2)
+        assert (await cache_backend.get("b")).data == 2
+        await cache_backend.invalidate_tags(["foo"])
+        await cache_backend.get("a")
+        assert cache_backend.reads == 4
+
+    await cache_backend.get("a")
+    await cache_backend.get("a")
+    assert cache_backend.reads == 6
+
+
+@pytest.mark.asyncio
+async def test_that_tasks_outliving_the_memo_dont_use_it():
+    cache_backend = CountingBackend()
+    await cache_backend.set("a", 1)
+    block_exited = asyncio.Event()
+
+    async def read_later():
+        await block_exited.wait()
+        return [(await cache_backend.get("a")).data for _ in range(2)]
+
+    with request_memo() as memo:
+        assert (await cache_backend.get("a")).data == 1
+        task = asyncio.ensure_future(read_later())
+    await cache_backend.set("a", 2)
+    block_exited.set()
+
+    assert await task == [2, 2]
+    assert cache_backend.reads == 3
+    assert memo == {}
+
+
+@pytest.mark.asyncio
+async def test_that_middleware_memoizes_reads_per_request(app, async_client):
+    cache_backend = CountingBackend()
+    cache_manager = CacheManager(cache_backend)
+    app.add_middleware(RequestMemoMiddleware)
+
+    async def settings():
+        obj = await cache_backend.get("settings")
+        return obj and obj.data
+
+    @app.get("/")
+    async def home(rcache: ResponseCache = cache_manager.from_request()):
+        return [await settings(), await settings()]
+
+    await cache_backend.set("settings", "x")
+    assert (await async_client.get("/")).json() == ["x", "x"]
+    # The response cache lookup, and one settings lookup
+    assert cache_backend.reads == 2
+    await async_client.get("/")
+    assert cache_backend.reads == 4
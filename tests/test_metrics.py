@@ -0,0 +1,114 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from fastapi_caching import (
+    CacheManager,
+    CacheMetrics,
+    EventLoopLagMonitor,
+    InMemoryBackend,
+    ResponseCache,
+)
+
+
+@pytest.mark.asyncio
+async def test_that_response_cache_lookups_are_counted(app, async_client):
+    metrics = CacheMetrics(tag_labels=["all-products"])
+    cache_manager = CacheManager(InMemoryBackend(), metrics=metrics)
+
+    @app.get("/products/{product_id}")
+    async def get_product(
+        product_id: int, rcache: ResponseCache = cache_manager.from_request()
+    ):
+        is_miss = rcache.__class__ is ResponseCache and not rcache.exists()
+        assert metrics.in_flight == (1 if is_miss else 0)
+        await rcache.set(product_id, tags=[f"product-{product_id}", "all-products"])
+        assert metrics.in_flight == 0
+        return product_id
+
+    await async_client.get("/products/1")
+    await async_client.get("/products/1")
+    await async_client.get("/products/1", headers={"Authorization": "foo"})
+    await cache_manager.invalidate_tag("product-1")
+
+    assert metrics.requests == {
+        ("/products/{product_id}", "miss"): 1,
+        ("/products/{product_id}", "hit"): 1,
+        ("/products/{product_id}", "bypass"): 1,
+    }
+    # Tags without a label of their own are counted together
+    assert metrics.tags == {
+        ("all-products", "set"): 2,
+        ("_other", "set"): 2,
+        ("_other", "invalidate"): 1,
+    }
+    assert metrics.durations["get"].count == 2
+    assert metrics.durations["invalidate"].count == 1
+    assert metrics.sizes.count == 2
+
+
+@pytest.mark.asyncio
+async def test_that_in_flight_misses_are_released_by_failing_endpoints(
+    app, async_client
+):
+    metrics = CacheMetrics()
+    cache_manager = CacheManager(InMemoryBackend(), metrics=metrics)
+
+    @app.get("/")
+    async def home(rcache: ResponseCache = cache_manager.from_request()):
+        assert metrics.in_flight == 1
+        raise HTTPException(503)
+
+    assert (await async_client.get("/")).status_code == 503
+    assert metrics.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_that_evictions_are_counted():
+    metrics = CacheMetrics()
+    cache_backend = InMemoryBackend(maxsize=2, stripes=1)
+    cache_backend.set_metrics(metrics)
+
+    for key in "abc":
+        await cache_backend.set(key, key)
+
+    assert metrics.evictions == 1
+
+
+@pytest.mark.asyncio
+async def test_that_metrics_can_be_rendered_in_prometheus_format():
+    metrics = CacheMetrics()
+    metrics.record_request('/a"b', "hit")
+    metrics.observe_duration("get", 0.003)
+
+    rendered = metrics.render_prometheus()
+
+    assert 'fastapi_caching_requests_total{route="/a\\"b",result="hit"} 1' in rendered
+    assert (
+        'fastapi_caching_operation_duration_seconds_bucket{operation="get",le="0.005"} 1'
+        in rendered
+    )
+    assert (
+        'fastapi_caching_operation_duration_seconds_count{operation="get"} 1'
+        in rendered
+    )
+    assert "fastapi_caching_in_flight 0" in rendered
+
+
+@pytest.mark.asyncio
+async def test_that_event_loop_lag_is_observed():
+    metrics = CacheMetrics()
+    monitor = EventLoopLagMonitor(metrics, interval=0.01)
+    monitor.start()
+    await asyncio.sleep(0.02)
+    time.sleep(0.05)  # Blocks the event loop
+    await asyncio.sleep(0.02)
+    await monitor.stop()
+
+    assert metrics.loop_lag.count >= 2
+    assert metrics.loop_lag.sum >= 0.03
+    assert "fastapi_caching_event_loop_lag_seconds_count" in (
+        metrics.render_prometheus()
+    )
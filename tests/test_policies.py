@@ -0,0 +1,146 @@
+import pytest
+from starlette.responses import JSONResponse
+
+from fastapi_caching import (
+    CacheInvalidationMiddleware,
+    CacheManager,
+    CachePolicy,
+    InMemoryBackend,
+    Pagination,
+    ResponseCache,
+)
+
+
+def test_that_tag_templates_are_formatted_with_path_params():
+    policy = CachePolicy(
+        "/products/{product_id}", tags=["product-{product_id}", "all-products"]
+    )
+    assert policy.match("/products/5") == {"product_id": "5"}
+    assert policy.match("/orders/5") is None
+    assert policy.tags_for({"product_id": 5}) == ["product-5", "all-products"]
+
+
+def test_that_unknown_template_fields_are_rejected():
+    with pytest.raises(ValueError):
+        CachePolicy("/products/{product_id}", tags=["product-{id}"])
+
+
+@pytest.mark.asyncio
+async def test_that_policy_sets_ttl_key_and_tags(app, async_client):
+    cache_backend = InMemoryBackend()
+    cache_manager = CacheManager(cache_backend)
+    cache_manager.add_policy(
+        "/products/{product_id}",
+        ttl=123,
+        tags=["product-{product_id}"],
+        query_params=["fields"],
+    )
+
+    @app.get("/products/{product_id}")
+    async def get_product(
+        product_id: int, rcache: ResponseCache = cache_manager.from_request()
+    ):
+        await rcache.set({"id": product_id})
+        return {"id": product_id}
+
+    await async_client.get("/products/5", params={"fields": "id", "utm": "x"})
+
+    cached_object = await cache_backend.get("/products/5|GET|fields=id")
+    assert cached_object.ttl == 123
+
+    await cache_manager.invalidate_tag("product-5")
+    assert await cache_backend.get("/products/5|GET|fields=id") is None
+
+
+@pytest.mark.asyncio
+async def test_that_successful_mutations_invalidate_tags(app, async_client):
+    cache_backend = InMemoryBackend()
+    cache_manager = CacheManager(cache_backend)
+    cache_manager.add_invalidation(
+        "/products/{product_id}", tags=["product-{product_id}", "all-products"]
+    )
+    app.add_middleware(CacheInvalidationMiddleware, cache_manager=cache_manager)
+
+    @app.put("/products/{product_id}")
+    async def update_product(product_id: int):
+        if product_id == 0:
+            return JSONResponse({}, status_code=422)
+
+    await cache_backend.set("a", "a", tags=["product-0"])
+    await cache_backend.set("b", "b", tags=["product-5"])
+    await cache_backend.set("c", "c", tags=["all-products"])
+    await async_client.put("/products/0")
+    assert await cache_backend.get("a") is not None
+    assert await cache_backend.get("c") is not None
+
+    await async_client.put("/products/5")
+    assert await cache_backend.get("a") is not None
+    assert await cache_backend.get("b") is None
+    assert await cache_backend.get("c") is None
+
+
+def test_that_pagination_params_are_normalized():
+    pagination = Pagination(default_limit=10)
+    assert pagination.window({}) == (0, 10)
+    assert pagination.window({"offset": "30", "limit": "5"}) == (30, 5)
+    assert pagination.window({"offset": "x"}) is None
+    assert pagination.window({"offset": "-1"}) is None
+    assert pagination.window({"limit": "1000"}) == (0, 1000)
+    assert pagination.window({"limit": "1001"}) is None
+
+    pagination = Pagination(page_param="page", limit_param="size")
+    assert pagination.window({"page": "3", "size": "10"}) == (20, 10)
+
+
+@pytest.mark.asyncio
+async def test_that_pages_are_built_from_shared_blocks(app, async_client):
+    cache_backend = InMemoryBackend()
+    cache_manager = CacheManager(cache_backend)
+    cache_manager.add_policy(
+        "/products",
+        tags=["all-products"],
+        pagination=Pagination(default_limit=10, block_size=4, max_limit=20),
+    )
+    products = list(range(10))
+    fetched = []
+
+    async def fetch_rows(offset, limit):
+        fetched.append((offset, limit))
+        return products[offset : offset + limit]
+
+    @app.get("/products")
+    async def list_products(
+        q: str = None,
+        offset: int = 0,
+        limit: int = 10,
+        rcache: ResponseCache = cache_manager.from_request(),
+    ):
+        if rcache.exists():
+            return rcache.data
+        return await rcache.set_page(fetch_rows, offset=offset, limit=limit)
+
+    assert (await async_client.get("/products?offset=1&limit=3")).json() == [1, 2, 3]
+    assert fetched == [(0, 4)]
+    # Overlapping pages reuse the cached blocks and only fetch the missing ones
+    resp = await async_client.get("/products?offset=2&limit=5")
+    assert resp.json() == [2, 3, 4, 5, 6]
+    assert fetched == [(0, 4), (4, 4)]
+    assert (await async_client.get("/products?limit=6")).json() == products[:6]
+    assert fetched == [(0, 4), (4, 4)]
+    # The last block is short, which ends pages past the end of the results
+    assert (await async_client.get("/products?offset=7&limit=20")).json() == [7, 8, 9]
+    assert fetched == [(0, 4), (4, 4), (8, 20)]
+    assert (await async_client.get("/products?offset=9&limit=20")).json() == [9]
+    assert fetched == [(0, 4), (4, 4), (8, 20)]
+    # Other query parameters still get blocks of their own
+    await async_client.get("/products?q=foo&limit=2")
+    assert fetched[-1] == (0, 4)
+
+    await cache_manager.invalidate_tag("all-products")
+    await async_client.get("/products?offset=2&limit=2")
+    assert fetched[-1] == (0, 4)
+    assert len(fetched) == 5
+    # Pages above the max limit are fetched in one go and never cached
+    for _ in range(2):
+        assert (await async_client.get("/products?limit=21")).json() == products
+    assert fetched[-2:] == [(0, 21), (0, 21)]
@@ -0,0 +1,79 @@
+import pytest
+
+sa = pytest.importorskip("sqlalchemy")
+databases = pytest.importorskip("databases")
+
+from fastapi_caching import CacheManager, InMemoryBackend, QueryCache  # noqa: E402
+
+metadata = sa.MetaData()
+product_tbl = sa.Table(
+    "product",
+    metadata,
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column("name", sa.Text),
+)
+
+
+@pytest.fixture
+async def database(tmp_path):
+    db_uri = f"sqlite:///{tmp_path / 'test.db'}"
+    metadata.create_all(bind=sa.create_engine(db_uri))
+    database = databases.Database(db_uri)
+    await database.connect()
+    yield database
+    await database.disconnect()
+
+
+@pytest.fixture
+def query_cache(database):
+    return QueryCache(database, CacheManager(InMemoryBackend()))
+
+
+@pytest.mark.asyncio
+async def test_that_reads_are_cached_until_the_table_is_written(query_cache):
+    db = query_cache
+    await db.execute(product_tbl.insert().values(id=1, name="a"))
+    assert await db.fetch_all(product_tbl.select()) == [{"id": 1, "name": "a"}]
+
+    # Bypassing the query cache leaves the cached result in place
+    await db.database.execute(product_tbl.insert().values(id=2, name="b"))
+    assert len(await db.fetch_all(product_tbl.select())) == 1
+
+    await db.execute(product_tbl.insert(), {"id": 3, "name": "c"})
+    assert len(await db.fetch_all(product_tbl.select())) == 3
+
+
+@pytest.mark.asyncio
+async def test_that_row_writes_only_invalidate_that_row(query_cache):
+    db = query_cache
+    await db.execute_many(
+        product_tbl.insert(), [{"id": 1, "name": "a"}, {"id": 2, "name": "b"}]
+    )
+    row_1 = product_tbl.select().where(product_tbl.c.id == 1)
+    row_2 = product_tbl.select().where(product_tbl.c.id == 2)
+    assert (await db.fetch_one(row_1))["name"] == "a"
+    assert (await db.fetch_one(row_2))["name"] == "b"
+
+    await db.database.execute(product_tbl.update().values(name="x"))
+    await db.execute(product_tbl.update().values(name="y").where(product_tbl.c.id == 1))
+    assert (await db.fetch_one(row_1))["name"] == "y"
+    assert (await db.fetch_one(row_2))["name"] == "b"
+
+    await db.execute(product_tbl.update().values(name="z"))
+    assert (await db.fetch_one(row_2))["name"] == "z"
+
+
+@pytest.mark.asyncio
+async def test_that_sql_strings_need_explicit_tables(query_cache):
+    db = query_cache
+    await db.execute(product_tbl.insert().values(id=1, name="a"))
+    query = "SELECT COUNT(*) FROM product"
+    assert await db.fetch_val(query) == 1
+    assert await db.fetch_val(query, tables=["product"]) == 1
+
+    await db.database.execute(product_tbl.insert().values(id=2, name="b"))
+    assert await db.fetch_val(query) == 2
+    assert await db.fetch_val(query, tables=["product"]) == 1
+
+    await db.execute("DELETE FROM product", tables=["product"])
+    assert await db.fetch_val(query, tables=["product"]) == 0
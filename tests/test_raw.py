@@ -0,0 +1,60 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from fastapi_caching import raw
+from fastapi_caching.raw import RawCacheObject
+
+from . import helpers
+
+# RawCacheObject({"foo": "bar"}, datetime(2020, 8, 16), {"ttl": 60, "delta": 0.5})
+# pickled by v0.3.0
+LEGACY_PICKLE = (
+    b"\x80\x04\x95\xa1\x00\x00\x00\x00\x00\x00\x00\x8c\x13fastapi_caching.raw"
+    b"\x94\x8c\x0eRawCacheObject\x94\x93\x94)\x81\x94}\x94(\x8c\x04data\x94}"
+    b"\x94\x8c\x03foo\x94\x8c\x03bar\x94s\x8c\ttimestamp\x94\x8c\x08datetime"
+    b"\x94\x8c\x08datetime\x94\x93\x94C\n\x07\xe4\x08\x10\x00\x00\x00\x00\x00"
+    b"\x00\x94\x85\x94R\x94\x8c\x04meta\x94}\x94(\x8c\x03ttl\x94K<\x8c\x05delta"
+    b"\x94G?\xe0\x00\x00\x00\x00\x00\x00uub."
+)
+
+
+def test_that_objects_survive_a_round_trip():
+    obj = RawCacheObject([1, 2], ttl=60, delta=0.25, meta={"error": {}})
+    assert raw.loads(raw.dumps(obj)) == obj
+    assert raw.loads(raw.dumps(RawCacheObject("foo"))).ttl is None
+
+
+def test_that_ttls_are_stored_as_whole_seconds():
+    assert raw.loads(raw.dumps(RawCacheObject("foo", ttl=0.2))).ttl == 1
+    assert raw.loads(raw.dumps(RawCacheObject("foo", ttl=59.5))).ttl == 60
+    for ttl in (-1, 2**32):
+        with pytest.raises(ValueError):
+            raw.dumps(RawCacheObject("foo", ttl=ttl))
+
+
+def test_that_header_is_readable_without_the_payload():
+    dumped = raw.dumps(RawCacheObject("x" * 1000, ttl=60), compress_min_size=100)
+    header = raw.read_header(dumped)
+    assert header.version == raw.VERSION
+    assert header.compression == raw.COMPRESSION_ZLIB
+    assert header.ttl == 60
+    assert len(dumped) < 100
+    assert raw.loads(dumped).data == "x" * 1000
+
+
+def test_that_legacy_pickled_objects_can_be_loaded():
+    obj = raw.loads(LEGACY_PICKLE)
+    assert obj.data == {"foo": "bar"}
+    assert obj.timestamp == datetime(2020, 8, 16, tzinfo=timezone.utc).timestamp()
+    assert obj.ttl == 60
+    assert obj.delta == 0.5
+    assert obj.meta == {}
+
+
+@pytest.mark.asyncio
+async def test_that_backends_load_legacy_entries():
+    cache_backend = helpers.make_redis_backend()
+    redis = await cache_backend._get_redis()
+    await redis.set(cache_backend._prefixed("a"), LEGACY_PICKLE)
+    assert (await cache_backend.get("a")).data == {"foo": "bar"}
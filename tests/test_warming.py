@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+from fastapi_caching import CacheManager, ResponseCache
+from fastapi_caching.warming import key_to_url, warm_keys, warm_on_startup, warm_routes
+
+from . import helpers
+
+
+def test_that_keys_can_be_converted_to_urls():
+    assert key_to_url("/products|GET") == ("GET", "/products")
+    assert key_to_url("/products|GET|limit=10|q=a b") == (
+        "GET",
+        "/products?limit=10&q=a+b",
+    )
+    # Separators within values are escaped in keys
+    assert key_to_url("/a%7Cb|GET|q%3Dx=a%7Cb%25") == (
+        "GET",
+        "/a%7Cb?q%3Dx=a%7Cb%25",
+    )
+
+
+@pytest.mark.asyncio
+async def test_that_routes_can_be_warmed(app):
+    cache_backend = helpers.make_inmemory_backend()
+    cache_manager = CacheManager(cache_backend)
+
+    @app.get("/products")
+    async def list_products(
+        limit: int = 10, rcache: ResponseCache = cache_manager.from_request()
+    ):
+        await rcache.set(list(range(limit)))
+        return list(range(limit))
+
+    results = await warm_routes(app, ["/products", "/products?limit=2"])
+    assert results == {"/products": 200, "/products?limit=2": 200}
+    assert (await cache_backend.get("/products|GET|limit=2")).data == [0, 1]
+
+    await cache_backend.reset()
+    await warm_keys(app, ["/products|GET|limit=3"])
+    assert (await cache_backend.get("/products|GET|limit=3")).data == [0, 1, 2]
+
+    # Keys of values containing the key separator map back to their URL
+    await warm_keys(app, ["/products|GET|limit=1|q=a%7Cb"])
+    assert (await cache_backend.get("/products|GET|limit=1|q=a%7Cb")).data == [0]
+
+
+@pytest.mark.asyncio
+async def test_that_warming_on_startup_is_cancelled_on_shutdown(app):
+    started = asyncio.Event()
+    cancelled = []
+
+    @app.get("/slow")
+    async def slow():
+        started.set()
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    warm_on_startup(app, ["/slow"])
+    async with app.router.lifespan_context(app):
+        await asyncio.wait_for(started.wait(), 1)
+
+    assert cancelled == [True]
+
+
+@pytest.mark.asyncio
+async def test_that_entries_can_be_copied_from_previous_app_version():
+    old_backend = helpers.make_redis_backend()
+    old_backend.setup(app_version="v1")
+    await old_backend.set("a", "b", tags=["foo"])
+    await old_backend.set("c", "d")
+
+    new_backend = helpers.make_redis_backend()
+    new_backend._redis = old_backend._redis
+    new_backend.setup(app_version="v2")
+
+    copied = await new_backend.copy_from_version("v1", keys=["a"])
+
+    assert copied == 2  # The entry and its tag
+    assert (await new_backend.get("a")).data == "b"
+    assert await new_backend.get("c") is None
+
+    await new_backend.invalidate_tag("foo")
+    assert await new_backend.get("a") is None
+    assert (await old_backend.get("a")).data == "b"
@@ -0,0 +1,132 @@
+import asyncio
+
+import pytest
+
+from fastapi_caching import (
+    CacheEntry,
+    CacheManager,
+    InvalidationBuffer,
+    ResponseCache,
+    WriteBehindQueue,
+)
+
+from . import helpers
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("cache_backend", helpers.make_caching_backends())
+async def test_that_many_entries_can_be_set(cache_backend):
+    was_set = await cache_backend.set_many(
+        [CacheEntry("a", "b", tags=["foo"]), CacheEntry("c", "d", ttl=10)]
+    )
+    assert was_set is True
+
+    assert (await cache_backend.get("a")).data == "b"
+    assert (await cache_backend.get("c")).data == "d"
+
+    await cache_backend.invalidate_tag("foo")
+    assert await cache_backend.get("a") is None
+
+
+@pytest.mark.asyncio
+async def test_that_queued_writes_to_the_same_key_are_coalesced():
+    cache_backend = helpers.make_redis_backend()
+    queue = WriteBehindQueue(cache_backend, maxsize=10)
+
+    await queue.put(CacheEntry("a", "first"))
+    await queue.put(CacheEntry("a", "second"))
+    await queue.put(CacheEntry("b", "c"))
+    assert len(queue) <= 2
+
+    await queue.close()
+
+    assert len(queue) == 0
+    assert (await cache_backend.get("a")).data == "second"
+    assert (await cache_backend.get("b")).data == "c"
+
+
+@pytest.mark.asyncio
+async def test_that_write_behind_mode_is_flushed_on_close(app, async_client):
+    cache_backend = helpers.make_inmemory_backend()
+    cache_manager = CacheManager(cache_backend, write_behind=True)
+
+    @app.get("/")
+    async def home(rcache: ResponseCache = cache_manager.from_request()):
+        await rcache.set({"foo": "bar"})
+        return {"foo": "bar"}
+
+    await async_client.get("/")
+    await cache_manager.close()
+
+    cached_object = await cache_backend.get("/|GET")
+    assert cached_object.data == {"foo": "bar"}
+
+
+@pytest.mark.asyncio
+async def test_that_invalidated_queued_writes_are_dropped():
+    cache_backend = helpers.make_redis_backend()
+    cache_manager = CacheManager(cache_backend, write_behind=True)
+    queue = cache_manager._write_behind
+
+    await queue.put(CacheEntry("a", "b", tags=["foo"]))
+    await queue.put(CacheEntry("c", "d", tags=["bar"]))
+    await cache_manager.invalidate_tag("foo")
+    await queue.flush()
+
+    assert await cache_backend.get("a") is None
+    assert (await cache_backend.get("c")).data == "d"
+    await cache_manager.close()
+
+
+@pytest.mark.asyncio
+async def test_that_buffered_invalidations_are_deduplicated():
+    cache_backend = helpers.make_redis_backend()
+    buffer = InvalidationBuffer(cache_backend, delay=10, max_delay=0.05)
+    await cache_backend.set("a", "b", tags=["foo"])
+
+    for _ in range(100):
+        buffer.add(["foo", "bar"])
+    assert len(buffer) == 2
+    assert await cache_backend.get("a") is not None
+
+    # Flushed after max_delay, even though tags were added within `delay`
+    await asyncio.sleep(0.1)
+    assert len(buffer) == 0
+    assert await cache_backend.get("a") is None
+    await buffer.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("cache_backend", helpers.make_caching_backends())
+async def test_that_batched_invalidations_are_applied_on_exit(cache_backend):
+    cache_manager = CacheManager(cache_backend)
+    await cache_backend.set("a", "b", tags=["foo"])
+    await cache_backend.set("c", "d", tags=["bar"])
+
+    async with cache_manager.batch_invalidations():
+        async with cache_manager.batch_invalidations():
+            await cache_manager.invalidate_tag("foo")
+        await cache_manager.invalidate_tags(["foo", "bar"])
+        assert await cache_backend.get("a") is not None
+
+    assert await cache_backend.get("a") is None
+    assert await cache_backend.get("c") is None
+
+
+@pytest.mark.asyncio
+async def test_that_invalidations_of_tasks_outliving_a_batch_are_applied():
+    cache_backend = helpers.make_redis_backend()
+    cache_manager = CacheManager(cache_backend)
+    await cache_backend.set("a", "b", tags=["foo"])
+    block_exited = asyncio.Event()
+
+    async def invalidate_later():
+        await block_exited.wait()
+        await cache_manager.invalidate_tag("foo")
+
+    async with cache_manager.batch_invalidations():
+        task = asyncio.ensure_future(invalidate_later())
+    block_exited.set()
+    await task
+
+    assert await cache_backend.get("a") is None